@@ -0,0 +1 @@
+"""Offline performance benchmarks for M3U8 Codec Forward."""
@@ -0,0 +1,44 @@
+"""Shared JSON report helpers for the benchmark scripts."""
+
+import json
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+def write_report(report: Dict[str, Any], output: Optional[str]) -> str:
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    return text
+
+
+def _numeric_leaves(data: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _numeric_leaves(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix, float(data)
+
+
+def diff_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Relative change of every numeric metric present in both reports."""
+    before = dict(_numeric_leaves(baseline.get("results", {})))
+    changes = {}
+    for path, value in _numeric_leaves(current.get("results", {})):
+        if path not in before:
+            continue
+        old = before[path]
+        changes[path] = {
+            "baseline": old,
+            "current": value,
+            "change_pct": round((value - old) / old * 100, 1) if old else 0.0,
+        }
+    return changes
+
+
+def print_diff(baseline_path: str, current: Dict[str, Any]):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    for path, change in sorted(diff_reports(baseline, current).items()):
+        print(f"{path:70} {change['baseline']:>14.3f} -> {change['current']:>14.3f} ({change['change_pct']:+.1f}%)")
@@ -0,0 +1,330 @@
+"""HTTP delivery load benchmark for playlist and segment serving.
+
+Starts the server CLI against a working directory pre-populated with
+synthetic live playlists and segments, then drives it with simulated
+players that poll a playlist and fetch segments from it. Playlists are
+rewritten as the run goes, like ffmpeg does, so conditional requests and
+the playlist cache see real version changes. No ffmpeg is needed. Run with::
+
+    python -m benchmarks.bench_delivery --players 10,100,400 --output delivery.json
+    python -m benchmarks.bench_delivery --workers 4 --baseline delivery.json
+
+Reported per player count: requests/s, p50/p99 latency for ``serve_playlist``
+and ``serve_segment``, served throughput and server CPU seconds per served
+GB. Client CPU is reported too: when it nears one core the load generator,
+not the server, is the limit.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks._report import write_report, print_diff
+
+from m3u8_codec_forward.state import WORKING_DIR_ENV
+
+SEGMENT_DURATION = 2
+PLAYLIST_SIZE = 10
+STARTUP_TIMEOUT = 30
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+class SyntheticOrigin:
+    """Live playlists over a fixed pool of segment files per variant."""
+
+    def __init__(self, working_dir: Path, bitrates: List[int], pool_size: int):
+        self.working_dir = working_dir
+        self.variants = [f"bench_{bitrate}k" for bitrate in bitrates]
+        self.pool_size = pool_size
+        self.sequence = 0
+
+        for name, bitrate in zip(self.variants, bitrates):
+            segment_bytes = bitrate * 1000 // 8 * SEGMENT_DURATION
+            for index in range(pool_size):
+                (working_dir / self.segment_name(name, index)).write_bytes(os.urandom(segment_bytes))
+        self.advance()
+
+    def segment_name(self, variant: str, sequence: int) -> str:
+        return f"{variant}_{sequence % self.pool_size:03d}.ts"
+
+    def advance(self):
+        """Slide every playlist window by one segment, replacing the file atomically."""
+        for name in self.variants:
+            lines = [
+                "#EXTM3U",
+                "#EXT-X-VERSION:3",
+                f"#EXT-X-TARGETDURATION:{SEGMENT_DURATION}",
+                f"#EXT-X-MEDIA-SEQUENCE:{self.sequence}",
+            ]
+            for sequence in range(self.sequence, self.sequence + PLAYLIST_SIZE):
+                lines.append(f"#EXTINF:{SEGMENT_DURATION:.6f},")
+                lines.append(self.segment_name(name, sequence))
+            path = self.working_dir / f"{name}.m3u8"
+            tmp_path = path.with_suffix(".m3u8.tmp")
+            tmp_path.write_text("\n".join(lines) + "\n")
+            os.replace(tmp_path, path)
+        self.sequence += 1
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.advance()
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.bytes = 0
+        self.errors = 0
+        self.not_modified = 0
+
+    def record(self, started: float, response: httpx.Response):
+        self.latencies.append(time.perf_counter() - started)
+        self.bytes += response.num_bytes_downloaded
+        if response.status_code == 304:
+            self.not_modified += 1
+        elif response.status_code != 200:
+            self.errors += 1
+
+    def summary(self) -> Dict[str, object]:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "not_modified": self.not_modified,
+            "bytes": self.bytes,
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        }
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def player(client: httpx.AsyncClient, base_url: str, variant: str, segments_per_poll: int,
+                 think_time: float, deadline: float, playlist_stats: EndpointStats,
+                 segment_stats: EndpointStats):
+    """Poll one playlist and fetch the next segments from it until the deadline."""
+    etag: Optional[str] = None
+    segments: List[str] = []
+    position = 0
+    while time.perf_counter() < deadline:
+        headers = {"Accept-Encoding": "gzip, br"}
+        if etag:
+            headers["If-None-Match"] = etag
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"{base_url}/{variant}.m3u8", headers=headers)
+        except httpx.HTTPError:
+            playlist_stats.errors += 1
+            continue
+        playlist_stats.record(started, response)
+        if response.status_code == 200:
+            etag = response.headers.get("etag")
+            segments = [line for line in response.text.splitlines() if line and not line.startswith("#")]
+
+        for _ in range(segments_per_poll if segments else 0):
+            started = time.perf_counter()
+            try:
+                response = await client.get(f"{base_url}/{segments[position % len(segments)]}")
+            except httpx.HTTPError:
+                segment_stats.errors += 1
+                continue
+            segment_stats.record(started, response)
+            position += 1
+
+        if think_time:
+            await asyncio.sleep(think_time)
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        return pids
+    for child in children:
+        pids.extend(_process_tree(child))
+    return pids
+
+
+def server_cpu_seconds(pid: int) -> float:
+    """User + system CPU of the server and its worker processes, from /proc."""
+    total = 0
+    for process_id in _process_tree(pid):
+        try:
+            with open(f"/proc/{process_id}/stat") as f:
+                # Fields after the parenthesised command name; utime and stime are 14 and 15
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        total += int(fields[11]) + int(fields[12])
+    return total / CLOCK_TICKS
+
+
+async def run_level(base_url: str, server_pid: int, variants: List[str], players: int,
+                    duration: float, segments_per_poll: int, think_time: float) -> Dict[str, object]:
+    playlist_stats = EndpointStats()
+    segment_stats = EndpointStats()
+    limits = httpx.Limits(max_connections=players, max_keepalive_connections=players)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        cpu_before = server_cpu_seconds(server_pid)
+        client_before = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            player(client, base_url, variants[index % len(variants)], segments_per_poll,
+                   think_time, deadline, playlist_stats, segment_stats)
+            for index in range(players)
+        ))
+        elapsed = time.perf_counter() - started
+        client_after = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_seconds = server_cpu_seconds(server_pid) - cpu_before
+
+    requests = len(playlist_stats.latencies) + len(segment_stats.latencies)
+    served_bytes = playlist_stats.bytes + segment_stats.bytes
+    served_gb = served_bytes / 1e9
+    return {
+        "players": players,
+        "requests_per_second": round(requests / elapsed, 1),
+        "throughput_mbps": round(served_bytes * 8 / 1e6 / elapsed, 1),
+        "server_cpu_seconds": round(cpu_seconds, 3),
+        "server_cpu_seconds_per_gb": round(cpu_seconds / served_gb, 3) if served_gb else None,
+        "client_cpu_seconds": round(
+            (client_after.ru_utime - client_before.ru_utime)
+            + (client_after.ru_stime - client_before.ru_stime), 3
+        ),
+        "serve_playlist": playlist_stats.summary(),
+        "serve_segment": segment_stats.summary(),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(working_dir: Path, runtime_dir: Path, port: int, workers: int) -> subprocess.Popen:
+    config_path = runtime_dir / "config.json"
+    config_path.write_text(json.dumps({"app": {"working_dir": str(working_dir)}}))
+    env = {**os.environ, WORKING_DIR_ENV: str(working_dir)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "m3u8_codec_forward.main", "--config", str(config_path),
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+         "--log-level", "WARNING"],
+        env=env,
+    )
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+async def run_levels(base_url: str, server_pid: int, origin: SyntheticOrigin, levels: List[int],
+                     args: argparse.Namespace) -> Dict[str, Dict[str, object]]:
+    updater = asyncio.create_task(origin.run(args.update_interval)) if args.update_interval else None
+    try:
+        results = {}
+        for players in levels:
+            print(f"Running {players} players for {args.duration}s...", file=sys.stderr)
+            results[f"players_{players}"] = await run_level(
+                base_url, server_pid, origin.variants, players, args.duration,
+                args.segments_per_poll, args.think_time
+            )
+        return results
+    finally:
+        if updater is not None:
+            updater.cancel()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=str, default="10,50,200",
+                        help="Comma-separated concurrent player counts, one run each")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--bitrates", type=str, default="800,2800,5000",
+                        help="Comma-separated variant bitrates in kbps; sets segment sizes")
+    parser.add_argument("--pool-segments", type=int, default=20, help="Segment files per variant")
+    parser.add_argument("--segments-per-poll", type=int, default=1,
+                        help="Segments each player fetches per playlist request")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Player pause between polls; 0 drives the server flat out")
+    parser.add_argument("--update-interval", type=float, default=1.0,
+                        help="Seconds between playlist rewrites; 0 keeps playlists static")
+    parser.add_argument("--output", type=str, help="Write results as JSON to this path")
+    parser.add_argument("--baseline", type=str, help="Print changes against an earlier results file")
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.players.split(",")]
+    bitrates = [int(bitrate) for bitrate in args.bitrates.split(",")]
+    runtime_dir = Path(tempfile.mkdtemp(prefix="bench-delivery-"))
+    working_dir = runtime_dir / "segments"
+    working_dir.mkdir()
+    origin = SyntheticOrigin(working_dir, bitrates, args.pool_segments)
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(working_dir, runtime_dir, port, args.workers)
+    try:
+        wait_until_ready(base_url, server)
+        results = asyncio.run(run_levels(base_url, server.pid, origin, levels, args))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=STARTUP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "delivery",
+        "workers": args.workers,
+        "bitrates_kbps": bitrates,
+        "segment_duration": SEGMENT_DURATION,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    write_report(report, args.output)
+    if args.baseline:
+        print_diff(args.baseline, report)
+
+    failed = any(
+        level[endpoint]["errors"] for level in results.values()
+        for endpoint in ("serve_playlist", "serve_segment")
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
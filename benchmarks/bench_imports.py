@@ -0,0 +1,91 @@
+"""Import-time benchmark for the CLI and server entry points.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` so the
+numbers reflect a container cold start. Run with::
+
+    python -m benchmarks.bench_imports --output import_times.json --max-cli-ms 400
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+MODULES = [
+    "m3u8_codec_forward.config",
+    "m3u8_codec_forward.main",
+    "m3u8_codec_forward.server",
+]
+
+# Modules the CLI must not pull in before it knows a server will run
+SERVER_STACK = ["fastapi", "uvicorn", "httpx", "m3u8", "yaml"]
+
+
+def measure_import(module: str) -> Dict[str, object]:
+    code = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps(sorted(m for m in {SERVER_STACK!r} if m in sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True
+    )
+
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+
+    return {
+        "cumulative_ms": cumulative_us / 1000.0,
+        "server_stack_loaded": json.loads(result.stdout.strip().splitlines()[-1]),
+    }
+
+
+def run(repeat: int) -> Dict[str, Dict[str, object]]:
+    results = {}
+    for module in MODULES:
+        samples: List[Dict[str, object]] = [measure_import(module) for _ in range(repeat)]
+        timings = [sample["cumulative_ms"] for sample in samples]
+        results[module] = {
+            "median_ms": statistics.median(timings),
+            "min_ms": min(timings),
+            "max_ms": max(timings),
+            "server_stack_loaded": samples[-1]["server_stack_loaded"],
+        }
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--output", type=str, help="Write results as JSON to this path")
+    parser.add_argument("--max-cli-ms", type=float,
+                        help="Fail if importing m3u8_codec_forward.main takes longer than this")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    report = json.dumps({"benchmark": "imports", "results": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+    cli = results["m3u8_codec_forward.main"]
+    if cli["server_stack_loaded"]:
+        print(f"FAIL: CLI import loaded {cli['server_stack_loaded']}", file=sys.stderr)
+        return 1
+    if args.max_cli_ms is not None and cli["median_ms"] > args.max_cli_ms:
+        print(f"FAIL: CLI import took {cli['median_ms']:.1f} ms (limit {args.max_cli_ms} ms)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
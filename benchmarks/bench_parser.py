@@ -0,0 +1,241 @@
+"""Parser scalability benchmark with synthetic giant playlists.
+
+Media playlists of increasing length (with byte ranges, discontinuities and
+key rotations) and master playlists with growing ladders are generated in
+memory and served to ``M3U8Parser.parse_playlist`` through an
+``httpx.MockTransport``, so no network is involved. Run with::
+
+    python -m benchmarks.bench_parser --output parser.json --max-ms-per-1k 20
+    python -m benchmarks.bench_parser --segments 1000,200000 --baseline parser.json
+
+Media playlists report the ``parse_playlist`` time, the time of the line
+parser alone and of building ``StreamInfo`` from its result, and the peak and
+retained memory seen by tracemalloc. ``stream_info_validated_ms`` is the
+cost of passing the segment table through the validating constructor
+instead, which ``parse_playlist`` avoids.
+"""
+
+import argparse
+import asyncio
+import io
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import httpx
+
+from benchmarks._report import write_report, print_diff
+
+from m3u8_codec_forward.models import StreamInfo
+from m3u8_codec_forward.parser import M3U8Parser
+from m3u8_codec_forward.segments import MediaPlaylist, parse_media_playlist
+
+ORIGIN = "http://origin.invalid"
+TARGET_DURATION = 6
+# Every this many segments: a new byte-range file, a key rotation, a discontinuity
+SEGMENTS_PER_FILE = 1000
+SEGMENTS_PER_KEY = 100
+SEGMENTS_PER_DISCONTINUITY = 500
+SEGMENT_BYTES = 750000
+
+
+def generate_media_playlist(segments: int) -> bytes:
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:4",
+        f"#EXT-X-TARGETDURATION:{TARGET_DURATION}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for index in range(segments):
+        if index and index % SEGMENTS_PER_DISCONTINUITY == 0:
+            lines.append("#EXT-X-DISCONTINUITY")
+        if index % SEGMENTS_PER_KEY == 0:
+            key_index = index // SEGMENTS_PER_KEY
+            lines.append(
+                f'#EXT-X-KEY:METHOD=AES-128,URI="https://keys.invalid/key/{key_index}",'
+                f"IV=0x{key_index:032x}"
+            )
+        lines.append(f"#EXTINF:{TARGET_DURATION - (index % 3) * 0.02:.3f},")
+        offset = (index % SEGMENTS_PER_FILE) * SEGMENT_BYTES
+        lines.append(f"#EXT-X-BYTERANGE:{SEGMENT_BYTES}@{offset}")
+        lines.append(f"media/part{index // SEGMENTS_PER_FILE:05d}.ts")
+    lines.append("#EXT-X-ENDLIST")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def generate_master_playlist(variants: int) -> bytes:
+    lines = ["#EXTM3U", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for index in range(variants):
+        height = 144 + (index % 16) * 60
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={200000 + index * 1000},"
+            f"RESOLUTION={height * 16 // 9}x{height},"
+            f'CODECS="avc1.640028,mp4a.40.2",FRAME-RATE=30.000'
+        )
+        lines.append(f"variant_{index}/index.m3u8")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def mock_parser(playlists: Dict[str, bytes]) -> M3U8Parser:
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = playlists.get(request.url.path)
+        if body is None:
+            return httpx.Response(404)
+        return httpx.Response(200, content=body,
+                              headers={"Content-Type": "application/vnd.apple.mpegurl"})
+
+    return M3U8Parser(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def _median_ms(function: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+async def _median_ms_async(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await function()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+async def _memory(function) -> Dict[str, float]:
+    """Peak memory while ``function`` runs and memory still held by its result."""
+    tracemalloc.start()
+    try:
+        result = await function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        "peak_memory_mb": round(peak / 1e6, 3),
+        "retained_memory_mb": round(current / 1e6, 3),
+    }
+
+
+def _build_stream_info(url: str, media: MediaPlaylist) -> StreamInfo:
+    # The way parse_playlist builds it: the table is assigned, not validated
+    stream_info = StreamInfo(url=url)
+    stream_info.segments = media.segments
+    stream_info.target_duration = media.target_duration
+    stream_info.duration = media.segments.total_duration
+    return stream_info
+
+
+async def measure_media(segments: int, repeat: int) -> Dict[str, object]:
+    body = generate_media_playlist(segments)
+    path = f"/media_{segments}.m3u8"
+    url = f"{ORIGIN}{path}"
+    parser = mock_parser({path: body})
+    try:
+        load = lambda: parser.parse_playlist(url, use_cache=False)
+        stream_info = await load()
+        if len(stream_info.segments) != segments:
+            raise RuntimeError(f"Parsed {len(stream_info.segments)} of {segments} segments")
+
+        text = body.decode()
+        base_uri = parser._get_base_uri(url)
+        media = parse_media_playlist(io.StringIO(text), base_uri)
+        parse_playlist_ms = await _median_ms_async(load, repeat)
+        result = {
+            "playlist_bytes": len(body),
+            "parse_playlist_ms": parse_playlist_ms,
+            "parse_playlist_ms_per_1k": round(parse_playlist_ms / segments * 1000, 3),
+            "line_parser_ms": _median_ms(
+                lambda: parse_media_playlist(io.StringIO(text), base_uri), repeat
+            ),
+            "stream_info_ms": _median_ms(lambda: _build_stream_info(url, media), repeat),
+            # Passing the table to the constructor validates every segment URL
+            "stream_info_validated_ms": _median_ms(
+                lambda: StreamInfo(url=url, segments=media.segments,
+                                   target_duration=media.target_duration,
+                                   duration=media.segments.total_duration),
+                repeat
+            ),
+        }
+        result.update(await _memory(load))
+        return result
+    finally:
+        await parser.close()
+
+
+async def measure_master(variants: int, repeat: int) -> Dict[str, object]:
+    body = generate_master_playlist(variants)
+    path = f"/master_{variants}.m3u8"
+    url = f"{ORIGIN}{path}"
+    parser = mock_parser({path: body})
+    try:
+        load = lambda: parser.parse_playlist(url, use_cache=False)
+        stream_info = await load()
+        if len(stream_info.variants) != variants:
+            raise RuntimeError(f"Parsed {len(stream_info.variants)} of {variants} variants")
+
+        result = {
+            "playlist_bytes": len(body),
+            "parse_playlist_ms": await _median_ms_async(load, repeat),
+        }
+        result.update(await _memory(load))
+        return result
+    finally:
+        await parser.close()
+
+
+async def run(segment_counts: List[int], variant_counts: List[int],
+              repeat: int) -> Dict[str, Dict[str, object]]:
+    results = {}
+    for segments in segment_counts:
+        print(f"Parsing media playlist with {segments} segments...", file=sys.stderr)
+        results[f"media_{segments}"] = await measure_media(segments, repeat)
+    for variants in variant_counts:
+        print(f"Parsing master playlist with {variants} variants...", file=sys.stderr)
+        results[f"master_{variants}"] = await measure_master(variants, repeat)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=str, default="10,1000,50000,200000",
+                        help="Comma-separated media playlist lengths")
+    parser.add_argument("--variants", type=str, default="10,100,1000",
+                        help="Comma-separated master playlist ladder sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed parses per playlist")
+    parser.add_argument("--output", type=str, help="Write results as JSON to this path")
+    parser.add_argument("--baseline", type=str, help="Print changes against an earlier results file")
+    parser.add_argument("--max-ms-per-1k", type=float,
+                        help="Fail if any media playlist takes longer than this per 1000 segments")
+    args = parser.parse_args(argv)
+
+    segment_counts = [int(count) for count in args.segments.split(",") if count]
+    variant_counts = [int(count) for count in args.variants.split(",") if count]
+    results = asyncio.run(run(segment_counts, variant_counts, args.repeat))
+    report = {"benchmark": "parser", "repeat": args.repeat, "results": results}
+    write_report(report, args.output)
+    if args.baseline:
+        print_diff(args.baseline, report)
+
+    if args.max_ms_per_1k is not None:
+        # Tiny playlists are dominated by fixed per-request overhead
+        slow = [
+            name for name, result in results.items()
+            if name.startswith("media_") and int(name[6:]) >= 1000
+            and result["parse_playlist_ms_per_1k"] > args.max_ms_per_1k
+        ]
+        if slow:
+            print(f"Parsing exceeded {args.max_ms_per_1k} ms per 1k segments: {', '.join(slow)}",
+                  file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
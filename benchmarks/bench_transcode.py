@@ -0,0 +1,270 @@
+"""End-to-end transcode throughput benchmark for the default presets.
+
+A synthetic source is rendered from ffmpeg's ``lavfi`` test sources into a
+local HLS VOD stream and served over loopback, so the run is fully offline.
+Each preset is then transcoded by ``TranscodingEngine`` with input pacing
+off. Run with::
+
+    python -m benchmarks.bench_transcode --output transcode.json --seconds 20
+    python -m benchmarks.bench_transcode --presets standard --baseline transcode.json
+
+Reported per preset: realtime factor, CPU seconds per output minute,
+time-to-first-segment per variant, peak RSS and bytes written. Progressive
+variants are piped into memory rather than written to disk, so for them the
+first output chunk and the bytes the encoder produced are reported instead.
+"""
+
+import argparse
+import asyncio
+import functools
+import http.server
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks._report import write_report, print_diff
+
+from m3u8_codec_forward.config import ConfigManager
+from m3u8_codec_forward.models import ContainerFormat, StreamVariant, TranscodingConfig
+from m3u8_codec_forward.progressive import ProgressiveStream
+from m3u8_codec_forward.transcoder import TranscodingEngine
+
+SOURCE_WIDTH = 1920
+SOURCE_HEIGHT = 1080
+SOURCE_FRAMERATE = 30
+SOURCE_SEGMENT_SECONDS = 2
+POLL_INTERVAL = 0.05
+# ffmpeg's dash muxer names media segments chunk-stream<N>-<number>.m4s
+CMAF_SEGMENT_PREFIX = "chunk-"
+# Containers the engine pipes into an in-memory ProgressiveStream instead of writing to disk
+PROGRESSIVE_CONTAINERS = {
+    ContainerFormat.MP4, ContainerFormat.MKV, ContainerFormat.WEBM, ContainerFormat.FLV, ContainerFormat.AVI,
+}
+
+
+def render_source(directory: Path, seconds: int) -> None:
+    """Render a testsrc2 + sine HLS VOD stream with a one-variant master playlist."""
+    media_dir = directory / "source"
+    media_dir.mkdir(parents=True)
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i",
+        f"testsrc2=size={SOURCE_WIDTH}x{SOURCE_HEIGHT}:rate={SOURCE_FRAMERATE}:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=1000:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", str(SOURCE_FRAMERATE * SOURCE_SEGMENT_SECONDS),
+        "-c:a", "aac",
+        "-f", "hls", "-hls_time", str(SOURCE_SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+        str(media_dir / "index.m3u8"),
+    ], check=True, capture_output=True)
+    (directory / "master.m3u8").write_text(
+        "#EXTM3U\n"
+        f"#EXT-X-STREAM-INF:BANDWIDTH=8000000,RESOLUTION={SOURCE_WIDTH}x{SOURCE_HEIGHT}\n"
+        "source/index.m3u8\n"
+    )
+
+
+def serve_directory(directory: Path) -> http.server.ThreadingHTTPServer:
+    handler = functools.partial(_QuietHandler, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class _OutputWatcher:
+    """Samples encoder output files, progressive streams and memory while a preset runs."""
+
+    def __init__(self, engine: TranscodingEngine, variants: List[StreamVariant]):
+        self.engine = engine
+        self.variants = variants
+        self.started = time.perf_counter()
+        self.first_segment: Dict[str, float] = {}
+        self.file_sizes: Dict[str, int] = {}
+        # The engine drops a variant's stream when it stops; keep it for the totals
+        self.streams: Dict[str, ProgressiveStream] = {}
+        self.peak_rss_kb = 0
+
+    def _record_sizes(self, directory: Path, prefix: str = ""):
+        try:
+            paths = list(directory.iterdir())
+        except FileNotFoundError:
+            return
+        for path in paths:
+            if path.is_dir():
+                continue
+            key = prefix + path.name
+            try:
+                self.file_sizes[key] = max(self.file_sizes.get(key, 0), path.stat().st_size)
+            except FileNotFoundError:
+                continue
+
+    def sample(self):
+        now = time.perf_counter() - self.started
+        self._record_sizes(self.engine.working_dir)
+        for variant in self.variants:
+            if variant.container == ContainerFormat.CMAF:
+                # Manifests and segments live in a directory per variant
+                name = variant.variant_name
+                self._record_sizes(self.engine.working_dir / name, f"{name}/")
+        for name, stream in self.engine.progressive_streams.items():
+            self.streams.setdefault(name, stream)
+
+        for variant in self.variants:
+            name = variant.variant_name
+            if name in self.first_segment:
+                continue
+            if variant.container in PROGRESSIVE_CONTAINERS:
+                ready = name in self.streams and self.streams[name].bytes_fed > 0
+            elif variant.container == ContainerFormat.CMAF:
+                ready = any(
+                    file.startswith(f"{name}/{CMAF_SEGMENT_PREFIX}") and size > 0
+                    for file, size in self.file_sizes.items()
+                )
+            else:
+                ready = any(
+                    file.startswith(f"{name}_") and size > 0 for file, size in self.file_sizes.items()
+                )
+            if ready:
+                self.first_segment[name] = round(now, 3)
+
+        rss = sum(_rss_kb(process.pid) for process in self.engine.active_processes.values())
+        self.peak_rss_kb = max(self.peak_rss_kb, rss)
+
+    def bytes_written(self, variant: StreamVariant) -> int:
+        name = variant.variant_name
+        if variant.container in PROGRESSIVE_CONTAINERS:
+            stream = self.streams.get(name)
+            return stream.bytes_fed if stream is not None else 0
+        if variant.container == ContainerFormat.CMAF:
+            return sum(size for file, size in self.file_sizes.items() if file.startswith(f"{name}/"))
+        return sum(
+            size for file, size in self.file_sizes.items()
+            if file == f"{name}.m3u8" or file.startswith(f"{name}_")
+        )
+
+
+async def run_preset(name: str, variants: List[StreamVariant], input_url: str,
+                     source_seconds: int) -> Dict[str, object]:
+    working_dir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    # hls_list_size 0 keeps every segment so bytes written can be totalled
+    engine = TranscodingEngine(working_dir, playlist_size=0, read_realtime=False)
+    watcher = _OutputWatcher(engine, variants)
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    try:
+        await engine.start_transcoding(TranscodingConfig(input_url=input_url, output_variants=variants))
+        processes = list(engine.active_processes.items())
+        waiter = asyncio.gather(*(process.wait() for _, process in processes))
+        while not waiter.done():
+            watcher.sample()
+            await asyncio.sleep(POLL_INTERVAL)
+        await waiter
+        watcher.sample()
+        wall_seconds = time.perf_counter() - watcher.started
+        failed = [variant_name for variant_name, process in processes if process.returncode != 0]
+    finally:
+        # Also removes the working directory
+        await engine.close()
+
+    usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    output_minutes = source_seconds * len(variants) / 60
+
+    bytes_written = {variant.variant_name: watcher.bytes_written(variant) for variant in variants}
+    return {
+        "variants": len(variants),
+        "wall_seconds": round(wall_seconds, 3),
+        "realtime_factor": round(source_seconds / wall_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "cpu_seconds_per_output_minute": round(cpu_seconds / output_minutes, 3),
+        "time_to_first_segment_seconds": watcher.first_segment,
+        "peak_rss_kb": watcher.peak_rss_kb,
+        # Largest single encoder over the whole benchmark process so far
+        "max_encoder_rss_kb": usage_after.ru_maxrss,
+        "bytes_written": {**bytes_written, "total": sum(bytes_written.values())},
+        "failed_variants": failed,
+    }
+
+
+async def run(presets: Optional[List[str]], seconds: int) -> Dict[str, Dict[str, object]]:
+    config_manager = ConfigManager()
+    names = presets or config_manager.list_presets()
+
+    source_dir = Path(tempfile.mkdtemp(prefix="bench-source-"))
+    server = None
+    try:
+        render_source(source_dir, seconds)
+        server = serve_directory(source_dir)
+        input_url = f"http://127.0.0.1:{server.server_address[1]}/master.m3u8"
+
+        results = {}
+        for name in names:
+            plan = config_manager.get_plan(name)
+            if plan is None:
+                raise SystemExit(f"Unknown preset: {name}")
+            print(f"Transcoding preset {name} ({len(plan.variants)} variants)...", file=sys.stderr)
+            try:
+                results[name] = await run_preset(name, list(plan.variants), input_url, seconds)
+            except Exception as e:
+                # Keep measuring the other presets, e.g. when an encoder is missing
+                results[name] = {"error": str(e)}
+        return results
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=20, help="Length of the synthetic source")
+    parser.add_argument("--presets", type=str, help="Comma-separated presets (default: all)")
+    parser.add_argument("--output", type=str, help="Write results as JSON to this path")
+    parser.add_argument("--baseline", type=str, help="Print changes against an earlier results file")
+    args = parser.parse_args(argv)
+
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg not found on PATH", file=sys.stderr)
+        return 1
+
+    presets = args.presets.split(",") if args.presets else None
+    results = asyncio.run(run(presets, args.seconds))
+    report = {
+        "benchmark": "transcode",
+        "source": {"seconds": args.seconds, "resolution": f"{SOURCE_WIDTH}x{SOURCE_HEIGHT}",
+                   "framerate": SOURCE_FRAMERATE},
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    write_report(report, args.output)
+    if args.baseline:
+        print_diff(args.baseline, report)
+
+    failed = any(result.get("error") or result.get("failed_variants") for result in results.values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
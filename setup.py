@@ -11,7 +11,6 @@ setup(
         "uvicorn>=0.24.0",
         "httpx>=0.23.3,<0.24.0",
         "m3u8>=3.5.0",
-        "ffmpeg-python>=0.2.0",
         "pydantic>=2.5.0",
     ],
     extras_require={
@@ -19,7 +18,16 @@ setup(
             "pytest>=7.4.3",
             "pytest-asyncio>=0.21.1",
             "pytest-httpx>=0.21.2",
-        ]
+        ],
+        "yaml": [
+            "pyyaml>=6.0",
+        ],
+        "http2": [
+            "httpx[http2]>=0.23.3,<0.24.0",
+        ],
+        "brotli": [
+            "brotli>=1.0.9",
+        ],
     },
     python_requires=">=3.8",
 )
\ No newline at end of file
@@ -0,0 +1,107 @@
+import math
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional
+
+from .segments import parse_media_playlist
+
+# Segments written to one media file before the encoder moves on to the next
+DEFAULT_SEGMENTS_PER_FILE = 600
+
+
+class _Entry(NamedTuple):
+    generation: int
+    uri: str
+    duration: float
+    length: int
+    offset: int
+    map: Optional[str]  # raw EXT-X-MAP attributes
+    discontinuity: bool
+
+
+class ByteRangePlaylist:
+    """Live playlist over a variant's append-only media files.
+
+    Every encoder run (a generation) appends its segments to one file and
+    lists them as byte ranges in its own playlist. This keeps the latest
+    ``window`` segments across generations, numbered continuously, with a
+    discontinuity where each new generation starts, so the playlist players
+    see carries on when the encoder moves to a new file.
+    """
+    
+    def __init__(self, window: int):
+        self.window = window
+        self.media_sequence = 0
+        self.discontinuity_sequence = 0
+        self._entries: Deque[_Entry] = deque()
+        # Next sequence number to take from each generation's own playlist,
+        # and how many segments each generation has produced
+        self._next: Dict[int, int] = {}
+        self._counts: Dict[int, int] = {}
+    
+    def update(self, generation: int, lines: Iterable[str]) -> int:
+        """Take the new segments of a generation's playlist; returns how many there were."""
+        table = parse_media_playlist(lines, "").segments
+        start = self._next.get(generation, table.media_sequence)
+        maps = dict(table.maps)
+        active_map = None
+        added = 0
+        for index in range(len(table)):
+            active_map = maps.get(index, active_map)
+            if table.sequence(index) < start:
+                continue
+            byterange = table.byterange(index)
+            if byterange is None:
+                raise ValueError(f"Segment {table.path(index)} has no byte range")
+            first = self._counts.get(generation, 0) == 0
+            self._entries.append(_Entry(
+                generation, table.path(index), table.duration(index), byterange[0], byterange[1],
+                active_map, first and bool(self._entries)
+            ))
+            self._counts[generation] = self._counts.get(generation, 0) + 1
+            added += 1
+        self._next[generation] = table.sequence(len(table))
+        
+        while len(self._entries) > self.window:
+            if self._entries.popleft().discontinuity:
+                self.discontinuity_sequence += 1
+            self.media_sequence += 1
+        return added
+    
+    def segment_count(self, generation: int) -> int:
+        return self._counts.get(generation, 0)
+    
+    def release(self) -> List[int]:
+        """Forget generations no longer in the window; their files can be deleted."""
+        if not self._entries:
+            return []
+        oldest = self._entries[0].generation
+        released = [generation for generation in self._next if generation < oldest]
+        for generation in released:
+            del self._next[generation]
+            self._counts.pop(generation, None)
+        return released
+    
+    def render(self) -> str:
+        has_maps = any(entry.map is not None for entry in self._entries)
+        target_duration = max((entry.duration for entry in self._entries), default=0)
+        lines = [
+            "#EXTM3U",
+            # ffmpeg writes version 7 for fMP4 init sections
+            f"#EXT-X-VERSION:{7 if has_maps else 4}",
+            f"#EXT-X-TARGETDURATION:{math.ceil(target_duration)}",
+            f"#EXT-X-MEDIA-SEQUENCE:{self.media_sequence}",
+        ]
+        if self.discontinuity_sequence:
+            lines.append(f"#EXT-X-DISCONTINUITY-SEQUENCE:{self.discontinuity_sequence}")
+        
+        current_map = None
+        for entry in self._entries:
+            if entry.discontinuity:
+                lines.append("#EXT-X-DISCONTINUITY")
+            if entry.map is not None and entry.map != current_map:
+                lines.append(f"#EXT-X-MAP:{entry.map}")
+                current_map = entry.map
+            lines.append(f"#EXTINF:{entry.duration:.6f},")
+            lines.append(f"#EXT-X-BYTERANGE:{entry.length}@{entry.offset}")
+            lines.append(entry.uri)
+        return "\n".join(lines) + "\n"
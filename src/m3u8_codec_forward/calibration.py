@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import resource
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .encoders import video_encoder, codec_specific_params, max_speed_level, speed_setting
+from .models import StreamVariant, DEFAULT_FRAMERATE
+
+logger = logging.getLogger(__name__)
+
+COST_TABLE_VERSION = 2
+DEFAULT_COST_TABLE_PATH = "cost_table.json"
+DEFAULT_CLIP_SECONDS = 5.0
+
+
+def cost_key(variant: StreamVariant, speed_level: int = 0) -> str:
+    """Calibration key: the settings that drive encoding cost. Bitrate barely does."""
+    framerate = variant.framerate or DEFAULT_FRAMERATE
+    key = f"{variant.codec.value}_{variant.resolution}_{framerate:g}"
+    setting = speed_setting(variant.codec, speed_level)
+    if setting is not None:
+        # Speed presets change the cost several times over
+        option, value = setting
+        key += f"_{option.lstrip('-')}-{value}"
+    return key
+
+
+class CostTable:
+    """Measured encoder costs, keyed by ``cost_key``.
+
+    ``cores`` is the number of CPU cores a variant keeps busy when encoding
+    in real time, which is what scheduling and admission need. Each speed
+    level is measured separately; a level that wasn't falls back to the
+    default level's cost, which the faster settings stay below.
+    """
+    
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None,
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+        self.metadata: Dict[str, Any] = metadata or {}
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def __contains__(self, variant: StreamVariant) -> bool:
+        return cost_key(variant) in self.entries
+    
+    def cores(self, variant: StreamVariant, speed_level: int = 0) -> Optional[float]:
+        entry = self.entries.get(cost_key(variant, speed_level))
+        if entry is None and speed_level:
+            entry = self.entries.get(cost_key(variant))
+        return entry["cores"] if entry else None
+    
+    def plan_cores(self, variants: Iterable[StreamVariant]) -> Optional[float]:
+        """Cores for a whole ladder, or None if any variant was not calibrated."""
+        total = 0.0
+        for variant in variants:
+            cores = self.cores(variant)
+            if cores is None:
+                return None
+            total += cores
+        return round(total, 3)
+    
+    def save(self, path: str):
+        data = {"version": COST_TABLE_VERSION, **self.metadata, "entries": self.entries}
+        Path(path).write_text(json.dumps(data, indent=2, sort_keys=True))
+    
+    @classmethod
+    def load(cls, path: str) -> "CostTable":
+        data = json.loads(Path(path).read_text())
+        if data.get("version") != COST_TABLE_VERSION:
+            raise ValueError(f"Unsupported cost table version in {path}: {data.get('version')}")
+        entries = data.pop("entries", {})
+        data.pop("version")
+        return cls(entries, data)
+
+
+def load_cost_table(path: Optional[str]) -> Optional[CostTable]:
+    """Load the cost table if one is configured; a missing or bad table only disables cost checks."""
+    if not path:
+        return None
+    try:
+        table = CostTable.load(path)
+    except FileNotFoundError:
+        logger.warning(f"Cost table {path} not found; run --calibrate to create it")
+        return None
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable cost table {path}: {e}")
+        return None
+    logger.info(f"Loaded encoder cost table with {len(table)} entries from {path}")
+    return table
+
+
+def build_calibration_command(variant: StreamVariant, seconds: float,
+                              ffmpeg: str = "ffmpeg", speed_level: int = 0) -> List[str]:
+    """Encode a synthetic testsrc2 clip with the variant's video settings, discarding the output."""
+    framerate = variant.framerate or DEFAULT_FRAMERATE
+    source = (
+        f"testsrc2=size={variant.resolution}:rate={framerate:g}:duration={seconds:g}"
+    )
+    return [
+        ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", source,
+        "-c:v", video_encoder(variant.codec),
+        "-b:v", f"{variant.bitrate}k",
+        *codec_specific_params(variant.codec, speed_level),
+        "-an", "-f", "null", "-",
+    ]
+
+
+def calibrate_variant(variant: StreamVariant, seconds: float = DEFAULT_CLIP_SECONDS,
+                      ffmpeg: str = "ffmpeg", speed_level: int = 0) -> Dict[str, Any]:
+    framerate = variant.framerate or DEFAULT_FRAMERATE
+    cmd = build_calibration_command(variant, seconds, ffmpeg, speed_level)
+    
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    subprocess.run(cmd, check=True, capture_output=True)
+    wall_seconds = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    
+    cpu_seconds = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    frames = max(int(round(seconds * framerate)), 1)
+    cpu_per_frame = cpu_seconds / frames
+    return {
+        "codec": variant.codec.value,
+        "encoder": video_encoder(variant.codec),
+        "width": variant.resolution.width,
+        "height": variant.resolution.height,
+        "framerate": framerate,
+        "speed_level": speed_level,
+        "encoder_args": codec_specific_params(variant.codec, speed_level),
+        "frames": frames,
+        "wall_seconds": round(wall_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "fps": round(frames / wall_seconds, 2),
+        "speed": round(seconds / wall_seconds, 3),
+        "cpu_seconds_per_frame": round(cpu_per_frame, 6),
+        # Cores kept busy when encoding in real time
+        "cores": round(cpu_per_frame * framerate, 3),
+    }
+
+
+def calibrate(variants: Iterable[StreamVariant], seconds: float = DEFAULT_CLIP_SECONDS,
+              ffmpeg: str = "ffmpeg", speed_levels: bool = True) -> CostTable:
+    """Measure every distinct cost key among ``variants``. Runs offline.
+    
+    With ``speed_levels`` every step of a codec's speed ladder is measured,
+    not only the default settings.
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    runs = (
+        (variant, speed_level)
+        for variant in variants
+        for speed_level in range((max_speed_level(variant.codec) if speed_levels else 0) + 1)
+    )
+    for variant, speed_level in runs:
+        key = cost_key(variant, speed_level)
+        if key in entries:
+            continue
+        try:
+            entries[key] = calibrate_variant(variant, seconds, ffmpeg, speed_level)
+        except subprocess.CalledProcessError as e:
+            # Encoder missing from this ffmpeg build
+            logger.warning(f"Calibration of {key} failed: {e.stderr.decode(errors='replace').strip()}")
+            continue
+        logger.info(f"Calibrated {key}: {entries[key]['fps']} fps, {entries[key]['cores']} cores")
+    
+    metadata = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "clip_seconds": seconds,
+    }
+    return CostTable(entries, metadata)
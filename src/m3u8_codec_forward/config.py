@@ -1,10 +1,10 @@
 import json
-import yaml
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from pydantic import BaseModel, ValidationError
 
-from .models import StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
+from .models import StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat, VariantPriority
+from .plan import EncoderPlan
 
 
 class AppConfig(BaseModel):
@@ -15,6 +15,42 @@ class AppConfig(BaseModel):
     max_concurrent_streams: int = 5
     segment_duration: int = 6
     playlist_size: int = 10
+    # Ladder used when a start request names neither a preset nor variants
+    default_preset: str = "default"
+    # Encoder cost table written by --calibrate; enables admission control
+    cost_table: Optional[str] = None
+    # CPU cores encoders may use in total (defaults to all cores)
+    max_encoder_cores: Optional[float] = None
+    # Fetch each source segment once and feed all encoders from a local relay
+    shared_ingest: bool = False
+    ingest_lookahead: int = 3
+    # Recent stream start-up traces kept for GET /traces
+    trace_buffer_size: int = 100
+    # Append completed traces to this file as OTLP/JSON
+    trace_export_path: Optional[str] = None
+    # Admin endpoints for loop stall reports and sampling profiles
+    enable_profiling: bool = False
+    loop_stall_threshold: float = 0.1
+    # Drop or cap variants above the source's resolution, frame rate and bitrate
+    fit_ladder_to_source: bool = True
+    # Step encoders to faster settings while they fall behind real time
+    adaptive_speed: bool = False
+    speed_slow_threshold: float = 0.95
+    speed_recover_threshold: float = 0.99
+    # In ffmpeg progress reports, about two a second
+    speed_window: int = 10
+    speed_recover_reports: int = 120
+    # Stop optional, then normal-priority variants while the node stays overloaded
+    load_shedding: bool = False
+    shed_cpu_threshold: float = 0.95
+    shed_speed_threshold: float = 0.9
+    shed_after: float = 15.0
+    restore_after: float = 60.0
+    # Recent output kept in memory per progressive stream for clients that fall behind
+    progressive_buffer_mb: float = 8.0
+    # Append each HLS variant's segments to one file per encoder run, listed as byte ranges
+    single_file_output: bool = False
+    segments_per_file: int = 600
 
 
 class PresetConfig(BaseModel):
@@ -27,6 +63,7 @@ class ConfigManager:
         self.config_path = Path(config_path) if config_path else None
         self.app_config = AppConfig()
         self.presets: Dict[str, PresetConfig] = {}
+        self._plans: Dict[str, EncoderPlan] = {}
         self._load_default_presets()
     
     def load_config(self, config_path: str):
@@ -40,8 +77,7 @@ class ConfigManager:
                 with open(config_file, 'r') as f:
                     config_data = json.load(f)
             elif config_file.suffix.lower() in ['.yaml', '.yml']:
-                with open(config_file, 'r') as f:
-                    config_data = yaml.safe_load(f)
+                config_data = self._load_yaml(config_file)
             else:
                 raise ValueError("Config file must be JSON or YAML")
             
@@ -54,11 +90,83 @@ class ConfigManager:
                 for preset_data in config_data['presets']:
                     preset = PresetConfig(**preset_data)
                     self.presets[preset.name] = preset
-                    
-        except (json.JSONDecodeError, yaml.YAMLError, ValidationError) as e:
+                self._plans.clear()
+        
+        except (json.JSONDecodeError, ValidationError) as e:
+            raise ValueError(f"Invalid config file format: {e}")
+    
+    def reload(self) -> "ConfigManager":
+        """Read the config file again into a new manager.
+        
+        This manager is left untouched, so a broken file never replaces a
+        working configuration. Blocking: run it off the event loop.
+        """
+        if self.config_path is None:
+            raise ValueError("No config file to reload")
+        
+        fresh = ConfigManager(str(self.config_path))
+        fresh.load_config(str(self.config_path))
+        return fresh
+    
+    @staticmethod
+    def _import_yaml():
+        # PyYAML is only needed for YAML configs, so keep it off the startup path
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("PyYAML is required for YAML config files (pip install pyyaml)")
+        return yaml
+    
+    def _load_yaml(self, config_file: Path) -> Dict[str, Any]:
+        yaml = self._import_yaml()
+        try:
+            with open(config_file, 'r') as f:
+                return yaml.safe_load(f)
+        except yaml.YAMLError as e:
             raise ValueError(f"Invalid config file format: {e}")
     
     def _load_default_presets(self):
+        # Ladder the server used before presets were selectable
+        self.presets["default"] = PresetConfig(
+            name="default",
+            variants=[
+                StreamVariant(
+                    codec=CodecType.H264,
+                    audio_codec=AudioCodec.AAC_LC,
+                    resolution=Resolution(width=1920, height=1080),
+                    bitrate=5000,
+                    framerate=30.0,
+                    container=ContainerFormat.TS
+                ),
+                StreamVariant(
+                    codec=CodecType.H264,
+                    audio_codec=AudioCodec.AAC_LC,
+                    resolution=Resolution(width=1280, height=720),
+                    bitrate=3000,
+                    framerate=30.0,
+                    container=ContainerFormat.TS,
+                    priority=VariantPriority.ESSENTIAL
+                ),
+                StreamVariant(
+                    codec=CodecType.H265,
+                    audio_codec=AudioCodec.AAC_LC,
+                    resolution=Resolution(width=1920, height=1080),
+                    bitrate=3000,
+                    framerate=30.0,
+                    container=ContainerFormat.FMP4
+                ),
+                StreamVariant(
+                    codec=CodecType.VP9,
+                    audio_codec=AudioCodec.OPUS,
+                    resolution=Resolution(width=1280, height=720),
+                    bitrate=2500,
+                    framerate=30.0,
+                    container=ContainerFormat.WEBM,
+                    priority=VariantPriority.OPTIONAL
+                )
+            ]
+        )
+        
         # Default quality presets
         self.presets["standard"] = PresetConfig(
             name="standard",
@@ -85,7 +193,8 @@ class ConfigManager:
                     resolution=Resolution(width=854, height=480),
                     bitrate=1500,
                     framerate=30.0,
-                    container=ContainerFormat.TS
+                    container=ContainerFormat.TS,
+                    priority=VariantPriority.ESSENTIAL
                 )
             ]
         )
@@ -115,7 +224,8 @@ class ConfigManager:
                     resolution=Resolution(width=1280, height=720),
                     bitrate=2500,
                     framerate=30.0,
-                    container=ContainerFormat.WEBM
+                    container=ContainerFormat.WEBM,
+                    priority=VariantPriority.OPTIONAL
                 )
             ]
         )
@@ -129,7 +239,8 @@ class ConfigManager:
                     resolution=Resolution(width=1920, height=1080),
                     bitrate=5000,
                     framerate=30.0,
-                    container=ContainerFormat.TS
+                    container=ContainerFormat.TS,
+                    priority=VariantPriority.ESSENTIAL
                 ),
                 StreamVariant(
                     codec=CodecType.H265,
@@ -145,7 +256,8 @@ class ConfigManager:
                     resolution=Resolution(width=1280, height=720),
                     bitrate=2500,
                     framerate=30.0,
-                    container=ContainerFormat.WEBM
+                    container=ContainerFormat.WEBM,
+                    priority=VariantPriority.OPTIONAL
                 ),
                 StreamVariant(
                     codec=CodecType.AV1,
@@ -153,7 +265,8 @@ class ConfigManager:
                     resolution=Resolution(width=1280, height=720),
                     bitrate=2000,
                     framerate=30.0,
-                    container=ContainerFormat.FMP4
+                    container=ContainerFormat.FMP4,
+                    priority=VariantPriority.OPTIONAL
                 )
             ]
         )
@@ -218,6 +331,48 @@ class ConfigManager:
             ]
         )
         
+        # One encode per rung, served as both HLS and DASH
+        self.presets["cmaf"] = PresetConfig(
+            name="cmaf",
+            variants=[
+                StreamVariant(
+                    codec=CodecType.H264,
+                    audio_codec=AudioCodec.AAC_LC,
+                    resolution=Resolution(width=1920, height=1080),
+                    bitrate=5000,
+                    framerate=30.0,
+                    container=ContainerFormat.CMAF
+                ),
+                StreamVariant(
+                    codec=CodecType.H264,
+                    audio_codec=AudioCodec.AAC_LC,
+                    resolution=Resolution(width=1280, height=720),
+                    bitrate=3000,
+                    framerate=30.0,
+                    container=ContainerFormat.CMAF,
+                    priority=VariantPriority.ESSENTIAL
+                ),
+                StreamVariant(
+                    codec=CodecType.VP9,
+                    audio_codec=AudioCodec.OPUS,
+                    resolution=Resolution(width=1920, height=1080),
+                    bitrate=3500,
+                    framerate=30.0,
+                    container=ContainerFormat.CMAF,
+                    priority=VariantPriority.OPTIONAL
+                ),
+                StreamVariant(
+                    codec=CodecType.AV1,
+                    audio_codec=AudioCodec.OPUS,
+                    resolution=Resolution(width=1920, height=1080),
+                    bitrate=2500,
+                    framerate=30.0,
+                    container=ContainerFormat.CMAF,
+                    priority=VariantPriority.OPTIONAL
+                )
+            ]
+        )
+        
         self.presets["audio_focus"] = PresetConfig(
             name="audio_focus",
             variants=[
@@ -254,6 +409,16 @@ class ConfigManager:
     def list_presets(self) -> List[str]:
         return list(self.presets.keys())
     
+    def get_plan(self, preset_name: str) -> Optional[EncoderPlan]:
+        """Compiled plan for a preset, built on first use and reused afterwards."""
+        plan = self._plans.get(preset_name)
+        if plan is None:
+            preset = self.presets.get(preset_name)
+            if preset is None:
+                return None
+            plan = self._plans[preset_name] = EncoderPlan(preset.name, preset.variants)
+        return plan
+    
     def save_config(self, output_path: str):
         config_data = {
             "app": self.app_config.model_dump(),
@@ -266,6 +431,7 @@ class ConfigManager:
             with open(output_file, 'w') as f:
                 json.dump(config_data, f, indent=2)
         elif output_file.suffix.lower() in ['.yaml', '.yml']:
+            yaml = self._import_yaml()
             with open(output_file, 'w') as f:
                 yaml.dump(config_data, f, default_flow_style=False)
         else:
@@ -0,0 +1,100 @@
+from typing import Dict, List, Optional, Tuple
+
+from .models import CodecType, AudioCodec
+
+
+VIDEO_ENCODERS: Dict[CodecType, str] = {
+    # Modern video codecs
+    CodecType.H264: "libx264",
+    CodecType.H265: "libx265", 
+    CodecType.AV1: "libaom-av1",
+    CodecType.VP9: "libvpx-vp9",
+    CodecType.VP8: "libvpx",
+    
+    # Legacy video codecs
+    CodecType.MPEG4: "mpeg4",
+    CodecType.MPEG2: "mpeg2video",
+    CodecType.MPEG1: "mpeg1video",
+    CodecType.H263: "h263",
+    CodecType.SORENSON_SPARK: "flv1",
+    CodecType.VP6: "vp6",
+    CodecType.VC1: "vc1",
+    CodecType.THEORA: "libtheora",
+    CodecType.REALVIDEO: "rv40",
+    CodecType.CINEPAK: "cinepak",
+    CodecType.INDEO: "indeo3",
+    CodecType.MSVIDEO1: "msvideo1"
+}
+
+AUDIO_ENCODERS: Dict[AudioCodec, str] = {
+    # Modern audio codecs
+    AudioCodec.AAC_LC: "aac",
+    AudioCodec.AAC: "aac",  # Alias
+    AudioCodec.HE_AAC: "libfdk_aac",
+    AudioCodec.XHE_AAC: "libfdk_aac",
+    AudioCodec.AC3: "ac3",
+    AudioCodec.EAC3: "eac3",
+    AudioCodec.MP3: "libmp3lame",
+    AudioCodec.OPUS: "libopus",
+    AudioCodec.VORBIS: "libvorbis",
+    
+    # Legacy audio codecs
+    AudioCodec.MP2: "mp2",
+    AudioCodec.MP1: "mp1",
+    AudioCodec.WMA1: "wmav1",
+    AudioCodec.WMA2: "wmav2",
+    AudioCodec.REALAUDIO: "ra_144"
+}
+
+
+def video_encoder(codec: CodecType) -> str:
+    return VIDEO_ENCODERS.get(codec, "libx264")
+
+
+def audio_encoder(codec: AudioCodec) -> str:
+    return AUDIO_ENCODERS.get(codec, "aac")
+
+
+# Speed settings per codec, from the default towards the fastest, as the
+# option and its values. Level 0 is the setting used when not under load.
+SPEED_LADDERS: Dict[CodecType, Tuple[str, Tuple[str, ...]]] = {
+    CodecType.H264: ("-preset", ("fast", "faster", "veryfast", "superfast", "ultrafast")),
+    CodecType.H265: ("-preset", ("fast", "faster", "veryfast", "superfast", "ultrafast")),
+    CodecType.VP9: ("-cpu-used", ("4", "5", "6", "7", "8")),
+    CodecType.VP8: ("-cpu-used", ("4", "6", "8", "12", "16")),
+    # libaom-av1 has no -preset; its speed is -cpu-used, 0 (slowest) to 8
+    CodecType.AV1: ("-cpu-used", ("4", "5", "6", "7", "8")),
+}
+
+
+def max_speed_level(codec: CodecType) -> int:
+    ladder = SPEED_LADDERS.get(codec)
+    return len(ladder[1]) - 1 if ladder else 0
+
+
+def speed_setting(codec: CodecType, speed_level: int = 0) -> Optional[Tuple[str, str]]:
+    """Speed option and value used at ``speed_level``, or None for codecs without a ladder."""
+    ladder = SPEED_LADDERS.get(codec)
+    if ladder is None:
+        return None
+    option, values = ladder
+    return option, values[min(speed_level, len(values) - 1)]
+
+
+def codec_specific_params(codec: CodecType, speed_level: int = 0) -> List[str]:
+    """Get codec-specific parameters for better quality/performance"""
+    if codec in [CodecType.H264, CodecType.H265]:
+        params = ["-preset", "fast", "-g", "30", "-sc_threshold", "0"]
+    elif codec == CodecType.VP9:
+        params = ["-deadline", "realtime", "-cpu-used", "4"]
+    elif codec == CodecType.VP8:
+        params = ["-deadline", "realtime", "-cpu-used", "4"]
+    elif codec == CodecType.AV1:
+        params = ["-cpu-used", "4", "-g", "30"]
+    else:
+        params = ["-g", "30"]
+    
+    if speed_level > 0 and codec in SPEED_LADDERS:
+        option, values = SPEED_LADDERS[codec]
+        params[params.index(option) + 1] = values[min(speed_level, len(values) - 1)]
+    return params
@@ -0,0 +1,139 @@
+import asyncio
+import io
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlencode, urlparse, urlunparse, parse_qsl
+
+import httpx
+
+from .parser import M3U8Parser, base_uri
+from .segments import MediaPlaylist, Segment, absolute_uri_attribute, parse_media_playlist
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_DURATION = 6.0
+MIN_POLL_INTERVAL = 0.5
+MAX_CONSECUTIVE_ERRORS = 5
+
+
+class LivePlaylistTracker:
+    """Follows a live media playlist and yields only newly published segments.
+
+    Polls on the cadence the HLS spec asks clients to use (one target
+    duration after a change, half of it when nothing changed), tracks
+    EXT-X-MEDIA-SEQUENCE across refreshes and, when the origin advertises
+    CAN-SKIP-UNTIL, requests ``_HLS_skip=YES`` delta playlists so each
+    refresh only transfers and parses the tail of the playlist.
+
+    Iteration ends once the playlist carries EXT-X-ENDLIST.
+    """
+    
+    def __init__(self, parser: M3U8Parser, url: str, delta_updates: bool = True,
+                 min_poll_interval: float = MIN_POLL_INTERVAL):
+        self.parser = parser
+        self.url = url
+        self.delta_updates = delta_updates
+        self.min_poll_interval = min_poll_interval
+        self.last_sequence: Optional[int] = None
+        self.target_duration: Optional[float] = None
+        self.can_skip_until: Optional[float] = None
+        self.endlist = False
+        # Latest EXT-X-MAP attributes with an absolute URI (fMP4 sources)
+        self.init_map: Optional[str] = None
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+    
+    def __aiter__(self) -> AsyncIterator[Segment]:
+        return self.segments()
+    
+    async def segments(self) -> AsyncIterator[Segment]:
+        errors = 0
+        while True:
+            try:
+                new_segments = await self.refresh()
+                errors = 0
+            except Exception as e:
+                errors += 1
+                if errors >= MAX_CONSECUTIVE_ERRORS:
+                    raise
+                logger.warning(f"Refreshing {self.url} failed ({errors}/{MAX_CONSECUTIVE_ERRORS}): {e}")
+                new_segments = []
+            
+            for segment in new_segments:
+                yield segment
+            
+            if self.endlist:
+                return
+            await asyncio.sleep(self.poll_interval(changed=bool(new_segments)))
+    
+    def poll_interval(self, changed: bool) -> float:
+        target_duration = self.target_duration or DEFAULT_TARGET_DURATION
+        interval = target_duration if changed else target_duration / 2
+        return max(interval, self.min_poll_interval)
+    
+    async def refresh(self) -> List[Segment]:
+        """Fetch the playlist once and return the segments not seen before."""
+        use_skip = (
+            self.delta_updates
+            and self.can_skip_until is not None
+            and self.last_sequence is not None
+        )
+        media = await self._fetch(use_skip)
+        if media is None:
+            return []
+        
+        table = media.segments
+        if use_skip and media.skipped_segments and table.media_sequence > self.last_sequence + 1:
+            # We fell further behind than the delta window covers
+            logger.info(f"Delta update for {self.url} skipped unseen segments, refetching in full")
+            media = await self._fetch(False, conditional=False)
+            table = media.segments
+        
+        start_index = 0
+        if self.last_sequence is not None:
+            start_index = max(0, self.last_sequence + 1 - table.media_sequence)
+            if table.media_sequence > self.last_sequence + 1:
+                logger.warning(
+                    f"Missed segments {self.last_sequence + 1}-{table.media_sequence - 1} of {self.url}"
+                )
+        
+        new_segments = [table.segment(i) for i in range(start_index, len(table))]
+        if new_segments:
+            self.last_sequence = new_segments[-1].sequence
+        return new_segments
+    
+    async def _fetch(self, use_skip: bool, conditional: bool = True) -> Optional[MediaPlaylist]:
+        request_url = self._with_skip_param(self.url) if use_skip else self.url
+        headers: Dict[str, str] = {}
+        if conditional:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+        
+        try:
+            response = await self.parser.fetch(request_url, headers)
+        except httpx.RequestError as e:
+            raise Exception(f"Error fetching M3U8: {e}")
+        
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        
+        self._etag = response.headers.get("etag")
+        self._last_modified = response.headers.get("last-modified")
+        
+        media = parse_media_playlist(io.StringIO(response.text), base_uri(self.url))
+        self.target_duration = media.target_duration or self.target_duration
+        self.can_skip_until = media.can_skip_until
+        self.endlist = media.endlist
+        if media.segments.maps:
+            self.init_map = absolute_uri_attribute(media.segments.maps[-1][1], media.segments.base_uri)
+        return media
+    
+    @staticmethod
+    def _with_skip_param(url: str) -> str:
+        parsed = urlparse(url)
+        query = parse_qsl(parsed.query, keep_blank_values=True)
+        query.append(("_HLS_skip", "YES"))
+        return urlunparse(parsed._replace(query=urlencode(query)))
@@ -1,10 +1,22 @@
-import uvicorn
 import logging
 import argparse
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
 from pathlib import Path
+from typing import List, Optional
 
+# The server stack (uvicorn, FastAPI, httpx, m3u8) is imported only once we
+# know a server will actually run, so argument parsing and config validation
+# stay cheap. tests/test_main.py guards this.
 from .config import ConfigManager
-from .server import app
+from .state import (
+    ROLE_ENV, ENGINE_SOCKET_ENV, STATE_DB_ENV, WORKING_DIR_ENV, CONFIG_PATH_ENV,
+    ROLE_ENGINE, ROLE_WORKER
+)
 
 def setup_logging(log_level: str):
     logging.basicConfig(
@@ -12,35 +24,151 @@ def setup_logging(log_level: str):
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
-def main():
+def run_engine_process(socket_path: str, log_level: str):
+    import uvicorn
+
+    os.environ[ROLE_ENV] = ROLE_ENGINE
+    setup_logging(log_level)
+    uvicorn.run(
+        "m3u8_codec_forward.server:app",
+        uds=socket_path,
+        log_level=log_level.lower()
+    )
+
+def forward_sighup(signum, frame):
+    """Pass a config reload request on to the engine and every HTTP worker."""
+    for child in multiprocessing.active_children():
+        os.kill(child.pid, signal.SIGHUP)
+
+def run_multi_process(host: str, port: int, workers: int, log_level: str,
+                      config_manager: ConfigManager):
+    """Run one engine process owning the ffmpeg children plus N HTTP workers."""
+    import uvicorn
+
+    logger = logging.getLogger(__name__)
+
+    # The engine process is handed the directory, so only we know if it is ours to remove
+    working_dir = config_manager.app_config.working_dir
+    temporary_working_dir = not working_dir
+    if temporary_working_dir:
+        working_dir = tempfile.mkdtemp(prefix="m3u8cf-")
+    Path(working_dir).mkdir(parents=True, exist_ok=True)
+    runtime_dir = Path(tempfile.mkdtemp(prefix="m3u8cf-run-"))
+    socket_path = str(runtime_dir / "engine.sock")
+
+    os.environ[WORKING_DIR_ENV] = str(working_dir)
+    os.environ[ENGINE_SOCKET_ENV] = socket_path
+    os.environ[STATE_DB_ENV] = str(runtime_dir / "streams.db")
+    if config_manager.config_path:
+        os.environ[CONFIG_PATH_ENV] = str(config_manager.config_path)
+
+    engine_process = multiprocessing.get_context("spawn").Process(
+        target=run_engine_process, args=(socket_path, log_level), name="m3u8cf-engine"
+    )
+    engine_process.start()
+
+    deadline = time.monotonic() + 30
+    while not os.path.exists(socket_path):
+        if not engine_process.is_alive() or time.monotonic() > deadline:
+            engine_process.terminate()
+            raise RuntimeError("Engine process failed to start")
+        time.sleep(0.1)
+
+    logger.info(f"Engine process {engine_process.pid} listening on {socket_path}")
+    os.environ[ROLE_ENV] = ROLE_WORKER
+    signal.signal(signal.SIGHUP, forward_sighup)
+
+    try:
+        uvicorn.run(
+            "m3u8_codec_forward.server:app",
+            host=host,
+            port=port,
+            workers=workers,
+            log_level=log_level.lower()
+        )
+    finally:
+        engine_process.terminate()
+        engine_process.join(timeout=30)
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+        if temporary_working_dir:
+            shutil.rmtree(working_dir, ignore_errors=True)
+
+def run_calibration(config_manager: ConfigManager, output: str, seconds: float):
+    """Encode a synthetic clip for every distinct variant of the configured presets."""
+    from .calibration import calibrate
+
+    variants = [
+        variant
+        for name in config_manager.list_presets()
+        for variant in config_manager.get_plan(name).variants
+    ]
+    table = calibrate(variants, seconds)
+    table.save(output)
+
+    for key, entry in sorted(table.entries.items()):
+        print(f"{key:44} {entry['fps']:>8.1f} fps  {entry['speed']:>6.2f}x  {entry['cores']:>6.2f} cores")
+    print(f"Wrote {len(table)} entries to {output}")
+
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="M3U8 Codec Forward Server")
     parser.add_argument("--config", type=str, help="Path to configuration file")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Server host")
     parser.add_argument("--port", type=int, default=80, help="Server port")
-    parser.add_argument("--log-level", type=str, default="INFO", 
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Number of HTTP worker processes (runs a separate engine process when > 1)")
+    parser.add_argument("--log-level", type=str, default="INFO",
                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
                        help="Logging level")
-    
-    args = parser.parse_args()
-    
+    parser.add_argument("--check-config", action="store_true",
+                       help="Validate the configuration and exit without starting the server")
+    parser.add_argument("--calibrate", nargs="?", const="", metavar="OUTPUT",
+                       help="Measure encoder costs for the configured presets, write the cost table and exit")
+    parser.add_argument("--calibration-seconds", type=float, default=5.0,
+                       help="Length of the synthetic clip encoded per calibration run")
+
+    args = parser.parse_args(argv)
+
     # Load configuration
-    config_manager = ConfigManager()
+    config_manager = ConfigManager(args.config)
     if args.config:
-        config_manager.load_config(args.config)
-    
+        try:
+            config_manager.load_config(args.config)
+        except (FileNotFoundError, ValueError) as e:
+            parser.error(str(e))
+
+    if args.check_config:
+        print(f"Configuration OK: {len(config_manager.presets)} presets")
+        return
+
+    if args.calibrate is not None:
+        setup_logging(args.log_level)
+        output = args.calibrate or config_manager.app_config.cost_table or "cost_table.json"
+        try:
+            run_calibration(config_manager, output, args.calibration_seconds)
+        except FileNotFoundError as e:
+            parser.error(f"ffmpeg is required for calibration: {e}")
+        return
+
     # Override with command line arguments
     host = args.host or config_manager.app_config.server_host
     port = args.port or config_manager.app_config.server_port
     log_level = args.log_level or config_manager.app_config.log_level
-    
+
     setup_logging(log_level)
-    
+
     logger = logging.getLogger(__name__)
     logger.info(f"Starting M3U8 Codec Forward server on {host}:{port}")
-    
+
+    if args.workers > 1:
+        run_multi_process(host, port, args.workers, log_level, config_manager)
+        return
+
+    import uvicorn
+    from .server import app
+
     # Store config in app state
     app.state.config_manager = config_manager
-    
+
     uvicorn.run(
         app,
         host=host,
@@ -49,4 +177,4 @@ def main():
     )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
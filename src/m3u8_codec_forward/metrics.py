@@ -0,0 +1,328 @@
+import abc
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request and fetch latencies, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SEGMENT_INTERVAL_BUCKETS = (0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0, 15.0, 30.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+    
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    @abc.abstractmethod
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(suffix, label names, label values, value) of every series."""
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_label_text(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+    
+    def samples(self):
+        for key, value in self._values.items():
+            yield "", self.labelnames, key, value
+
+
+class Gauge(_Metric):
+    """A settable gauge, or one computed at scrape time by ``collect``.
+
+    ``collect`` returns a mapping of label values to the current value and
+    is only called while rendering, so nothing is tracked between scrapes.
+    """
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self._values: Dict[LabelValues, float] = {}
+    
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+    
+    def remove(self, **labels):
+        self._values.pop(self._key(labels), None)
+    
+    def value(self, **labels) -> Optional[float]:
+        return self._values.get(self._key(labels))
+    
+    def samples(self):
+        values = self._values
+        if self.collect is not None:
+            try:
+                values = self.collect()
+            except Exception as e:
+                logger.warning(f"Collecting {self.name} failed: {e}")
+                values = {}
+        for key, value in values.items():
+            yield "", self.labelnames, key, value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts, sum, count
+        self._series: Dict[LabelValues, List] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+    
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+    
+    def samples(self):
+        bucket_names = self.labelnames + ("le",)
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield "_bucket", bucket_names, key + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, key, total
+            yield "_count", self.labelnames, key, count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def unregister(self, name: str):
+        self._metrics.pop(name, None)
+    
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              collect: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, collect))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+# Metrics of the process serving HTTP, and of the process running the
+# encoders. They are the same process except in multi-process mode, where
+# workers append the engine's metrics to their own.
+registry = MetricsRegistry()
+engine_registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "m3u8cf_http_requests_total", "HTTP requests by route, method and status",
+    ("route", "method", "status")
+)
+http_request_duration = registry.histogram(
+    "m3u8cf_http_request_duration_seconds", "Time to serve an HTTP request", ("route",)
+)
+http_response_bytes = registry.counter(
+    "m3u8cf_http_response_bytes_total", "Response body bytes sent", ("route",)
+)
+event_loop_lag = registry.histogram(
+    "m3u8cf_event_loop_lag_seconds", "Delay of event loop wake-ups past their deadline",
+    buckets=LOOP_LAG_BUCKETS
+)
+
+encoder_fps = engine_registry.gauge(
+    "m3u8cf_encoder_fps", "Frames per second reported by the encoder", ("variant",)
+)
+encoder_speed = engine_registry.gauge(
+    "m3u8cf_encoder_speed", "Encoding speed relative to real time", ("variant",)
+)
+encoder_speed_level = engine_registry.gauge(
+    "m3u8cf_encoder_speed_level", "Steps towards faster encoder settings taken under load", ("variant",)
+)
+encoder_restarts = engine_registry.counter(
+    "m3u8cf_encoder_restarts_total", "Encoder restarts", ("variant",)
+)
+encoder_exits = engine_registry.counter(
+    "m3u8cf_encoder_exits_total", "Encoder processes that exited on their own", ("variant", "status")
+)
+segment_interval = engine_registry.histogram(
+    "m3u8cf_segment_interval_seconds", "Time between consecutive playlist updates of a variant",
+    ("variant",), buckets=SEGMENT_INTERVAL_BUCKETS
+)
+encoder_processes = engine_registry.gauge(
+    "m3u8cf_encoder_processes", "Running encoder processes"
+)
+playlist_age = engine_registry.gauge(
+    "m3u8cf_playlist_age_seconds", "Time since a running variant's playlist was last written", ("variant",)
+)
+variants_shed = engine_registry.gauge(
+    "m3u8cf_variants_shed", "Variants stopped to relieve an overloaded node", ("variant", "priority")
+)
+progressive_clients = engine_registry.gauge(
+    "m3u8cf_progressive_clients", "HTTP clients attached to a progressive stream", ("variant",)
+)
+parser_fetch_duration = engine_registry.histogram(
+    "m3u8cf_parser_fetch_duration_seconds", "Source playlist and segment fetch latency", ("outcome",)
+)
+
+
+def bind_engine(engine):
+    """Compute the engine's scrape-time gauges from ``engine``."""
+    encoder_processes.collect = lambda: {(): len(engine.active_processes)}
+    playlist_age.collect = lambda: {
+        (variant_name,): age for variant_name, age in engine.playlist_ages().items()
+    }
+    variants_shed.collect = lambda: {
+        (entry["variant"], entry["priority"]): 1 for entry in engine.shed_status()
+    }
+    progressive_clients.collect = lambda: {
+        (variant_name,): stream.clients for variant_name, stream in engine.progressive_streams.items()
+    }
+
+
+class MetricsMiddleware:
+    """Records latency, status and body bytes per route.
+
+    The route label is the matched path template (``/{variant_name}.m3u8``),
+    never the raw path, so label cardinality stays bounded.
+    """
+    
+    def __init__(self, app, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        response = {"status": 500, "bytes": 0}
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            if route_path not in self.exclude:
+                http_requests.inc(route=route_path, method=scope["method"], status=response["status"])
+                http_request_duration.observe(time.perf_counter() - started, route=route_path)
+                http_response_bytes.inc(response["bytes"], route=route_path)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that asked to sleep ``interval``."""
+    
+    def __init__(self, interval: float = 0.5, histogram: Histogram = event_loop_lag):
+        self.interval = interval
+        self.histogram = histogram
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.histogram.observe(max(loop.time() - expected, 0.0))
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def progress_speed(value: Optional[str]) -> Optional[float]:
+    """ffmpeg reports speed as ``1.02x``, or ``N/A`` before the first frame."""
+    if not value or not value.endswith("x"):
+        return None
+    try:
+        return float(value[:-1])
+    except ValueError:
+        return None
@@ -1,7 +1,9 @@
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, HttpUrl, validator
+from typing import List, Optional, Dict, Any, Sequence
+from pydantic import BaseModel, ConfigDict, HttpUrl, PrivateAttr, validator, field_serializer
 from enum import Enum
 
+from .segments import SegmentTable
+
 
 class CodecType(str, Enum):
     # Modern video codecs
@@ -55,6 +57,8 @@ class ContainerFormat(str, Enum):
     MP4 = "mp4"
     MKV = "mkv"
     WEBM = "webm"
+    # fMP4 segments listed by both an HLS playlist and a DASH MPD
+    CMAF = "cmaf"
     
     # Legacy containers
     MOV = "mov"
@@ -66,7 +70,30 @@ class ContainerFormat(str, Enum):
     RMVB = "rmvb"
 
 
+# Containers written as HLS playlists and segments
+HLS_CONTAINERS = (ContainerFormat.TS, ContainerFormat.FMP4)
+# Files the DASH muxer writes into a CMAF variant's directory: the MPD, and
+# HLS playlists over the same segments (video is output stream 0, audio 1)
+CMAF_MANIFEST = "manifest.mpd"
+CMAF_HLS_PLAYLIST = "master.m3u8"
+CMAF_VIDEO_PLAYLIST = "media_0.m3u8"
+CMAF_AUDIO_PLAYLIST = "media_1.m3u8"
+# Containers streamed over HTTP from a pipe, one encoder fanned out to every client
+PROGRESSIVE_CONTAINERS = (
+    ContainerFormat.MP4, ContainerFormat.WEBM, ContainerFormat.MKV, ContainerFormat.FLV, ContainerFormat.AVI
+)
+
+
+class VariantPriority(str, Enum):
+    """Which variants the engine stops first when the node is overloaded."""
+    ESSENTIAL = "essential"  # Never shed
+    NORMAL = "normal"
+    OPTIONAL = "optional"  # Shed first
+
+
 class Resolution(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     width: int
     height: int
     
@@ -80,28 +107,91 @@ class Resolution(BaseModel):
         return f"{self.width}x{self.height}"
 
 
+# Relative encoding effort per pixel, normalised to libx264 "fast"
+CODEC_COST_FACTORS: Dict[CodecType, float] = {
+    CodecType.H264: 1.0,
+    CodecType.H265: 2.5,
+    CodecType.AV1: 4.0,
+    CodecType.VP9: 2.0,
+    CodecType.VP8: 1.2,
+}
+LEGACY_CODEC_COST_FACTOR = 0.5
+DEFAULT_FRAMERATE = 30.0
+
+
 class StreamVariant(BaseModel):
+    """One output rendition. Immutable, so it can key dicts and sets."""
+    
+    model_config = ConfigDict(frozen=True)
+    
     codec: CodecType
     audio_codec: AudioCodec
     resolution: Resolution
     bitrate: int
     framerate: Optional[float] = None
     container: ContainerFormat = ContainerFormat.TS
+    priority: VariantPriority = VariantPriority.NORMAL
+    
+    # Derived once per instance; fields can't change afterwards
+    _variant_name: str = PrivateAttr()
+    _cost_estimate: float = PrivateAttr()
+    
+    def model_post_init(self, __context: Any):
+        self._variant_name = f"{self.codec.value}_{self.resolution}_{self.bitrate}k_{self.container.value}"
+        megapixels_per_second = (
+            self.resolution.width * self.resolution.height
+            * (self.framerate or DEFAULT_FRAMERATE) / 1_000_000
+        )
+        factor = CODEC_COST_FACTORS.get(self.codec, LEGACY_CODEC_COST_FACTOR)
+        self._cost_estimate = round(megapixels_per_second * factor, 3)
+    
+    def model_copy(self, *, update: Optional[Dict[str, Any]] = None, deep: bool = False) -> "StreamVariant":
+        copy = super().model_copy(update=update, deep=deep)
+        copy.model_post_init(None)
+        return copy
     
     @property
     def variant_name(self) -> str:
-        return f"{self.codec.value}_{self.resolution}_{self.bitrate}k_{self.container.value}"
+        return self._variant_name
+    
+    @property
+    def cost_estimate(self) -> float:
+        """Relative CPU cost: encoded megapixels per second weighted by codec effort."""
+        return self._cost_estimate
 
 
 class StreamInfo(BaseModel):
     url: HttpUrl
     duration: Optional[float] = None
-    segments: List[str] = []
+    target_duration: Optional[float] = None
+    # Media playlists from the parser hold a SegmentTable here, which builds
+    # segment URLs lazily instead of materialising one string per segment
+    segments: Sequence[str] = []
     variants: List[Dict[str, Any]] = []
+    # Media playlists only: False while the source is live and still growing
+    endlist: bool = False
     
+    @property
+    def segment_table(self) -> Optional[SegmentTable]:
+        return self.segments if isinstance(self.segments, SegmentTable) else None
     
+    @field_serializer("segments")
+    def serialize_segments(self, segments: Sequence[str]) -> List[str]:
+        return list(segments)
+
+
 class TranscodingConfig(BaseModel):
     input_url: HttpUrl
     output_variants: List[StreamVariant]
     output_port: int = 80
-    output_host: str = "localhost"
\ No newline at end of file
+    output_host: str = "localhost"
+    # Seconds into the source to start from (catch-up and clip jobs)
+    start_offset: Optional[float] = None
+    # Preset the ladder came from; config reloads re-apply it to the running stream
+    preset: Optional[str] = None
+    
+    @validator('start_offset')
+    def validate_start_offset(cls, v):
+        if v is not None and v < 0:
+            raise ValueError('start_offset must not be negative')
+        return v
\ No newline at end of file
@@ -1,39 +1,199 @@
 import m3u8
 import httpx
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from urllib.parse import urljoin, urlparse
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import importlib.util
 import asyncio
+import io
+import time
 
 from .models import StreamInfo
+from .segments import parse_media_playlist, MediaPlaylist
+from . import metrics
+
+
+# Connection pool tuned for polling many live source playlists: connections
+# to an origin are kept alive across refreshes instead of re-handshaking.
+SOURCE_POOL_LIMITS = httpx.Limits(
+    max_connections=200,
+    max_keepalive_connections=100,
+    keepalive_expiry=60.0
+)
+MAX_CONNECTIONS_PER_ORIGIN = 8
+MAX_REVALIDATION_ENTRIES = 1024
+
+# Master playlists rarely change; media playlists are reused for about half a
+# target duration, the shortest interval in which a live origin can change them.
+MASTER_PLAYLIST_TTL = 30.0
+MIN_MEDIA_PLAYLIST_TTL = 0.5
+MAX_PARSE_CACHE_ENTRIES = 256
+
+
+def base_uri(url: str) -> str:
+    """Directory of a playlist URL, which its relative segment URIs resolve against."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}{'/'.join(parsed.path.split('/')[:-1])}/"
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``pip install httpx[http2]``)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class _Revalidation:
+    __slots__ = ("etag", "last_modified", "stream_info")
+    
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], stream_info: StreamInfo):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stream_info = stream_info
 
 
 class M3U8Parser:
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, client: Optional[httpx.AsyncClient] = None,
+                 max_connections_per_origin: int = MAX_CONNECTIONS_PER_ORIGIN,
+                 master_ttl: float = MASTER_PLAYLIST_TTL):
+        self.client = client or httpx.AsyncClient(
+            timeout=30.0,
+            limits=SOURCE_POOL_LIMITS,
+            http2=http2_available()
+        )
+        self.max_connections_per_origin = max_connections_per_origin
+        self._origin_slots: Dict[str, asyncio.Semaphore] = {}
+        self._revalidations: "OrderedDict[str, _Revalidation]" = OrderedDict()
+        self.master_ttl = master_ttl
+        self._parsed: "OrderedDict[str, Tuple[float, StreamInfo]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Task[StreamInfo]"] = {}
+    
+    async def parse_playlist(self, url: str, use_cache: bool = True) -> StreamInfo:
+        """Fetch and parse a playlist.
+        
+        With ``use_cache`` a fresh parsed copy is returned without touching the
+        network, and concurrent callers for the same URL share one fetch.
+        Returned StreamInfo objects may be shared and must not be mutated.
+        """
+        if use_cache:
+            cached = self._parsed.get(url)
+            if cached is not None:
+                expires_at, stream_info = cached
+                if expires_at > time.monotonic():
+                    self._parsed.move_to_end(url)
+                    return stream_info
+                del self._parsed[url]
+        
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._load_playlist(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # Shield so one cancelled caller doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
     
-    async def parse_playlist(self, url: str) -> StreamInfo:
+    async def _load_playlist(self, url: str) -> StreamInfo:
         try:
-            response = await self.client.get(url)
+            response = await self._fetch(url)
+            
+            if response.status_code == 304 and url in self._revalidations:
+                # Unchanged since the last fetch: reuse the parsed playlist
+                self._revalidations.move_to_end(url)
+                stream_info = self._revalidations[url].stream_info
+                self._cache_parsed(url, stream_info)
+                return stream_info
+            
             response.raise_for_status()
             content = response.text
             
-            playlist = m3u8.loads(content, uri=url)
-            
             stream_info = StreamInfo(url=url)
             
-            if playlist.is_variant:
+            if "-STREAM-INF" in content:
+                playlist = m3u8.loads(content, uri=url)
                 stream_info.variants = self._extract_variants(playlist)
             else:
-                stream_info.segments = self._extract_segments(playlist, url)
-                stream_info.duration = self._calculate_duration(playlist)
+                # Media playlists can hold 100k+ segments: parse them line by
+                # line into a compact table instead of m3u8 objects
+                media = parse_media_playlist(io.StringIO(content), self._get_base_uri(url))
+                stream_info.segments = media.segments
+                stream_info.target_duration = media.target_duration
+                stream_info.endlist = media.endlist
+                stream_info.duration = self._calculate_duration(media)
             
+            self._remember_validators(url, response, stream_info)
+            self._cache_parsed(url, stream_info)
             return stream_info
-            
+        
         except httpx.RequestError as e:
             raise Exception(f"Error fetching M3U8: {e}")
         except Exception as e:
             raise Exception(f"Error parsing M3U8: {e}")
     
+    async def _fetch(self, url: str) -> httpx.Response:
+        headers = {}
+        previous = self._revalidations.get(url)
+        if previous is not None:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+        
+        return await self.fetch(url, headers)
+    
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GET through the shared pool, honouring the per-origin connection cap."""
+        async with self._origin_slot(url):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                response = await self.client.get(url, headers=headers or {})
+                outcome = "ok"
+                return response
+            finally:
+                metrics.parser_fetch_duration.observe(time.perf_counter() - started, outcome=outcome)
+    
+    @asynccontextmanager
+    async def _origin_slot(self, url: str):
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        slot = self._origin_slots.get(origin)
+        if slot is None:
+            slot = self._origin_slots[origin] = asyncio.Semaphore(self.max_connections_per_origin)
+        async with slot:
+            yield
+    
+    def _remember_validators(self, url: str, response: httpx.Response, stream_info: StreamInfo):
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        
+        if not etag and not last_modified:
+            self._revalidations.pop(url, None)
+            return
+        
+        self._revalidations[url] = _Revalidation(etag, last_modified, stream_info)
+        self._revalidations.move_to_end(url)
+        while len(self._revalidations) > MAX_REVALIDATION_ENTRIES:
+            self._revalidations.popitem(last=False)
+    
+    def _cache_parsed(self, url: str, stream_info: StreamInfo):
+        if stream_info.variants:
+            ttl = self.master_ttl
+        elif stream_info.target_duration:
+            ttl = max(stream_info.target_duration / 2, MIN_MEDIA_PLAYLIST_TTL)
+        else:
+            ttl = MIN_MEDIA_PLAYLIST_TTL
+        
+        self._parsed[url] = (time.monotonic() + ttl, stream_info)
+        self._parsed.move_to_end(url)
+        while len(self._parsed) > MAX_PARSE_CACHE_ENTRIES:
+            self._parsed.popitem(last=False)
+    
+    def invalidate(self, url: Optional[str] = None):
+        """Drop cached parse results for one URL, or all of them."""
+        if url is None:
+            self._parsed.clear()
+        else:
+            self._parsed.pop(url, None)
+    
     def _extract_variants(self, playlist) -> List[Dict[str, Any]]:
         variants = []
         for variant in playlist.playlists:
@@ -47,23 +207,14 @@ class M3U8Parser:
             variants.append(variant_info)
         return variants
     
-    def _extract_segments(self, playlist, base_url: str) -> List[str]:
-        segments = []
-        base_uri = self._get_base_uri(base_url)
-        
-        for segment in playlist.segments:
-            segment_url = urljoin(base_uri, segment.uri)
-            segments.append(segment_url)
-        return segments
-    
-    def _calculate_duration(self, playlist) -> Optional[float]:
-        if hasattr(playlist, 'target_duration') and playlist.target_duration is not None:
-            return float(playlist.target_duration) * len(playlist.segments)
-        return None
+    def _calculate_duration(self, media: MediaPlaylist) -> Optional[float]:
+        # Sum of the EXTINF durations, not the target-duration upper bound
+        if not media.segments:
+            return None
+        return media.segments.total_duration
     
     def _get_base_uri(self, url: str) -> str:
-        parsed = urlparse(url)
-        return f"{parsed.scheme}://{parsed.netloc}{'/'.join(parsed.path.split('/')[:-1])}/"
+        return base_uri(url)
     
     async def get_master_playlist_info(self, url: str) -> Dict[str, Any]:
         stream_info = await self.parse_playlist(url)
@@ -78,4 +229,4 @@ class M3U8Parser:
         }
     
     async def close(self):
-        await self.client.aclose()
\ No newline at end of file
+        await self.client.aclose()
@@ -0,0 +1,196 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .models import (
+    StreamVariant, AudioCodec, Resolution, ContainerFormat, HLS_CONTAINERS, CMAF_VIDEO_PLAYLIST, CMAF_AUDIO_PLAYLIST
+)
+
+
+# Typical stereo output bitrates of the ffmpeg audio encoders we use, in kbps
+AUDIO_BITRATE_ESTIMATES: Dict[AudioCodec, int] = {
+    AudioCodec.AAC_LC: 128,
+    AudioCodec.HE_AAC: 64,
+    AudioCodec.XHE_AAC: 48,
+    AudioCodec.AC3: 192,
+    AudioCodec.EAC3: 192,
+    AudioCodec.MP3: 128,
+    AudioCodec.OPUS: 96,
+    AudioCodec.VORBIS: 112,
+}
+DEFAULT_AUDIO_BITRATE = 128
+
+
+class EncoderPlan:
+    """A preset resolved once into its deduplicated ladder and resource estimates."""
+    
+    __slots__ = ("name", "variants", "cpu_cost", "egress_kbps")
+    
+    def __init__(self, name: str, variants: Iterable[StreamVariant]):
+        self.name = name
+        self.variants: Tuple[StreamVariant, ...] = tuple(dict.fromkeys(variants))
+        self.cpu_cost = round(sum(variant.cost_estimate for variant in self.variants), 3)
+        # Bits leaving the node to pull every rendition once
+        self.egress_kbps = sum(
+            variant.bitrate + AUDIO_BITRATE_ESTIMATES.get(variant.audio_codec, DEFAULT_AUDIO_BITRATE)
+            for variant in self.variants
+        )
+    
+    def describe(self, cost_table=None) -> Dict[str, Any]:
+        description = {
+            "name": self.name,
+            "variants": [variant.variant_name for variant in self.variants],
+            "cpu_cost": self.cpu_cost,
+            "egress_kbps": self.egress_kbps,
+        }
+        if cost_table is not None:
+            # Measured cores for real-time encoding; None if a rung is uncalibrated
+            description["cpu_cores"] = cost_table.plan_cores(self.variants)
+        return description
+
+
+def master_playlist(variants: Iterable[StreamVariant]) -> str:
+    """HLS master playlist for the variants written as HLS, in ladder order.
+    
+    CMAF variants keep audio in its own playlist, so each gets an audio
+    rendition group.
+    """
+    lines = ["#EXTM3U"]
+    for variant in dict.fromkeys(variants):
+        cmaf = variant.container == ContainerFormat.CMAF
+        if variant.container not in HLS_CONTAINERS and not cmaf:
+            continue
+        audio = AUDIO_BITRATE_ESTIMATES.get(variant.audio_codec, DEFAULT_AUDIO_BITRATE)
+        # Peak follows the encoder's -maxrate
+        attributes = [
+            f"BANDWIDTH={(int(variant.bitrate * 1.2) + audio) * 1000}",
+            f"AVERAGE-BANDWIDTH={(variant.bitrate + audio) * 1000}",
+            f"RESOLUTION={variant.resolution}",
+        ]
+        if variant.framerate:
+            attributes.append(f"FRAME-RATE={variant.framerate:.3f}")
+        if cmaf:
+            name = variant.variant_name
+            lines.append(
+                f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="{name}",NAME="audio",DEFAULT=YES,AUTOSELECT=YES,'
+                f'URI="{name}/{CMAF_AUDIO_PLAYLIST}"'
+            )
+            attributes.append(f'AUDIO="{name}"')
+        lines.append(f"#EXT-X-STREAM-INF:{','.join(attributes)}")
+        lines.append(f"{variant.variant_name}/{CMAF_VIDEO_PLAYLIST}" if cmaf else f"{variant.variant_name}.m3u8")
+    return "\n".join(lines) + "\n"
+
+
+class SourceProfile(NamedTuple):
+    """What the source offers, as far as its master playlist says. None is unknown."""
+    width: Optional[int] = None
+    height: Optional[int] = None
+    framerate: Optional[float] = None
+    bitrate: Optional[int] = None  # kbps, audio included
+    
+    @classmethod
+    def from_variant(cls, source_variant: Dict[str, Any]) -> "SourceProfile":
+        resolution = source_variant.get("resolution")
+        if isinstance(resolution, str):
+            resolution = tuple(int(value) for value in resolution.lower().split("x"))
+        width, height = resolution if resolution else (None, None)
+        bandwidth = source_variant.get("bandwidth")
+        return cls(
+            width=width,
+            height=height,
+            framerate=source_variant.get("frame_rate"),
+            bitrate=bandwidth // 1000 if bandwidth else None,
+        )
+    
+    def fits(self, resolution: Resolution) -> bool:
+        if self.width is None or self.height is None:
+            return True
+        return resolution.width <= self.width and resolution.height <= self.height
+    
+    def scale_down(self, resolution: Resolution) -> Resolution:
+        """The largest size with the same aspect ratio that fits the source, in even pixels."""
+        factor = min(self.width / resolution.width, self.height / resolution.height)
+        return Resolution(
+            width=max(int(resolution.width * factor) // 2 * 2, 2),
+            height=max(int(resolution.height * factor) // 2 * 2, 2),
+        )
+
+
+def fit_to_source(variants: Iterable[StreamVariant],
+                  source: SourceProfile) -> Tuple[List[StreamVariant], List[Dict[str, Any]]]:
+    """Drop or cap the variants that would upscale the source or exceed its bitrate.
+
+    Variants larger than the source are dropped, except that a codec and
+    container pair with no variant that fits keeps its smallest one, scaled
+    down to the source. Frame rates and bitrates above the source's are
+    capped. Returns the fitted ladder and what was changed.
+    """
+    ladder = list(dict.fromkeys(variants))
+    groups: Dict[Tuple, List[StreamVariant]] = {}
+    for variant in ladder:
+        groups.setdefault((variant.codec, variant.container), []).append(variant)
+    scaled = {
+        min(group, key=lambda variant: variant.resolution.width * variant.resolution.height)
+        for group in groups.values()
+        if not any(source.fits(variant.resolution) for variant in group)
+    }
+    
+    fitted: Dict[StreamVariant, str] = {}
+    adjustments: List[Dict[str, Any]] = []
+    for variant in ladder:
+        name = variant.variant_name
+        if not source.fits(variant.resolution) and variant not in scaled:
+            adjustments.append({
+                "variant": name, "action": "dropped",
+                "reason": f"above the source resolution {source.width}x{source.height}",
+            })
+            continue
+        
+        update: Dict[str, Any] = {}
+        if variant in scaled:
+            update["resolution"] = source.scale_down(variant.resolution)
+        if source.framerate and variant.framerate and variant.framerate > source.framerate:
+            update["framerate"] = source.framerate
+        if source.bitrate and variant.bitrate > source.bitrate:
+            update["bitrate"] = source.bitrate
+        result = variant.model_copy(update=update) if update else variant
+        
+        if result in fitted:
+            adjustments.append({
+                "variant": name, "action": "dropped",
+                "reason": f"same as {fitted[result]} once capped to the source",
+            })
+            continue
+        fitted[result] = name
+        if update:
+            adjustments.append({
+                "variant": name, "action": "capped",
+                "changes": {key: str(value) if key == "resolution" else value for key, value in update.items()},
+                "result": result.variant_name,
+            })
+    return list(fitted), adjustments
+
+
+class VariantPlanDiff(NamedTuple):
+    added: List[StreamVariant]
+    removed: List[StreamVariant]
+    unchanged: List[StreamVariant]
+    
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+def diff_variants(old: Iterable[StreamVariant], new: Iterable[StreamVariant]) -> VariantPlanDiff:
+    """Compare two variant ladders.
+
+    Variants are matched by value, so a variant whose settings changed shows
+    up as removed (old settings) and added (new settings). Duplicates are
+    ignored and each list keeps the order of its input.
+    """
+    old_variants = dict.fromkeys(old)
+    new_variants = dict.fromkeys(new)
+    
+    return VariantPlanDiff(
+        added=[variant for variant in new_variants if variant not in old_variants],
+        removed=[variant for variant in old_variants if variant not in new_variants],
+        unchanged=[variant for variant in new_variants if variant in old_variants],
+    )
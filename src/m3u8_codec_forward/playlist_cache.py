@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+# Below this size the encoding headers cost more than compression saves
+MIN_COMPRESS_SIZE = 512
+
+
+class CachedPlaylist:
+    """Raw playlist bytes for one version plus pre-compressed encodings."""
+
+    __slots__ = ("version", "raw", "encoded", "etag")
+
+    def __init__(self, version: Hashable, raw: bytes, min_compress_size: int = MIN_COMPRESS_SIZE):
+        self.version = version
+        self.raw = raw
+        # Identity ETag; encoded bodies get their own (see etag_for)
+        self.etag = '"' + hashlib.blake2b(raw, digest_size=8).hexdigest() + '"'
+        self.encoded: Dict[str, bytes] = {}
+
+        if len(raw) >= min_compress_size:
+            gzipped = gzip.compress(raw, compresslevel=6, mtime=0)
+            if len(gzipped) < len(raw):
+                self.encoded["gzip"] = gzipped
+            if brotli is not None:
+                compressed = brotli.compress(raw, mode=brotli.MODE_TEXT, quality=5)
+                if len(compressed) < len(raw):
+                    self.encoded["br"] = compressed
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Return the body and content encoding to send for an Accept-Encoding header."""
+        for encoding in negotiate_encodings(accept_encoding):
+            if encoding in self.encoded:
+                return self.encoded[encoding], encoding
+        return self.raw, None
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """Strong ETag of the body sent with ``encoding``; each encoding's bytes differ."""
+        if encoding is None:
+            return self.etag
+        return self.etag[:-1] + "-" + encoding + '"'
+
+
+def negotiate_encodings(accept_encoding: Optional[str]) -> List[str]:
+    """Return the acceptable encodings we support, best first."""
+    if not accept_encoding:
+        return []
+
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[token] = quality
+
+    wildcard = qualities.get("*")
+    preferred = []
+    # Brotli compresses playlists noticeably better than gzip, so it wins ties
+    for encoding in ("br", "gzip"):
+        quality = qualities.get(encoding, wildcard)
+        if quality:
+            preferred.append((quality, encoding))
+    preferred.sort(key=lambda item: -item[0])
+    return [encoding for _, encoding in preferred]
+
+
+class PlaylistCache:
+    """LRU cache of playlist bodies, compressed once per playlist version.
+
+    File-backed playlists are versioned by their stat signature so a rewrite
+    by ffmpeg is picked up on the next request; generated playlists supply
+    their own version key.
+    """
+
+    def __init__(self, max_entries: int = 512, min_compress_size: int = MIN_COMPRESS_SIZE):
+        self.max_entries = max_entries
+        self.min_compress_size = min_compress_size
+        self._entries: "OrderedDict[Hashable, CachedPlaylist]" = OrderedDict()
+
+    def get_file(self, path: Path) -> Optional[CachedPlaylist]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(str(path), None)
+            return None
+
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        entry = self._lookup(str(path), version)
+        if entry is not None:
+            return entry
+
+        try:
+            raw = Path(path).read_bytes()
+        except FileNotFoundError:
+            self._entries.pop(str(path), None)
+            return None
+        return self._store(str(path), version, raw)
+
+    def get_generated(self, key: Hashable, version: Hashable,
+                      producer: Callable[[], bytes]) -> CachedPlaylist:
+        entry = self._lookup(key, version)
+        if entry is not None:
+            return entry
+        return self._store(key, version, producer())
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable, version: Hashable) -> Optional[CachedPlaylist]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Hashable, version: Hashable, raw: bytes) -> CachedPlaylist:
+        entry = CachedPlaylist(version, raw, self.min_compress_size)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALL_THRESHOLD = 0.1
+HEARTBEAT_INTERVAL = 0.02
+MAX_STALLS = 50
+DEFAULT_SAMPLE_INTERVAL = 0.005
+MAX_PROFILE_SECONDS = 60.0
+
+
+class LoopStallWatchdog:
+    """Reports event loop stalls together with the stack that caused them.
+
+    A callback on the loop refreshes a heartbeat every ``HEARTBEAT_INTERVAL``.
+    A watchdog thread notices when the heartbeat is older than ``threshold``
+    and captures the loop thread's stack while it is still blocked, which
+    points at the blocking call rather than at whatever runs afterwards.
+    """
+    
+    def __init__(self, threshold: float = DEFAULT_STALL_THRESHOLD, max_stalls: int = MAX_STALLS):
+        self.threshold = threshold
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+    
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._thread.start()
+    
+    def _beat(self):
+        self._heartbeat = time.monotonic()
+        self._handle = self._loop.call_later(HEARTBEAT_INTERVAL, self._beat)
+    
+    def _watch(self):
+        stall: Optional[Dict[str, Any]] = None
+        stalled_since = 0.0
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            heartbeat = self._heartbeat
+            lag = time.monotonic() - heartbeat - HEARTBEAT_INTERVAL
+            if stall is not None and heartbeat != stalled_since:
+                # The loop is running again
+                stall["duration_ms"] = round((heartbeat - stalled_since - HEARTBEAT_INTERVAL) * 1000, 1)
+                logger.warning(
+                    f"Event loop blocked for {stall['duration_ms']} ms at:\n{''.join(stall['stack'])}"
+                )
+                stall = None
+            if stall is None and lag > self.threshold:
+                stalled_since = heartbeat
+                stall = {
+                    "detected_at": time.time(),
+                    "duration_ms": None,
+                    "stack": self._loop_stack(),
+                }
+                self.stalls.append(stall)
+    
+    def _loop_stack(self) -> List[str]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return []
+        return traceback.format_list(traceback.extract_stack(frame))
+    
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        stalls = list(reversed(self.stalls))
+        return stalls[:limit] if limit is not None else stalls
+    
+    def stop(self):
+        self._stopped.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # First line rather than current line, so one function is one frame
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> Counter:
+    """Sample every thread's stack for ``seconds``; blocks the calling thread.
+
+    Returns folded stacks (root first, ``;``-separated, thread name at the
+    root) with how often each was seen.
+    """
+    own_id = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed format, as read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class SamplingProfiler:
+    """Runs one sampling session at a time in a worker thread."""
+    
+    def __init__(self):
+        self._lock = asyncio.Lock()
+    
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+    
+    async def profile(self, seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> str:
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            stacks = await loop.run_in_executor(None, sample_stacks, seconds, interval)
+        return collapsed(stacks)
@@ -0,0 +1,301 @@
+import abc
+import asyncio
+import itertools
+import struct
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple, Type
+
+from .models import ContainerFormat
+
+# Memory kept per stream for clients that fall behind; at least one
+# fragment is always kept so new clients can join
+DEFAULT_BUFFER_BYTES = 8 * 1024 * 1024
+
+MEDIA_TYPES: Dict[ContainerFormat, str] = {
+    ContainerFormat.MP4: "video/mp4",
+    ContainerFormat.WEBM: "video/webm",
+    ContainerFormat.MKV: "video/x-matroska",
+    ContainerFormat.FLV: "video/x-flv",
+    ContainerFormat.AVI: "video/x-msvideo",
+}
+
+# What a unit of container output is to a client joining mid-stream: part
+# of the header every client needs first, a point it can start at, or
+# anything else
+INIT = "init"
+JOIN = "join"
+DATA = "data"
+
+
+class _Splitter(abc.ABC):
+    """Cuts a container byte stream into top-level units as they complete."""
+    
+    def __init__(self):
+        self._buffer = bytearray()
+    
+    def feed(self, data: bytes) -> List[Tuple[bytes, str]]:
+        self._buffer += data
+        units = []
+        while True:
+            unit = self._next_unit(self._buffer)
+            if unit is None:
+                return units
+            length, kind = unit
+            units.append((bytes(self._buffer[:length]), kind))
+            del self._buffer[:length]
+    
+    @abc.abstractmethod
+    def _next_unit(self, buffer: bytearray) -> Optional[Tuple[int, str]]:
+        """Length and kind of the unit at the start of ``buffer``, or None until it is complete."""
+
+
+class _Mp4Splitter(_Splitter):
+    """Fragmented MP4: ``ftyp`` and ``moov`` first, then ``moof``/``mdat`` pairs."""
+    
+    def __init__(self):
+        super().__init__()
+        self._fragments = False
+    
+    def _next_unit(self, buffer: bytearray) -> Optional[Tuple[int, str]]:
+        if len(buffer) < 8:
+            return None
+        size, box = struct.unpack_from(">I4s", buffer)
+        header = 8
+        if size == 1:
+            if len(buffer) < 16:
+                return None
+            size = struct.unpack_from(">Q", buffer, 8)[0]
+            header = 16
+        if size < header:
+            raise ValueError(f"Invalid MP4 box size {size} for {box!r}")
+        if len(buffer) < size:
+            return None
+        if box == b"moof":
+            # With frag_keyframe every fragment starts with a keyframe
+            self._fragments = True
+            return size, JOIN
+        return size, DATA if self._fragments else INIT
+
+
+EBML_SEGMENT = 0x18538067
+EBML_CLUSTER = 0x1F43B675
+
+
+def _ebml_vint(buffer: bytearray, pos: int, keep_marker: bool) -> Optional[Tuple[int, int, bool]]:
+    """Value, length and whether the value is "unknown" of the variable-size integer at ``pos``."""
+    if pos >= len(buffer):
+        return None
+    first = buffer[pos]
+    if first == 0:
+        raise ValueError("Invalid EBML variable-size integer")
+    length = 9 - first.bit_length()
+    if pos + length > len(buffer):
+        return None
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in buffer[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, unknown
+
+
+class _EbmlSplitter(_Splitter):
+    """Matroska and WebM: header elements first, then clusters.
+
+    The segment, and a cluster whose size is unknown, are not units
+    themselves: their header is emitted and their children follow as units.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._clusters = False
+    
+    def _next_unit(self, buffer: bytearray) -> Optional[Tuple[int, str]]:
+        element = _ebml_vint(buffer, 0, keep_marker=True)
+        if element is None:
+            return None
+        element_id, id_length, _ = element
+        size = _ebml_vint(buffer, id_length, keep_marker=False)
+        if size is None:
+            return None
+        size, size_length, unknown = size
+        header = id_length + size_length
+        
+        if element_id == EBML_CLUSTER:
+            self._clusters = True
+            # ffmpeg starts clusters at video keyframes
+            return (header if unknown else header + size), JOIN
+        if element_id == EBML_SEGMENT:
+            return header, INIT
+        if unknown:
+            raise ValueError(f"Unexpected unknown-size EBML element {element_id:#x}")
+        if len(buffer) < header + size:
+            return None
+        return header + size, DATA if self._clusters else INIT
+
+
+FLV_AUDIO = 8
+FLV_VIDEO = 9
+FLV_SCRIPT = 18
+FLV_AAC = 10
+FLV_SEQUENCE_HEADER_CODECS = (7, 12)  # AVC, HEVC
+
+
+class _FlvSplitter(_Splitter):
+    """FLV: file header, metadata and codec configuration first, then tags."""
+    
+    def __init__(self):
+        super().__init__()
+        self._header = False
+    
+    def _next_unit(self, buffer: bytearray) -> Optional[Tuple[int, str]]:
+        if not self._header:
+            if len(buffer) < 9:
+                return None
+            if buffer[:3] != b"FLV":
+                raise ValueError("Not an FLV stream")
+            # Header plus the first PreviousTagSize
+            length = struct.unpack_from(">I", buffer, 5)[0] + 4
+            if len(buffer) < length:
+                return None
+            self._header = True
+            return length, INIT
+        
+        if len(buffer) < 11:
+            return None
+        tag_type = buffer[0]
+        data_size = int.from_bytes(buffer[1:4], "big")
+        length = 11 + data_size + 4
+        if len(buffer) < length:
+            return None
+        data = buffer[11:11 + min(data_size, 2)]
+        
+        if tag_type == FLV_SCRIPT:
+            return length, INIT
+        if tag_type == FLV_VIDEO and data:
+            if data[0] & 0x0F in FLV_SEQUENCE_HEADER_CODECS and len(data) > 1 and data[1] == 0:
+                return length, INIT
+            if data[0] >> 4 == 1:
+                return length, JOIN
+        if tag_type == FLV_AUDIO and len(data) > 1 and data[0] >> 4 == FLV_AAC and data[1] == 0:
+            return length, INIT
+        return length, DATA
+
+
+class _AviSplitter(_Splitter):
+    """AVI: RIFF headers first, then the chunks of the ``movi`` list.
+
+    AVI chunks carry no keyframe flag (that lives in the trailing index),
+    so clients join at any video chunk and decoders pick up at the next
+    keyframe.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._movi = False
+    
+    def _next_unit(self, buffer: bytearray) -> Optional[Tuple[int, str]]:
+        if len(buffer) < 12:
+            return None
+        chunk_id, size = struct.unpack_from("<4sI", buffer)
+        kind = DATA if self._movi else INIT
+        if chunk_id == b"RIFF" or (chunk_id == b"LIST" and buffer[8:12] == b"movi"):
+            # Descend: the chunks inside follow as units
+            self._movi = self._movi or chunk_id == b"LIST"
+            return 12, kind
+        length = 8 + size + (size & 1)
+        if len(buffer) < length:
+            return None
+        if self._movi and chunk_id[2:] in (b"dc", b"db"):
+            return length, JOIN
+        return length, kind
+
+
+SPLITTERS: Dict[ContainerFormat, Type[_Splitter]] = {
+    ContainerFormat.MP4: _Mp4Splitter,
+    ContainerFormat.WEBM: _EbmlSplitter,
+    ContainerFormat.MKV: _EbmlSplitter,
+    ContainerFormat.FLV: _FlvSplitter,
+    ContainerFormat.AVI: _AviSplitter,
+}
+
+
+class ProgressiveStream:
+    """Fans one encoder's output out to any number of HTTP clients from memory.
+
+    The container header is kept for the life of the stream; the rest is
+    kept as a window of recent units. A client gets the header and then
+    starts at the newest join point (a keyframe fragment or cluster), so it
+    joins live instead of from the start. A client that falls out of the
+    window skips ahead to the newest join point.
+    """
+    
+    def __init__(self, container: ContainerFormat, max_buffer: int = DEFAULT_BUFFER_BYTES):
+        self.media_type = MEDIA_TYPES[container]
+        self.max_buffer = max_buffer
+        self.closed = False
+        self.clients = 0
+        # Encoder output received so far, trimmed or not
+        self.bytes_fed = 0
+        self._splitter = SPLITTERS[container]()
+        self._init = bytearray()
+        # (index, data) of the buffered units, and the newest join point
+        self._units: Deque[Tuple[int, bytes]] = deque()
+        self._next_index = 0
+        self._buffered = 0
+        self._last_join: Optional[int] = None
+        self._updated = asyncio.Event()
+    
+    @property
+    def started(self) -> bool:
+        return self._last_join is not None
+    
+    def feed(self, data: bytes):
+        self.bytes_fed += len(data)
+        for unit, kind in self._splitter.feed(data):
+            if kind == INIT:
+                self._init += unit
+                continue
+            if kind == JOIN:
+                self._last_join = self._next_index
+            self._units.append((self._next_index, unit))
+            self._next_index += 1
+            self._buffered += len(unit)
+        # Never drop the newest join point; output before the first one is
+        # of no use to clients and is trimmed from the oldest
+        while self._buffered > self.max_buffer and (
+                self._last_join is None or self._units[0][0] < self._last_join):
+            self._buffered -= len(self._units.popleft()[1])
+        self._notify()
+    
+    def close(self):
+        self.closed = True
+        self._notify()
+    
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+    
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        self.clients += 1
+        try:
+            while not self.started:
+                if self.closed:
+                    return
+                await self._updated.wait()
+            yield bytes(self._init)
+            
+            position = self._last_join
+            while True:
+                first = self._units[0][0] if self._units else self._next_index
+                if position < first:
+                    position = self._last_join
+                if position < self._next_index:
+                    units = itertools.islice(self._units, position - first, None)
+                    position = self._next_index
+                    yield b"".join(data for _, data in units)
+                    continue
+                if self.closed:
+                    return
+                await self._updated.wait()
+        finally:
+            self.clients -= 1
@@ -0,0 +1,67 @@
+import os
+from typing import Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Offset and length of a single ``bytes=`` range of a ``size``-byte file.
+
+    Returns None when the range lies beyond the file (416). Raises
+    ValueError for headers that are malformed or ask for several ranges,
+    which are answered with the whole file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(f"Unsupported range: {header}")
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        # Suffix range: the last N bytes
+        length = min(int(last), size)
+        if length <= 0:
+            return None
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        if last and int(last) < start:
+            raise ValueError(f"Invalid range: {header}")
+        return None
+    return start, end - start + 1
+
+
+class FileRangeResponse(Response):
+    """206 response with ``length`` bytes of a file from ``offset``, read in chunks off the event loop."""
+    
+    def __init__(self, path: str, offset: int, length: int, size: int, media_type: str):
+        super().__init__(status_code=206, media_type=media_type, headers={
+            "Accept-Ranges": "bytes",
+            "Content-Range": f"bytes {offset}-{offset + length - 1}/{size}",
+            "Content-Length": str(length),
+        })
+        self.path = path
+        self.offset = offset
+        self.length = length
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.offset, os.SEEK_SET)
+            remaining = self.length
+            while remaining:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                # The file was cut short; end the response rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import logging
+import math
+import re
+from collections import OrderedDict
+from pathlib import PurePosixPath
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from .live import LivePlaylistTracker
+from .parser import M3U8Parser
+from .segments import Segment, absolute_uri_attribute
+
+logger = logging.getLogger(__name__)
+
+RELAY_HOST = "127.0.0.1"
+# Segments fetched ahead of the encoders to absorb origin jitter
+DEFAULT_LOOKAHEAD = 3
+# Segments kept behind the encoders' read position
+DEFAULT_RETAIN = 6
+# ffmpeg starts live playlists this many segments from the end
+LIVE_START_SEGMENTS = 3
+DOWNLOAD_ATTEMPTS = 2
+
+_MAP_URI = re.compile(r'URI="([^"]*)"')
+
+
+def _discard_result(task: "asyncio.Task[bytes]"):
+    if not task.cancelled():
+        task.exception()
+
+
+class IngestRelay:
+    """Downloads each segment of one source media playlist exactly once.
+
+    Every encoder for the same input reads the relay's local copy of the
+    playlist and its segments instead of pulling from the origin itself.
+    Segments up to ``lookahead`` past the furthest one requested are
+    prefetched; segments more than ``retain`` behind it are dropped.
+    """
+    
+    def __init__(self, parser: M3U8Parser, media_url: str,
+                 lookahead: int = DEFAULT_LOOKAHEAD, retain: int = DEFAULT_RETAIN):
+        self.parser = parser
+        self.media_url = media_url
+        self.lookahead = lookahead
+        self.retain = retain
+        self.tracker = LivePlaylistTracker(parser, media_url)
+        self.segments: "OrderedDict[int, Segment]" = OrderedDict()
+        self.downloads: Dict[int, "asyncio.Task[bytes]"] = {}
+        self.position: Optional[int] = None
+        self.ended = False
+        self._init: Optional[Tuple[str, "asyncio.Task[bytes]"]] = None
+        self._playlist: Optional[str] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._follow())
+    
+    async def _follow(self):
+        try:
+            async for segment in self.tracker:
+                self.segments[segment.sequence] = segment
+                self._playlist = None
+                if self.tracker.init_map:
+                    self._update_init(self.tracker.init_map)
+                self._schedule()
+                self._ready.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ingest relay for {self.media_url} stopped: {e}")
+        self.ended = True
+        self._playlist = None
+        self._ready.set()
+    
+    async def playlist(self) -> str:
+        await self._ready.wait()
+        if self._playlist is None:
+            self._playlist = self._render_playlist()
+        return self._playlist
+    
+    def _render_playlist(self) -> str:
+        target_duration = self.tracker.target_duration or max(
+            (segment.duration for segment in self.segments.values()), default=1
+        )
+        first = next(iter(self.segments), 0)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:6",
+            f"#EXT-X-TARGETDURATION:{math.ceil(target_duration)}",
+            f"#EXT-X-MEDIA-SEQUENCE:{first}",
+        ]
+        if self._init is not None:
+            lines.append('#EXT-X-MAP:URI="init.mp4"')
+        
+        current_key = None
+        for segment in self.segments.values():
+            if segment.discontinuity and segment.sequence != first:
+                lines.append("#EXT-X-DISCONTINUITY")
+            if segment.key != current_key:
+                # Keys stay on the origin; only media is relayed
+                key = absolute_uri_attribute(segment.key, self.media_url) if segment.key else "METHOD=NONE"
+                lines.append(f"#EXT-X-KEY:{key}")
+                current_key = segment.key
+            lines.append(f"#EXTINF:{segment.duration:.6f},")
+            lines.append(self._segment_name(segment))
+        
+        if self.ended:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def _segment_name(segment: Segment) -> str:
+        # Keep the source extension; newer ffmpeg checks it before probing
+        suffix = PurePosixPath(urlparse(segment.uri).path).suffix or ".ts"
+        return f"{segment.sequence}{suffix}"
+    
+    async def segment(self, sequence: int) -> Optional[bytes]:
+        segment = self.segments.get(sequence)
+        if segment is None:
+            return None
+        if self.position is None or sequence > self.position:
+            self.position = sequence
+            self._evict()
+        self._schedule()
+        task = self.downloads.get(sequence)
+        if task is None:
+            task = self._download(segment)
+        return await asyncio.shield(task)
+    
+    async def init_segment(self) -> Optional[bytes]:
+        if self._init is None:
+            return None
+        return await asyncio.shield(self._init[1])
+    
+    def _update_init(self, attributes: str):
+        match = _MAP_URI.search(attributes)
+        if match is None or (self._init is not None and self._init[0] == match.group(1)):
+            return
+        uri = match.group(1)
+        self._init = (uri, asyncio.ensure_future(self._fetch(uri)))
+        self._playlist = None
+    
+    def _schedule(self):
+        """Start downloads for the lookahead window past the read position."""
+        if not self.segments:
+            return
+        anchor = self.position
+        if anchor is None:
+            # Nobody has read yet: prefetch where a new encoder will start
+            if self.tracker.endlist:
+                anchor = next(iter(self.segments)) - 1
+            else:
+                anchor = next(reversed(self.segments)) - LIVE_START_SEGMENTS
+        for sequence in range(anchor + 1, anchor + 1 + self.lookahead):
+            segment = self.segments.get(sequence)
+            if segment is not None and sequence not in self.downloads:
+                self._download(segment)
+    
+    def _download(self, segment: Segment) -> "asyncio.Task[bytes]":
+        headers = {}
+        if segment.byterange_length is not None:
+            start = segment.byterange_offset or 0
+            headers["Range"] = f"bytes={start}-{start + segment.byterange_length - 1}"
+        task = asyncio.ensure_future(self._fetch(segment.uri, headers))
+        self.downloads[segment.sequence] = task
+        return task
+    
+    async def _fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> bytes:
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                response = await self.parser.fetch(url, headers)
+                response.raise_for_status()
+                return response.content
+            except Exception as e:
+                if attempt == DOWNLOAD_ATTEMPTS:
+                    raise Exception(f"Error fetching segment {url}: {e}")
+                logger.warning(f"Retrying segment {url}: {e}")
+    
+    def _evict(self):
+        while self.segments:
+            sequence = next(iter(self.segments))
+            if sequence >= self.position - self.retain:
+                break
+            del self.segments[sequence]
+            task = self.downloads.pop(sequence, None)
+            if task is not None and not task.done():
+                # Slower encoders may still be waiting on it; let it finish
+                task.add_done_callback(_discard_result)
+            self._playlist = None
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        tasks = list(self.downloads.values())
+        if self._init is not None:
+            tasks.append(self._init[1])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *([self._task] if self._task else []), return_exceptions=True)
+        self.downloads.clear()
+
+
+class IngestRelayPool:
+    """One relay per source playlist, shared by all encoders reading it.
+
+    Relays are served over a small HTTP server on the loopback interface and
+    reference-counted: the last ``release`` for a source stops its relay.
+    """
+    
+    def __init__(self, parser: M3U8Parser, lookahead: int = DEFAULT_LOOKAHEAD,
+                 retain: int = DEFAULT_RETAIN):
+        self.parser = parser
+        self.lookahead = lookahead
+        self.retain = retain
+        self.relays: Dict[str, IngestRelay] = {}
+        self._consumers: Dict[str, int] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.port: Optional[int] = None
+    
+    @staticmethod
+    def relay_id(media_url: str) -> str:
+        return hashlib.sha1(media_url.encode()).hexdigest()[:12]
+    
+    async def acquire(self, media_url: str) -> str:
+        """Return the local playlist URL for ``media_url``, starting its relay if needed."""
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, RELAY_HOST, 0)
+            self.port = self._server.sockets[0].getsockname()[1]
+        
+        relay_id = self.relay_id(media_url)
+        if relay_id not in self.relays:
+            relay = IngestRelay(self.parser, media_url, self.lookahead, self.retain)
+            relay.start()
+            self.relays[relay_id] = relay
+            logger.info(f"Started ingest relay {relay_id} for {media_url}")
+        self._consumers[relay_id] = self._consumers.get(relay_id, 0) + 1
+        return f"http://{RELAY_HOST}:{self.port}/{relay_id}/index.m3u8"
+    
+    async def release(self, media_url: str):
+        relay_id = self.relay_id(media_url)
+        consumers = self._consumers.get(relay_id, 0) - 1
+        if consumers > 0:
+            self._consumers[relay_id] = consumers
+            return
+        self._consumers.pop(relay_id, None)
+        relay = self.relays.pop(relay_id, None)
+        if relay is not None:
+            await relay.close()
+            logger.info(f"Stopped ingest relay {relay_id} for {media_url}")
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "connection" and value.strip().lower() == "close":
+                        keep_alive = False
+                
+                status, content_type, body = await self._route(urlparse(target).path)
+                head = (
+                    f"HTTP/1.1 {status}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                )
+                writer.write(head.encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _route(self, path: str) -> Tuple[str, str, bytes]:
+        relay_id, _, name = path.lstrip("/").partition("/")
+        relay = self.relays.get(relay_id)
+        if relay is None:
+            return "404 Not Found", "text/plain", b"unknown relay"
+        
+        try:
+            if name == "index.m3u8":
+                playlist = await relay.playlist()
+                return "200 OK", "application/vnd.apple.mpegurl", playlist.encode()
+            if name == "init.mp4":
+                data = await relay.init_segment()
+            else:
+                data = await relay.segment(int(name.split(".", 1)[0]))
+        except ValueError:
+            data = None
+        except Exception as e:
+            logger.warning(f"Ingest relay {relay_id} could not serve {name}: {e}")
+            return "502 Bad Gateway", "text/plain", str(e).encode()
+        
+        if data is None:
+            return "404 Not Found", "text/plain", b"segment not available"
+        return "200 OK", "application/octet-stream", data
+    
+    async def close(self):
+        for relay in list(self.relays.values()):
+            await relay.close()
+        self.relays.clear()
+        self._consumers.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,105 @@
+import httpx
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import logging
+
+from .models import TranscodingConfig
+from .transcoder import AdmissionError, SeekError
+
+logger = logging.getLogger(__name__)
+
+ENGINE_BASE_URL = "http://engine"
+
+
+class RemoteTranscodingEngine:
+    """Client used by HTTP worker processes to drive the engine process.
+
+    Exposes the parts of ``TranscodingEngine`` the server relies on. Control
+    calls go to the engine over its local unix socket, while playlists and
+    segments are read straight from the shared working directory.
+    """
+    
+    def __init__(self, socket_path: str, working_dir: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.working_dir = Path(working_dir)
+        self.client = httpx.AsyncClient(
+            base_url=ENGINE_BASE_URL,
+            transport=httpx.AsyncHTTPTransport(uds=socket_path),
+            timeout=timeout
+        )
+    
+    async def request(self, method: str, path: str, bad_request: type = Exception, **kwargs) -> httpx.Response:
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.RequestError as e:
+            raise Exception(f"Engine process unreachable: {e}")
+        
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            if response.status_code == 503:
+                raise AdmissionError(detail)
+            if response.status_code == 400:
+                raise bad_request(detail)
+            raise Exception(detail)
+        return response
+    
+    async def start_transcoding(self, config: TranscodingConfig) -> Dict[str, str]:
+        response = await self.request(
+            "POST", "/internal/engine/start", bad_request=SeekError, json=config.model_dump(mode="json")
+        )
+        return response.json()
+    
+    async def stop_transcoding(self, variant_name: Optional[str] = None):
+        params: Dict[str, Any] = {}
+        if variant_name:
+            params["variant_name"] = variant_name
+        await self.request("POST", "/internal/engine/stop", params=params)
+    
+    async def metrics(self) -> str:
+        response = await self.request("GET", "/internal/engine/metrics")
+        return response.text
+    
+    async def traces(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        params = {"limit": limit} if limit is not None else {}
+        response = await self.request("GET", "/internal/engine/traces", params=params)
+        return response.json()["traces"]
+    
+    async def describe_stream(self, stream_id: str) -> Optional[Dict[str, Any]]:
+        response = await self.request("GET", "/internal/engine/stream", params={"stream_id": stream_id})
+        return response.json()["stream"]
+    
+    async def shed_status(self) -> List[Dict[str, Any]]:
+        response = await self.request("GET", "/internal/engine/shed")
+        return response.json()["shed_variants"]
+    
+    async def open_progressive(self, variant_name: str) -> Optional[Tuple[str, AsyncIterator[bytes]]]:
+        # Relays the engine's fan-out; it lives as long as the client stays
+        request = self.client.build_request(
+            "GET", f"/internal/engine/progressive/{variant_name}", timeout=httpx.Timeout(10.0, read=None)
+        )
+        try:
+            response = await self.client.send(request, stream=True)
+        except httpx.RequestError as e:
+            raise Exception(f"Engine process unreachable: {e}")
+        if response.status_code == 404:
+            await response.aclose()
+            return None
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            raise Exception(response.text)
+        
+        async def relay() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+        
+        return response.headers.get("content-type", "application/octet-stream"), relay()
+    
+    async def close(self):
+        await self.client.aclose()
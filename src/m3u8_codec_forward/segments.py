@@ -0,0 +1,339 @@
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import accumulate
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+import math
+import re
+
+
+_URI_ATTRIBUTE = re.compile(r'URI="([^"]*)"')
+
+
+def absolute_uri_attribute(attributes: str, base_uri: str) -> str:
+    """Resolve the URI="..." of a tag attribute list against ``base_uri``."""
+    return _URI_ATTRIBUTE.sub(lambda m: f'URI="{urljoin(base_uri, m.group(1))}"', attributes)
+
+
+class Segment(NamedTuple):
+    sequence: int
+    uri: str
+    duration: float
+    byterange_length: Optional[int] = None
+    byterange_offset: Optional[int] = None
+    discontinuity: bool = False
+    key: Optional[str] = None
+
+
+class SegmentTable(Sequence):
+    """Columnar segment storage for large media playlists.
+
+    Durations and byte ranges live in typed arrays, the base URI is stored
+    once and each segment keeps only its path relative to it. Indexing yields
+    absolute segment URLs, built on demand, so the table can stand in for the
+    list of URL strings ``StreamInfo.segments`` used to hold.
+    """
+    
+    __slots__ = (
+        "base_uri", "media_sequence", "_paths", "_durations",
+        "_range_lengths", "_range_offsets", "_discontinuities",
+        "_keys", "_key_ids", "_key_index", "maps", "_starts",
+    )
+    
+    def __init__(self, base_uri: str, media_sequence: int = 0):
+        self.base_uri = base_uri
+        self.media_sequence = media_sequence
+        self._paths: List[str] = []
+        self._durations = array("d")
+        # Byte-range and key columns are only allocated once a playlist uses them
+        self._range_lengths: Optional[array] = None
+        self._range_offsets: Optional[array] = None
+        self._discontinuities: set = set()
+        self._keys: List[str] = []
+        self._key_ids: Dict[str, int] = {}
+        self._key_index: Optional[array] = None
+        # (first segment index, raw EXT-X-MAP attributes)
+        self.maps: List[Tuple[int, str]] = []
+        # Cumulative EXTINF start times, built on first time lookup
+        self._starts: Optional[array] = None
+    
+    def append(self, path: str, duration: float,
+               byterange: Optional[Tuple[int, int]] = None,
+               discontinuity: bool = False,
+               key: Optional[str] = None):
+        index = len(self._paths)
+        self._paths.append(path)
+        self._durations.append(duration)
+        self._starts = None
+        
+        if byterange is not None:
+            if self._range_lengths is None:
+                self._range_lengths = array("q", [-1]) * index
+                self._range_offsets = array("q", [-1]) * index
+            self._range_lengths.append(byterange[0])
+            self._range_offsets.append(byterange[1])
+        elif self._range_lengths is not None:
+            self._range_lengths.append(-1)
+            self._range_offsets.append(-1)
+        
+        if discontinuity:
+            self._discontinuities.add(index)
+        
+        if key is not None:
+            if self._key_index is None:
+                self._key_index = array("i", [-1]) * index
+            key_id = self._key_ids.get(key)
+            if key_id is None:
+                key_id = self._key_ids[key] = len(self._keys)
+                self._keys.append(key)
+            self._key_index.append(key_id)
+        elif self._key_index is not None:
+            self._key_index.append(-1)
+    
+    def __len__(self) -> int:
+        return len(self._paths)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.url(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self._paths)
+        return self.url(index)
+    
+    def __iter__(self):
+        base_uri = self.base_uri
+        for path in self._paths:
+            yield urljoin(base_uri, path)
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (SegmentTable, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return f"SegmentTable(base_uri={self.base_uri!r}, segments={len(self)})"
+    
+    def url(self, index: int) -> str:
+        return urljoin(self.base_uri, self._paths[index])
+    
+    def path(self, index: int) -> str:
+        return self._paths[index]
+    
+    def duration(self, index: int) -> float:
+        return self._durations[index]
+    
+    def sequence(self, index: int) -> int:
+        return self.media_sequence + index
+    
+    def byterange(self, index: int) -> Optional[Tuple[int, int]]:
+        if self._range_lengths is None or self._range_lengths[index] < 0:
+            return None
+        return self._range_lengths[index], self._range_offsets[index]
+    
+    def key(self, index: int) -> Optional[str]:
+        if self._key_index is None or self._key_index[index] < 0:
+            return None
+        return self._keys[self._key_index[index]]
+    
+    def is_discontinuity(self, index: int) -> bool:
+        return index in self._discontinuities
+    
+    def segment(self, index: int) -> Segment:
+        byterange = self.byterange(index)
+        return Segment(
+            sequence=self.sequence(index),
+            uri=self.url(index),
+            duration=self._durations[index],
+            byterange_length=byterange[0] if byterange else None,
+            byterange_offset=byterange[1] if byterange else None,
+            discontinuity=index in self._discontinuities,
+            key=self.key(index),
+        )
+    
+    @property
+    def durations(self) -> array:
+        return self._durations
+    
+    @property
+    def total_duration(self) -> float:
+        return math.fsum(self._durations)
+    
+    def _start_times(self) -> array:
+        if self._starts is None:
+            starts = array("d", [0.0])
+            starts.extend(accumulate(self._durations))
+            starts.pop()
+            self._starts = starts
+        return self._starts
+    
+    def start_time(self, index: int) -> float:
+        """Offset in seconds at which segment ``index`` starts."""
+        if not 0 <= index < len(self._durations):
+            raise IndexError("segment index out of range")
+        return self._start_times()[index]
+    
+    def segment_at(self, offset: float) -> int:
+        """Index of the segment containing ``offset`` seconds into the playlist."""
+        if not self._durations:
+            raise ValueError("playlist has no segments")
+        if offset < 0:
+            return 0
+        starts = self._start_times()
+        end = starts[-1] + self._durations[-1]
+        if offset >= end:
+            raise ValueError(f"offset {offset}s is beyond the playlist duration ({end:.3f}s)")
+        return bisect_right(starts, offset) - 1
+    
+    def to_m3u8(self, start_index: int = 0, target_duration: Optional[float] = None,
+                endlist: bool = True) -> str:
+        """Render the segments from ``start_index`` on as a media playlist with absolute URIs."""
+        durations = self._durations[start_index:]
+        if target_duration is None:
+            target_duration = max(durations) if durations else 0
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:4",
+            f"#EXT-X-TARGETDURATION:{math.ceil(target_duration)}",
+            f"#EXT-X-MEDIA-SEQUENCE:{self.sequence(start_index)}",
+        ]
+        
+        maps = {index: attributes for index, attributes in self.maps}
+        active_map = None
+        for index, attributes in self.maps:
+            if index <= start_index:
+                active_map = attributes
+        if active_map is not None:
+            lines.append(f"#EXT-X-MAP:{self._absolute_uri_attribute(active_map)}")
+        
+        current_key = None
+        for index in range(start_index, len(self._paths)):
+            if index != start_index and index in maps:
+                lines.append(f"#EXT-X-MAP:{self._absolute_uri_attribute(maps[index])}")
+            if index in self._discontinuities and index != start_index:
+                lines.append("#EXT-X-DISCONTINUITY")
+            key = self.key(index)
+            if key != current_key:
+                lines.append(f"#EXT-X-KEY:{self._absolute_uri_attribute(key) if key else 'METHOD=NONE'}")
+                current_key = key
+            lines.append(f"#EXTINF:{self._durations[index]:.6f},")
+            byterange = self.byterange(index)
+            if byterange is not None:
+                lines.append(f"#EXT-X-BYTERANGE:{byterange[0]}@{byterange[1]}")
+            lines.append(self.url(index))
+        
+        if endlist:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+    
+    def _absolute_uri_attribute(self, attributes: str) -> str:
+        return absolute_uri_attribute(attributes, self.base_uri)
+    
+    @property
+    def has_byteranges(self) -> bool:
+        return self._range_lengths is not None
+    
+    @property
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+
+class MediaPlaylist:
+    """Result of streaming-parsing a media playlist."""
+    
+    __slots__ = (
+        "segments", "target_duration", "endlist", "playlist_type", "version",
+        "can_skip_until", "skipped_segments",
+    )
+    
+    def __init__(self, segments: SegmentTable):
+        self.segments = segments
+        self.target_duration: Optional[float] = None
+        self.endlist = False
+        self.playlist_type: Optional[str] = None
+        self.version: Optional[int] = None
+        # EXT-X-SERVER-CONTROL CAN-SKIP-UNTIL: the origin serves delta playlists
+        self.can_skip_until: Optional[float] = None
+        # EXT-X-SKIP in a delta playlist; the table starts after these segments
+        self.skipped_segments = 0
+
+
+def parse_media_playlist(lines: Iterable[str], base_uri: str) -> MediaPlaylist:
+    """Parse a media playlist one line at a time into a ``SegmentTable``.
+
+    Only the tags needed to describe segments are interpreted; no
+    per-segment objects are created.
+    """
+    table = SegmentTable(base_uri)
+    result = MediaPlaylist(table)
+    
+    duration: Optional[float] = None
+    byterange: Optional[Tuple[int, Optional[int]]] = None
+    discontinuity = False
+    key: Optional[str] = None
+    range_ends: Dict[str, int] = {}
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        
+        if line[0] != "#":
+            if duration is None:
+                # URI without EXTINF; tolerate like m3u8 does
+                duration = 0.0
+            resolved_range = None
+            if byterange is not None:
+                length, offset = byterange
+                if offset is None:
+                    offset = range_ends.get(line, 0)
+                range_ends[line] = offset + length
+                resolved_range = (length, offset)
+            table.append(line, duration, resolved_range, discontinuity, key)
+            duration = None
+            byterange = None
+            discontinuity = False
+        elif line.startswith("#EXTINF:"):
+            duration = float(line[8:].split(",", 1)[0])
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            length, _, offset = line[17:].partition("@")
+            byterange = (int(length), int(offset) if offset else None)
+        elif line == "#EXT-X-DISCONTINUITY":
+            discontinuity = True
+        elif line.startswith("#EXT-X-KEY:"):
+            attributes = line[11:]
+            key = None if "METHOD=NONE" in attributes else attributes
+        elif line.startswith("#EXT-X-MAP:"):
+            table.maps.append((len(table), line[11:]))
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            result.target_duration = float(line[22:])
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            table.media_sequence = int(line[22:])
+        elif line == "#EXT-X-ENDLIST":
+            result.endlist = True
+        elif line.startswith("#EXT-X-PLAYLIST-TYPE:"):
+            result.playlist_type = line[21:]
+        elif line.startswith("#EXT-X-VERSION:"):
+            result.version = int(line[15:])
+        elif line.startswith("#EXT-X-SERVER-CONTROL:"):
+            can_skip_until = _attribute(line[22:], "CAN-SKIP-UNTIL")
+            if can_skip_until is not None:
+                result.can_skip_until = float(can_skip_until)
+        elif line.startswith("#EXT-X-SKIP:"):
+            skipped = _attribute(line[12:], "SKIPPED-SEGMENTS")
+            if skipped is not None:
+                result.skipped_segments = int(skipped)
+    
+    # Sequence numbers keep counting the segments a delta update left out
+    table.media_sequence += result.skipped_segments
+    return result
+
+
+def _attribute(attributes: str, name: str) -> Optional[str]:
+    for part in attributes.split(","):
+        key, _, value = part.partition("=")
+        if key.strip() == name:
+            return value.strip().strip('"')
+    return None
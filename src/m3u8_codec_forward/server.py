@@ -1,33 +1,142 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Body
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import HttpUrl
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 import logging
+import os
+import signal
 from pathlib import Path
 import asyncio
 from contextlib import asynccontextmanager
 
-from .models import TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
-from .transcoder import TranscodingEngine
+from .models import TranscodingConfig, StreamVariant
+from .transcoder import TranscodingEngine, AdmissionError, SeekError
+from .calibration import load_cost_table
+from .playlist_cache import PlaylistCache, CachedPlaylist
+from .remote import RemoteTranscodingEngine
+from .metrics import MetricsMiddleware, LoopLagMonitor
+from . import metrics
+from .tracing import tracer
+from .profiling import LoopStallWatchdog, SamplingProfiler, MAX_PROFILE_SECONDS
+from .speed_control import SpeedController
+from .shedding import LoadShedder
+from .plan import master_playlist
+from .ranges import FileRangeResponse, parse_range
+from .config import ConfigManager
+from .state import (
+    SharedStreamRegistry, ROLE_ENV, ENGINE_SOCKET_ENV, STATE_DB_ENV, WORKING_DIR_ENV,
+    CONFIG_PATH_ENV, ROLE_STANDALONE, ROLE_ENGINE, ROLE_WORKER
+)
 
 logger = logging.getLogger(__name__)
 
-# Global state
-transcoding_engine: Optional[TranscodingEngine] = None
+# Global state. In multi-process mode ``active_streams`` is a SharedStreamRegistry
+# and HTTP workers drive the engine process through a RemoteTranscodingEngine.
+transcoding_engine: Optional[Union[TranscodingEngine, RemoteTranscodingEngine]] = None
 active_streams: Dict[str, Dict] = {}
+playlist_cache = PlaylistCache()
+
+HLS_MEDIA_TYPE = "application/vnd.apple.mpegurl"
+DASH_MEDIA_TYPE = "application/dash+xml"
+# Segment and single-file media types by suffix; anything else is served as TS
+SEGMENT_MEDIA_TYPES = {".ts": "video/mp2t", ".m4s": "video/mp4", ".mp4": "video/mp4"}
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global transcoding_engine
-    transcoding_engine = TranscodingEngine()
+    global transcoding_engine, active_streams
+    role = os.environ.get(ROLE_ENV, ROLE_STANDALONE)
+    app.state.role = role
+    # Created here rather than at import so their locks belong to the serving loop
+    app.state.reload_lock = asyncio.Lock()
+    app.state.profiler = SamplingProfiler()
+    
+    if not hasattr(app.state, "config_manager"):
+        # Processes spawned by multi-process mode load the config themselves
+        config_path = os.environ.get(CONFIG_PATH_ENV)
+        app.state.config_manager = ConfigManager(config_path)
+        if config_path:
+            app.state.config_manager.load_config(config_path)
+    
+    # Workers load it too, to report measured preset costs
+    app.state.cost_table = load_cost_table(app.state.config_manager.app_config.cost_table)
+    
+    if role == ROLE_WORKER:
+        transcoding_engine = RemoteTranscodingEngine(
+            os.environ[ENGINE_SOCKET_ENV], os.environ[WORKING_DIR_ENV]
+        )
+    else:
+        app_config = app.state.config_manager.app_config
+        transcoding_engine = TranscodingEngine(
+            app_config.working_dir or os.environ.get(WORKING_DIR_ENV),
+            shared_ingest=app_config.shared_ingest,
+            ingest_lookahead=app_config.ingest_lookahead,
+            segment_duration=app_config.segment_duration,
+            playlist_size=app_config.playlist_size,
+            cost_table=app.state.cost_table,
+            max_encoder_cores=app_config.max_encoder_cores,
+            speed_controller=SpeedController(
+                app_config.speed_slow_threshold,
+                app_config.speed_recover_threshold,
+                app_config.speed_window,
+                app_config.speed_recover_reports
+            ) if app_config.adaptive_speed else None,
+            fit_to_source=app_config.fit_ladder_to_source,
+            progressive_buffer=int(app_config.progressive_buffer_mb * 1024 * 1024),
+            single_file=app_config.single_file_output,
+            segments_per_file=app_config.segments_per_file
+        )
+    
+    if role != ROLE_STANDALONE:
+        active_streams = SharedStreamRegistry(os.environ[STATE_DB_ENV])
+    load_shedder = None
+    if role != ROLE_WORKER:
+        metrics.bind_engine(transcoding_engine)
+        tracer.configure(app_config.trace_buffer_size, app_config.trace_export_path)
+        if app_config.load_shedding:
+            load_shedder = LoadShedder(
+                transcoding_engine,
+                cpu_threshold=app_config.shed_cpu_threshold,
+                speed_threshold=app_config.shed_speed_threshold,
+                shed_after=app_config.shed_after,
+                restore_after=app_config.restore_after
+            )
+            load_shedder.start()
+    loop_lag_monitor = LoopLagMonitor()
+    loop_lag_monitor.start()
+    
+    loop = asyncio.get_running_loop()
+    app.state.stall_watchdog = None
+    if app.state.config_manager.app_config.enable_profiling:
+        app.state.stall_watchdog = LoopStallWatchdog(app.state.config_manager.app_config.loop_stall_threshold)
+        app.state.stall_watchdog.start(loop)
+    try:
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(_reload_from_signal()))
+    except (ValueError, RuntimeError, NotImplementedError, AttributeError):
+        # Not the main thread (e.g. TestClient) or no SIGHUP on this platform
+        logger.debug("SIGHUP config reload not available")
+    
     yield
     # Shutdown
+    try:
+        loop.remove_signal_handler(signal.SIGHUP)
+    except (ValueError, RuntimeError, NotImplementedError, AttributeError):
+        pass
+    await loop_lag_monitor.stop()
+    if load_shedder is not None:
+        await load_shedder.stop()
+    if app.state.stall_watchdog is not None:
+        app.state.stall_watchdog.stop()
     if transcoding_engine:
         await transcoding_engine.close()
+    if isinstance(active_streams, SharedStreamRegistry):
+        active_streams.close()
+    # Leave nothing behind for the next startup in this process
+    transcoding_engine = None
+    active_streams = {}
 
 
 app = FastAPI(title="M3U8 Codec Forward", version="0.1.0", lifespan=lifespan)
@@ -40,6 +149,7 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
 )
+app.add_middleware(MetricsMiddleware)
 
 
 @app.post("/start-transcoding")
@@ -47,85 +157,122 @@ async def start_transcoding(
     input_url: HttpUrl,
     background_tasks: BackgroundTasks,
     output_host: str = "localhost",
-    output_port: int = 8080
+    output_port: int = 8080,
+    start_offset: Optional[float] = None,
+    preset: Optional[str] = None,
+    variants: Optional[List[StreamVariant]] = Body(default=None)
 ):
     global transcoding_engine, active_streams
     
     if not transcoding_engine:
         raise HTTPException(status_code=500, detail="Transcoding engine not initialized")
     
-    # Default output variants
-    output_variants = [
-        StreamVariant(
-            codec=CodecType.H264,
-            audio_codec=AudioCodec.AAC_LC,
-            resolution=Resolution(width=1920, height=1080),
-            bitrate=5000,
-            framerate=30.0,
-            container=ContainerFormat.TS
-        ),
-        StreamVariant(
-            codec=CodecType.H264,
-            audio_codec=AudioCodec.AAC_LC,
-            resolution=Resolution(width=1280, height=720),
-            bitrate=3000,
-            framerate=30.0,
-            container=ContainerFormat.TS
-        ),
-        StreamVariant(
-            codec=CodecType.H265,
-            audio_codec=AudioCodec.AAC_LC,
-            resolution=Resolution(width=1920, height=1080),
-            bitrate=3000,
-            framerate=30.0,
-            container=ContainerFormat.FMP4
-        ),
-        StreamVariant(
-            codec=CodecType.VP9,
-            audio_codec=AudioCodec.OPUS,
-            resolution=Resolution(width=1280, height=720),
-            bitrate=2500,
-            framerate=30.0,
-            container=ContainerFormat.WEBM
-        )
-    ]
+    output_variants, preset_name = _resolve_ladder(preset, variants)
     
     config = TranscodingConfig(
         input_url=input_url,
         output_variants=output_variants,
         output_host=output_host,
-        output_port=output_port
+        output_port=output_port,
+        start_offset=start_offset,
+        preset=preset_name
     )
     
     try:
         variant_urls = await transcoding_engine.start_transcoding(config)
         
         stream_id = str(input_url)
-        active_streams[stream_id] = {
-            "input_url": str(input_url),
-            "variants": variant_urls,
-            "config": config.dict()
-        }
+        adjustments = await _register_stream(stream_id, config, variant_urls)
         
         return {
             "message": "Transcoding started successfully",
             "stream_id": stream_id,
-            "variants": variant_urls
+            "preset": preset_name,
+            "variants": variant_urls,
+            "adjustments": adjustments
         }
-        
+    
+    except AdmissionError as e:
+        logger.warning(f"Rejected transcoding request: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except SeekError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to start transcoding: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to start transcoding: {str(e)}")
 
 
+async def _register_stream(stream_id: str, config: TranscodingConfig,
+                           variant_urls: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Record a started stream with the ladder the engine runs; returns the ladder adjustments."""
+    stream = await transcoding_engine.describe_stream(stream_id)
+    if stream is None:
+        stream = {"config": config.model_dump(mode="json"), "adjustments": []}
+    active_streams[stream_id] = {
+        "input_url": stream_id,
+        "variants": variant_urls,
+        "config": stream["config"],
+        "adjustments": stream["adjustments"]
+    }
+    return stream["adjustments"]
+
+
+def _config_manager() -> ConfigManager:
+    if not hasattr(app.state, "config_manager"):
+        app.state.config_manager = ConfigManager()
+    return app.state.config_manager
+
+
+def _resolve_ladder(preset: Optional[str],
+                    variants: Optional[List[StreamVariant]]) -> Tuple[List[StreamVariant], Optional[str]]:
+    """Pick the variants to encode: an inline list wins, else the named or default preset."""
+    if variants:
+        if preset:
+            raise HTTPException(status_code=400, detail="Pass either a preset or variants, not both")
+        return variants, None
+    
+    config_manager = _config_manager()
+    preset_name = preset or config_manager.app_config.default_preset
+    plan = config_manager.get_plan(preset_name)
+    if plan is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Preset '{preset_name}' not found. Available presets: {config_manager.list_presets()}"
+        )
+    return list(plan.variants), preset_name
+
+
+@app.get("/presets")
+async def list_presets():
+    """Presets with their estimated encoding cost and egress, for picking a ladder per node."""
+    config_manager = _config_manager()
+    cost_table = getattr(app.state, "cost_table", None)
+    return {
+        "default_preset": config_manager.app_config.default_preset,
+        "presets": [
+            config_manager.get_plan(name).describe(cost_table)
+            for name in config_manager.list_presets()
+        ]
+    }
+
+
 @app.get("/streams")
 async def list_active_streams():
     return {
-        "active_streams": active_streams,
-        "total_streams": len(active_streams)
+        "active_streams": dict(active_streams.items()),
+        "total_streams": len(active_streams),
+        "shed_variants": await _shed_status()
     }
 
 
+async def _shed_status() -> List[Dict[str, Any]]:
+    if transcoding_engine is None:
+        return []
+    if isinstance(transcoding_engine, RemoteTranscodingEngine):
+        return await transcoding_engine.shed_status()
+    return transcoding_engine.shed_status()
+
+
 @app.get("/uris")
 async def get_all_uris():
     """Return all available stream URIs from active streams."""
@@ -158,89 +305,279 @@ async def stop_stream(stream_id: str):
         del active_streams[stream_id]
         
         return {"message": f"Stream {stream_id} stopped successfully"}
-        
+    
     except Exception as e:
         logger.error(f"Failed to stop stream: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to stop stream: {str(e)}")
 
 
+def _require_engine_role():
+    if getattr(app.state, "role", ROLE_STANDALONE) != ROLE_ENGINE:
+        raise HTTPException(status_code=404, detail="Not found")
+
+
+@app.post("/internal/engine/start")
+async def engine_start_transcoding(config: TranscodingConfig):
+    """Start encoders on behalf of an HTTP worker (engine process only)."""
+    _require_engine_role()
+    
+    try:
+        return await transcoding_engine.start_transcoding(config)
+    except AdmissionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SeekError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Engine failed to start transcoding: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/internal/engine/stop")
+async def engine_stop_transcoding(variant_name: Optional[str] = None):
+    """Stop encoders on behalf of an HTTP worker (engine process only)."""
+    _require_engine_role()
+    
+    await transcoding_engine.stop_transcoding(variant_name)
+    return {"stopped": variant_name or "all"}
+
+
+@app.get("/internal/engine/metrics")
+async def engine_metrics():
+    """Encoder and source metrics for the HTTP workers' /metrics (engine process only)."""
+    _require_engine_role()
+    
+    return Response(content=metrics.engine_registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/internal/engine/stream")
+async def engine_describe_stream(stream_id: str):
+    """A stream's fitted ladder, for the HTTP workers (engine process only)."""
+    _require_engine_role()
+    
+    return {"stream": await transcoding_engine.describe_stream(stream_id)}
+
+
+@app.get("/internal/engine/shed")
+async def engine_shed_variants():
+    """Variants shed under load, for the HTTP workers (engine process only)."""
+    _require_engine_role()
+    
+    return {"shed_variants": transcoding_engine.shed_status()}
+
+
+@app.get("/internal/engine/progressive/{variant_name}")
+async def engine_progressive_stream(variant_name: str):
+    """A progressive variant's live output, relayed by the HTTP workers (engine process only)."""
+    _require_engine_role()
+    
+    return await _progressive_response(variant_name)
+
+
+@app.get("/internal/engine/traces")
+async def engine_traces(limit: Optional[int] = None):
+    """Recent start-up traces for the HTTP workers' /traces (engine process only)."""
+    _require_engine_role()
+    
+    return {"traces": tracer.recent(limit)}
+
+
+@app.post("/admin/reload-config")
+async def reload_config_endpoint():
+    """Re-read the config file and apply it to running streams."""
+    if getattr(app.state, "role", ROLE_STANDALONE) == ROLE_WORKER:
+        # Validate here so errors reach the caller, then let the supervisor
+        # fan SIGHUP out to the engine and every worker
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, app.state.config_manager.reload)
+        except (FileNotFoundError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid configuration: {e}")
+        os.kill(os.getppid(), signal.SIGHUP)
+        return {"message": "Reload signalled to all processes"}
+    
+    try:
+        changes = await reload_config()
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid configuration: {e}")
+    except Exception as e:
+        logger.error(f"Failed to apply configuration: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to apply configuration: {str(e)}")
+    
+    return {"message": "Configuration reloaded", **changes}
+
+
+def _require_profiling():
+    if not _config_manager().app_config.enable_profiling:
+        raise HTTPException(status_code=404, detail="Profiling is disabled; set enable_profiling in the config")
+
+
+@app.get("/admin/loop-stalls")
+async def list_loop_stalls(limit: int = 20):
+    """Recent event loop stalls, newest first, with the stack that blocked the loop."""
+    _require_profiling()
+    
+    watchdog = getattr(app.state, "stall_watchdog", None)
+    if watchdog is None:
+        raise HTTPException(status_code=409, detail="Loop stall watchdog starts with the server; restart to enable it")
+    return {
+        "threshold_ms": watchdog.threshold * 1000,
+        "stalls": watchdog.recent(limit),
+    }
+
+
+@app.get("/admin/profile")
+async def sample_profile(seconds: float = 10.0, interval: float = 0.005):
+    """Sample this process's stacks for ``seconds`` and return them in collapsed format.
+    
+    Pipe the output into flamegraph.pl or open it in speedscope.
+    """
+    _require_profiling()
+    
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS:g}] and interval positive"
+        )
+    profiler = app.state.profiler
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already being taken")
+    return PlainTextResponse(await profiler.profile(seconds, interval))
+
+
+async def reload_config() -> Dict[str, Any]:
+    """Reload the config file and apply the changes to the local engine.
+    
+    Only encoders whose effective settings changed are restarted; streams
+    started from a preset follow that preset's new ladder.
+    """
+    async with app.state.reload_lock:
+        loop = asyncio.get_running_loop()
+        # Reading and validating the file is blocking work
+        config_manager = await loop.run_in_executor(None, app.state.config_manager.reload)
+        app.state.config_manager = config_manager
+        
+        if not isinstance(transcoding_engine, TranscodingEngine):
+            # Workers only hold the config; the engine process applies it
+            return {"restarted": [], "streams": {}}
+        
+        ladders = {}
+        for stream_id, context in transcoding_engine.streams.items():
+            if context.config.preset is None:
+                continue
+            plan = config_manager.get_plan(context.config.preset)
+            if plan is None:
+                logger.warning(f"Preset '{context.config.preset}' of stream {stream_id} no longer exists, keeping its ladder")
+                continue
+            ladders[stream_id] = list(plan.variants)
+        
+        app_config = config_manager.app_config
+        tracer.configure(app_config.trace_buffer_size, app_config.trace_export_path)
+        changes = await transcoding_engine.reconfigure(
+            app_config.segment_duration, app_config.playlist_size, ladders
+        )
+        
+        for stream_id, stream_changes in changes["streams"].items():
+            if stream_id in active_streams:
+                stream_data = active_streams[stream_id]
+                stream_data["variants"] = stream_changes["variants"]
+                stream_data["config"] = transcoding_engine.streams[stream_id].config.model_dump(mode="json")
+                stream_data["adjustments"] = transcoding_engine.streams[stream_id].adjustments
+                active_streams[stream_id] = stream_data
+        
+        logger.info(
+            f"Configuration reloaded: restarted {len(changes['restarted'])} encoders, "
+            f"updated {len(changes['streams'])} streams"
+        )
+        return changes
+
+
+async def _reload_from_signal():
+    try:
+        await reload_config()
+    except Exception as e:
+        logger.error(f"Configuration reload failed, keeping the previous configuration: {e}")
+
+
+@app.get("/master.m3u8")
+async def serve_master_playlist(request: Request, stream_id: Optional[str] = None):
+    """Master playlist of a stream's HLS variants, leaving out variants shed under load."""
+    if stream_id is None:
+        if len(active_streams) != 1:
+            raise HTTPException(
+                status_code=400 if active_streams else 404,
+                detail=f"Pass stream_id; active streams: {list(active_streams.keys())}"
+            )
+        stream_id = next(iter(active_streams.keys()))
+    if stream_id not in active_streams:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    
+    config = TranscodingConfig.model_validate(active_streams[stream_id]["config"])
+    shed = {entry["variant"] for entry in await _shed_status() if entry["stream_id"] == stream_id}
+    variants = tuple(
+        variant for variant in config.output_variants if variant.variant_name not in shed
+    )
+    entry = playlist_cache.get_generated(
+        ("master", stream_id), variants, lambda: master_playlist(variants).encode()
+    )
+    return _cached_playlist_response(request, entry, HLS_MEDIA_TYPE)
+
+
+@app.get("/stream/{variant_name}")
+async def serve_progressive_stream(variant_name: str):
+    """Live output of an MP4, WebM, MKV, FLV or AVI variant over chunked HTTP.
+    
+    Every client shares the variant's single encoder; new clients start at
+    the latest keyframe.
+    """
+    if not transcoding_engine:
+        raise HTTPException(status_code=500, detail="Transcoding engine not initialized")
+    
+    return await _progressive_response(variant_name)
+
+
+async def _progressive_response(variant_name: str) -> StreamingResponse:
+    opened = await transcoding_engine.open_progressive(variant_name)
+    if opened is None:
+        raise HTTPException(status_code=404, detail=f"No progressive stream for '{variant_name}'")
+    media_type, chunks = opened
+    return StreamingResponse(chunks, media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
 @app.get("/{variant_name}.m3u8")
-async def serve_playlist(variant_name: str, input_url: HttpUrl = None):
+async def serve_playlist(request: Request, variant_name: str, input_url: HttpUrl = None,
+                         preset: Optional[str] = None):
     global transcoding_engine, active_streams
     
     if not transcoding_engine:
         raise HTTPException(status_code=500, detail="Transcoding engine not initialized")
     
     playlist_path = transcoding_engine.working_dir / f"{variant_name}.m3u8"
+    response = _playlist_response(request, playlist_path)
     
-    if not playlist_path.exists():
+    if response is None:
         # If no active transcoding and input_url provided, start transcoding automatically
         if input_url and not active_streams:
+            output_variants, preset_name = _resolve_ladder(preset, None)
             try:
-                # Use default variants for auto-start
-                output_variants = [
-                    StreamVariant(
-                        codec=CodecType.H264,
-                        audio_codec=AudioCodec.AAC_LC,
-                        resolution=Resolution(width=1920, height=1080),
-                        bitrate=5000,
-                        framerate=30.0,
-                        container=ContainerFormat.TS
-                    ),
-                    StreamVariant(
-                        codec=CodecType.H264,
-                        audio_codec=AudioCodec.AAC_LC,
-                        resolution=Resolution(width=1280, height=720),
-                        bitrate=3000,
-                        framerate=30.0,
-                        container=ContainerFormat.TS
-                    ),
-                    StreamVariant(
-                        codec=CodecType.H265,
-                        audio_codec=AudioCodec.AAC_LC,
-                        resolution=Resolution(width=1920, height=1080),
-                        bitrate=3000,
-                        framerate=30.0,
-                        container=ContainerFormat.FMP4
-                    ),
-                    StreamVariant(
-                        codec=CodecType.VP9,
-                        audio_codec=AudioCodec.OPUS,
-                        resolution=Resolution(width=1280, height=720),
-                        bitrate=2500,
-                        framerate=30.0,
-                        container=ContainerFormat.WEBM
-                    )
-                ]
-                
                 config = TranscodingConfig(
                     input_url=input_url,
                     output_variants=output_variants,
                     output_host="localhost",
-                    output_port=8080
+                    output_port=8080,
+                    preset=preset_name
                 )
                 
                 variant_urls = await transcoding_engine.start_transcoding(config)
-                
-                stream_id = str(input_url)
-                active_streams[stream_id] = {
-                    "input_url": str(input_url),
-                    "variants": variant_urls,
-                    "config": config.model_dump()
-                }
+                await _register_stream(str(input_url), config, variant_urls)
                 
                 # Wait a moment for the playlist file to be created
                 import asyncio
                 await asyncio.sleep(1)
                 
                 # Check again if file exists
-                if playlist_path.exists():
-                    return FileResponse(
-                        path=str(playlist_path),
-                        media_type="application/vnd.apple.mpegurl",
-                        headers={"Cache-Control": "no-cache"}
-                    )
-                    
+                response = _playlist_response(request, playlist_path)
+                if response is not None:
+                    return response
+            
             except Exception as e:
                 logger.error(f"Failed to auto-start transcoding: {e}")
                 raise HTTPException(
@@ -260,11 +597,32 @@ async def serve_playlist(variant_name: str, input_url: HttpUrl = None):
                 detail=f"Playlist '{variant_name}.m3u8' not found. Available variants: {list(active_streams.keys())}"
             )
     
-    return FileResponse(
-        path=str(playlist_path),
-        media_type="application/vnd.apple.mpegurl",
-        headers={"Cache-Control": "no-cache"}
-    )
+    return response
+
+
+def _playlist_response(request: Request, playlist_path: Path,
+                       media_type: str = HLS_MEDIA_TYPE) -> Optional[Response]:
+    entry = playlist_cache.get_file(playlist_path)
+    if entry is None:
+        return None
+    return _cached_playlist_response(request, entry, media_type)
+
+
+def _cached_playlist_response(request: Request, entry: CachedPlaylist, media_type: str) -> Response:
+    body, encoding = entry.select(request.headers.get("accept-encoding"))
+    etag = entry.etag_for(encoding)
+    headers = {
+        "Cache-Control": "no-cache",
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
 
 
 @app.get("/health")
@@ -272,6 +630,31 @@ async def health_check():
     return {"status": "healthy", "service": "m3u8-codec-forward"}
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    body = metrics.registry.render()
+    if isinstance(transcoding_engine, RemoteTranscodingEngine):
+        # Encoders run in the engine process; fetch its metrics over the socket
+        try:
+            body += await transcoding_engine.metrics()
+        except Exception as e:
+            logger.warning(f"Could not collect engine metrics: {e}")
+    else:
+        body += metrics.engine_registry.render()
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/traces")
+async def list_traces(limit: int = 20):
+    """Most recent stream start-up traces, newest first, with per-phase timings."""
+    if isinstance(transcoding_engine, RemoteTranscodingEngine):
+        try:
+            return {"traces": await transcoding_engine.traces(limit)}
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Could not fetch engine traces: {e}")
+    return {"traces": tracer.recent(limit)}
+
+
 @app.get("/api")
 async def serve_api_html():
     """Serve the API HTML interface"""
@@ -285,8 +668,30 @@ async def serve_api_html():
         raise HTTPException(status_code=404, detail="API interface not found")
 
 
+@app.get("/{variant_name}/{file_name}")
+async def serve_cmaf_file(request: Request, variant_name: str, file_name: str):
+    """HLS playlists, DASH manifest and shared segments of a CMAF variant."""
+    if not transcoding_engine:
+        raise HTTPException(status_code=500, detail="Transcoding engine not initialized")
+    if variant_name.startswith(".") or file_name.startswith("."):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    path = transcoding_engine.working_dir / variant_name / file_name
+    response = None
+    if path.is_file():
+        if file_name.endswith(".m3u8"):
+            response = _playlist_response(request, path)
+        elif file_name.endswith(".mpd"):
+            response = _playlist_response(request, path, DASH_MEDIA_TYPE)
+        else:
+            response = FileResponse(path=str(path), media_type="video/mp4")
+    if response is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return response
+
+
 @app.get("/{segment_name}")
-async def serve_segment(segment_name: str):
+async def serve_segment(request: Request, segment_name: str):
     global transcoding_engine
     
     if not transcoding_engine:
@@ -297,9 +702,24 @@ async def serve_segment(segment_name: str):
     if not segment_path.exists():
         raise HTTPException(status_code=404, detail="Segment not found")
     
+    media_type = SEGMENT_MEDIA_TYPES.get(segment_path.suffix, "video/mp2t")
+    range_header = request.headers.get("range")
+    if range_header is not None:
+        # Single-file variants list their segments as byte ranges
+        size = segment_path.stat().st_size
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            pass
+        else:
+            if byte_range is None:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+            return FileRangeResponse(str(segment_path), *byte_range, size, media_type)
+    
     return FileResponse(
         path=str(segment_path),
-        media_type="video/mp2t"
+        media_type=media_type,
+        headers={"Accept-Ranges": "bytes"}
     )
 
 
@@ -311,10 +731,15 @@ async def root():
         "endpoints": {
             "start_transcoding": "POST /start-transcoding",
             "list_streams": "GET /streams", 
+            "list_presets": "GET /presets",
             "get_all_uris": "GET /uris",
             "stop_stream": "DELETE /streams/{stream_id}",
             "serve_playlist": "GET /{variant_name}.m3u8",
             "serve_segment": "GET /{segment_name}",
-            "health": "GET /health"
+            "serve_cmaf_file": "GET /{variant_name}/{file_name}",
+            "reload_config": "POST /admin/reload-config",
+            "health": "GET /health",
+            "metrics": "GET /metrics",
+            "traces": "GET /traces"
         }
     }
\ No newline at end of file
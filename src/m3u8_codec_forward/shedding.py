@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from .models import VariantPriority
+from .speed_control import WARMUP_REPORTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CPU_THRESHOLD = 0.95
+DEFAULT_SPEED_THRESHOLD = 0.9
+DEFAULT_SHED_AFTER = 15.0
+DEFAULT_RESTORE_AFTER = 60.0
+CHECK_INTERVAL = 1.0
+
+# Lower sheds first; essential variants are never shed
+SHED_ORDER = {VariantPriority.OPTIONAL: 0, VariantPriority.NORMAL: 1}
+
+
+class CpuSampler:
+    """System-wide CPU utilisation between consecutive samples, read from /proc/stat."""
+    
+    def __init__(self, path: str = "/proc/stat"):
+        self.path = path
+        self._last: Optional[Tuple[int, int]] = None
+    
+    def sample(self) -> Optional[float]:
+        try:
+            with open(self.path) as f:
+                values = [int(value) for value in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        # user nice system idle iowait irq softirq steal; guest time is already in user
+        idle = values[3] + values[4]
+        total = sum(values[:8])
+        last, self._last = self._last, (idle, total)
+        if last is None or total == last[1]:
+            return None
+        return 1.0 - (idle - last[0]) / (total - last[1])
+
+
+class LoadShedder:
+    """Sheds optional, then normal-priority variants while the node stays overloaded.
+
+    The node is under pressure while CPU utilisation is above
+    ``cpu_threshold`` or any encoder past its warm-up reports runs slower
+    than ``speed_threshold``.
+    Once pressure has lasted ``shed_after`` seconds the most expensive
+    variant of the lowest priority is shed, and the clock starts again so
+    each shed gets time to take effect. After ``restore_after`` seconds
+    without pressure the most recently shed variant is restarted.
+    """
+    
+    def __init__(self, engine, cpu_threshold: float = DEFAULT_CPU_THRESHOLD,
+                 speed_threshold: float = DEFAULT_SPEED_THRESHOLD,
+                 shed_after: float = DEFAULT_SHED_AFTER,
+                 restore_after: float = DEFAULT_RESTORE_AFTER,
+                 interval: float = CHECK_INTERVAL,
+                 cpu_sampler: Optional[CpuSampler] = None):
+        self.engine = engine
+        self.cpu_threshold = cpu_threshold
+        self.speed_threshold = speed_threshold
+        self.shed_after = shed_after
+        self.restore_after = restore_after
+        self.interval = interval
+        self.cpu_sampler = cpu_sampler or CpuSampler()
+        self._pressure_since: Optional[float] = None
+        self._calm_since: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def pressure(self) -> Optional[str]:
+        """Why the node is overloaded right now, or None."""
+        cpu = self.cpu_sampler.sample()
+        if cpu is not None and cpu > self.cpu_threshold:
+            return f"CPU at {cpu:.0%}"
+        # New encoders report low speeds while they probe their input
+        speeds = [
+            speed for name, speed in self.engine.encoder_speeds.items()
+            if name in self.engine.active_processes
+            and self.engine.encoder_reports.get(name, 0) > WARMUP_REPORTS
+        ]
+        if speeds and min(speeds) < self.speed_threshold:
+            return f"encoder speed down to {min(speeds):.2f}x"
+        return None
+    
+    def shed_candidates(self) -> List[str]:
+        """Running variants in the order they would be shed."""
+        cost_table = self.engine.cost_table
+        
+        def cost(name, variant) -> float:
+            level = self.engine.speed_levels.get(name, 0)
+            cores = cost_table.cores(variant, level) if cost_table is not None else None
+            return cores if cores is not None else variant.cost_estimate
+        
+        candidates = [
+            (name, variant) for name, variant in self.engine.running_variants().items()
+            if variant.priority in SHED_ORDER
+        ]
+        candidates.sort(key=lambda item: (SHED_ORDER[item[1].priority], -cost(*item)))
+        return [name for name, _ in candidates]
+    
+    async def check(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        reason = self.pressure()
+        if reason is not None:
+            self._calm_since = None
+            if self._pressure_since is None:
+                self._pressure_since = now
+            if now - self._pressure_since >= self.shed_after:
+                candidates = self.shed_candidates()
+                if candidates:
+                    await self.engine.shed_variant(candidates[0], reason)
+                self._pressure_since = now
+            return
+        
+        self._pressure_since = None
+        if self._calm_since is None:
+            self._calm_since = now
+        if self.engine.shed_variants and now - self._calm_since >= self.restore_after:
+            await self.engine.restore_variant(list(self.engine.shed_variants)[-1])
+            self._calm_since = now
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Load shedding check failed: {e}")
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
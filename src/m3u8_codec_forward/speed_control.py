@@ -0,0 +1,82 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+
+DEFAULT_SLOW_THRESHOLD = 0.95
+DEFAULT_RECOVER_THRESHOLD = 0.99
+# ffmpeg writes a progress report about twice a second
+DEFAULT_WINDOW = 10
+DEFAULT_RECOVER_REPORTS = 120
+# Reports right after a (re)start cover probing and are not representative
+WARMUP_REPORTS = 4
+MAX_BACKOFF = 8
+
+
+class _VariantState:
+    __slots__ = ("samples", "seen", "healthy", "backoff", "since_recovery")
+    
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.seen = 0
+        self.healthy = 0
+        self.backoff = 1
+        self.since_recovery: Optional[int] = None
+    
+    def restart(self):
+        self.samples.clear()
+        self.seen = 0
+        self.healthy = 0
+
+
+class SpeedController:
+    """Picks each encoder's speed level from the speed it reports.
+
+    A variant steps one level faster once its mean speed over ``window``
+    reports is below ``slow_threshold``. Input read with ``-re`` caps the
+    reported speed at about 1.0x, so headroom shows up as speed that stays
+    at ``recover_threshold`` or above: after ``recover_reports`` such
+    reports in a row the variant steps one level back. A step back that
+    has to be undone within ``recover_reports`` doubles the wait before the
+    next one, up to ``MAX_BACKOFF`` times, so a node at its limit does not
+    keep flapping between two levels.
+    """
+    
+    def __init__(self, slow_threshold: float = DEFAULT_SLOW_THRESHOLD,
+                 recover_threshold: float = DEFAULT_RECOVER_THRESHOLD,
+                 window: int = DEFAULT_WINDOW,
+                 recover_reports: int = DEFAULT_RECOVER_REPORTS):
+        self.slow_threshold = slow_threshold
+        self.recover_threshold = recover_threshold
+        self.window = window
+        self.recover_reports = recover_reports
+        self._states: Dict[str, _VariantState] = {}
+    
+    def observe(self, variant_name: str, speed: float, level: int, max_level: int) -> Optional[int]:
+        """Record one speed report; returns the new level when it should change."""
+        state = self._states.get(variant_name)
+        if state is None:
+            state = self._states[variant_name] = _VariantState(self.window)
+        state.seen += 1
+        if state.since_recovery is not None:
+            state.since_recovery += 1
+        if state.seen <= WARMUP_REPORTS:
+            return None
+        
+        state.samples.append(speed)
+        state.healthy = state.healthy + 1 if speed >= self.recover_threshold else 0
+        
+        if (level < max_level and len(state.samples) == self.window
+                and sum(state.samples) / self.window < self.slow_threshold):
+            if state.since_recovery is not None and state.since_recovery <= self.recover_reports:
+                state.backoff = min(state.backoff * 2, MAX_BACKOFF)
+            state.since_recovery = None
+            state.restart()
+            return level + 1
+        
+        if level > 0 and state.healthy >= self.recover_reports * state.backoff:
+            state.since_recovery = 0
+            state.restart()
+            return level - 1
+        return None
+    
+    def forget(self, variant_name: str):
+        self._states.pop(variant_name, None)
@@ -0,0 +1,96 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator
+
+
+class SharedStreamRegistry(MutableMapping):
+    """Stream registry shared between server processes through SQLite in WAL mode.
+
+    Behaves like the ``active_streams`` dict used by a single-process server,
+    so HTTP workers and the engine process see the same set of streams. Values
+    must be JSON serialisable.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 5.0):
+        self.db_path = str(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS streams ("
+                "stream_id TEXT PRIMARY KEY, "
+                "data TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __getitem__(self, stream_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT data FROM streams WHERE stream_id = ?", (stream_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(stream_id)
+        return json.loads(row[0])
+
+    def __setitem__(self, stream_id: str, data: Dict[str, Any]):
+        self._connection().execute(
+            "INSERT INTO streams (stream_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(stream_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (stream_id, json.dumps(data, default=str), time.time())
+        )
+
+    def __delitem__(self, stream_id: str):
+        cursor = self._connection().execute("DELETE FROM streams WHERE stream_id = ?", (stream_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(stream_id)
+
+    def __contains__(self, stream_id: object) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM streams WHERE stream_id = ?", (stream_id,)
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._connection().execute("SELECT stream_id FROM streams ORDER BY updated_at").fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM streams").fetchone()[0]
+
+    def items(self):
+        rows = self._connection().execute("SELECT stream_id, data FROM streams ORDER BY updated_at").fetchall()
+        return [(stream_id, json.loads(data)) for stream_id, data in rows]
+
+    def clear(self):
+        self._connection().execute("DELETE FROM streams")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+
+# Environment used to hand the process topology to server processes in
+# multi-process mode (see ``main.py --workers``)
+ROLE_ENV = "M3U8CF_ROLE"
+ENGINE_SOCKET_ENV = "M3U8CF_ENGINE_SOCKET"
+STATE_DB_ENV = "M3U8CF_STATE_DB"
+WORKING_DIR_ENV = "M3U8CF_WORKING_DIR"
+CONFIG_PATH_ENV = "M3U8CF_CONFIG"
+
+ROLE_STANDALONE = "standalone"
+ROLE_ENGINE = "engine"
+ROLE_WORKER = "worker"
@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 100
+SERVICE_NAME = "m3u8-codec-forward"
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("m3u8cf_current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+    
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def end(self, error: Optional[str] = None):
+        """End the span; later calls are ignored."""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.error = error
+        self.trace._span_ended()
+    
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return round((self.end_ns - self.start_ns) / 1e6, 3)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            # Offset from the start of the trace, so phases line up at a glance
+            "start_offset_ms": round((self.start_ns - self.trace.root.start_ns) / 1e6, 3),
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans of one operation. Complete once every span has ended."""
+    
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self._open = 0
+        self.root = self._add_span(name, None, attributes)
+    
+    def _add_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        span = Span(self, name, parent_id, attributes)
+        self.spans.append(span)
+        self._open += 1
+        return span
+    
+    def _span_ended(self):
+        self._open -= 1
+        if self._open == 0:
+            self.tracer._trace_completed(self)
+    
+    @property
+    def complete(self) -> bool:
+        return self._open == 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        end_ns = max((span.end_ns or 0) for span in self.spans) if self.complete else None
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": self.root.start_ns / 1e9,
+            "duration_ms": round((end_ns - self.root.start_ns) / 1e6, 3) if end_ns else None,
+            "complete": self.complete,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class OTLPFileExporter:
+    """Appends completed traces to a file as OTLP/JSON, one request per line.
+
+    The format is what the OpenTelemetry Collector's ``otlpjsonfile``
+    receiver reads.
+    """
+    
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+    
+    def export(self, trace: Trace):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(self.encode(trace), separators=(",", ":")) + "\n")
+    
+    def encode(self, trace: Trace) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": __package__},
+                    "spans": [self._encode_span(trace, span) for span in trace.spans],
+                }],
+            }]
+        }
+    
+    @staticmethod
+    def _encode_span(trace: Trace, span: Span) -> Dict[str, Any]:
+        status = {"code": STATUS_ERROR, "message": span.error} if span.error else {"code": STATUS_OK}
+        return {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+            "status": status,
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+class Tracer:
+    """Keeps the most recent traces in memory and hands completed ones to an exporter.
+
+    The current span travels in a context variable, so spans opened in
+    nested calls, and in tasks created inside them, attach to the right
+    parent without passing it around. Outside a trace, ``span`` and
+    ``start_span`` record nothing.
+    """
+    
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 exporter: Optional[OTLPFileExporter] = None):
+        self.traces: Deque[Trace] = deque(maxlen=buffer_size)
+        self.exporter = exporter
+    
+    def configure(self, buffer_size: int = DEFAULT_BUFFER_SIZE, export_path: Optional[str] = None):
+        self.traces = deque(self.traces, maxlen=buffer_size)
+        self.exporter = OTLPFileExporter(export_path) if export_path else None
+    
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Span]:
+        """Start a new trace whose root span covers the block."""
+        trace = Trace(self, name, attributes)
+        self.traces.append(trace)
+        with self._activate(trace.root):
+            yield trace.root
+    
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes) -> Iterator[Optional[Span]]:
+        span = self.start_span(name, parent, **attributes)
+        if span is None:
+            yield None
+            return
+        with self._activate(span):
+            yield span
+    
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Optional[Span]:
+        """Open a child of ``parent`` (default: the current span) that the caller ends."""
+        parent = parent or _current_span.get()
+        if parent is None:
+            return None
+        return parent.trace._add_span(name, parent.span_id, attributes)
+    
+    @contextmanager
+    def _activate(self, span: Span):
+        token = _current_span.set(span)
+        try:
+            yield
+        except BaseException as e:
+            span.end(error=str(e) or type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+    
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+    
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        traces = list(reversed(self.traces))
+        if limit is not None:
+            traces = traces[:limit]
+        return [trace.to_dict() for trace in traces]
+    
+    def _trace_completed(self, trace: Trace):
+        if self.exporter is None:
+            return
+        try:
+            self.exporter.export(trace)
+        except OSError as e:
+            logger.warning(f"Could not export trace {trace.trace_id}: {e}")
+
+
+tracer = Tracer()
@@ -1,62 +1,633 @@
-import ffmpeg
 import asyncio
 import os
 import tempfile
 import shutil
-from typing import List, Dict, Optional
+import time
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
 from pathlib import Path
+from urllib.parse import urljoin
 import logging
 
-from .models import StreamVariant, TranscodingConfig, CodecType, AudioCodec, ContainerFormat
+from .models import (
+    StreamVariant, TranscodingConfig, CodecType, AudioCodec, ContainerFormat, HLS_CONTAINERS, PROGRESSIVE_CONTAINERS,
+    CMAF_MANIFEST, CMAF_HLS_PLAYLIST
+)
+from .calibration import CostTable
+from .encoders import video_encoder, audio_encoder, codec_specific_params, max_speed_level
 from .parser import M3U8Parser
+from .relay import IngestRelayPool, DEFAULT_LOOKAHEAD
+from .plan import VariantPlanDiff, SourceProfile, diff_variants, fit_to_source
+from .speed_control import SpeedController
+from .progressive import ProgressiveStream, DEFAULT_BUFFER_BYTES
+from .byterange import ByteRangePlaylist, DEFAULT_SEGMENTS_PER_FILE
+from . import metrics
+from .tracing import tracer, Span
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SEGMENT_DURATION = 6
+DEFAULT_PLAYLIST_SIZE = 10
+FIRST_SEGMENT_TIMEOUT = 120.0
+FIRST_SEGMENT_POLL_INTERVAL = 0.1
+# Segments to wait for a boundary before restarting an encoder at a new speed anyway
+SEGMENT_BOUNDARY_TIMEOUT = 3
+PIPE_READ_SIZE = 64 * 1024
+
+
+class AdmissionError(Exception):
+    """Starting the requested encoders would exceed the node's encoder capacity."""
+
+
+class SeekError(Exception):
+    """The source can't be started at the requested offset."""
+
+
+class _StreamContext:
+    """What a stream's encoders were started from, kept so single variants can be (re)started."""
+    
+    __slots__ = ("config", "source_variant", "input_url", "seek", "relay_source", "adjustments")
+    
+    def __init__(self, config: TranscodingConfig, source_variant: Dict, input_url: str,
+                 seek: Optional[float], relay_source: Optional[str],
+                 adjustments: Optional[List[Dict[str, Any]]] = None):
+        self.config = config
+        self.source_variant = source_variant
+        self.input_url = input_url
+        self.seek = seek
+        self.relay_source = relay_source
+        # How the requested ladder was fitted to the source
+        self.adjustments = adjustments or []
+
+
+class _ShedVariant:
+    """A variant stopped to relieve an overloaded node, kept so it can be restored."""
+    
+    __slots__ = ("context", "variant", "reason", "shed_at")
+    
+    def __init__(self, context: _StreamContext, variant: StreamVariant, reason: str):
+        self.context = context
+        self.variant = variant
+        self.reason = reason
+        self.shed_at = time.time()
+
 
 class TranscodingEngine:
-    def __init__(self, working_dir: Optional[str] = None):
+    def __init__(self, working_dir: Optional[str] = None, shared_ingest: bool = False,
+                 ingest_lookahead: int = DEFAULT_LOOKAHEAD,
+                 segment_duration: int = DEFAULT_SEGMENT_DURATION,
+                 playlist_size: int = DEFAULT_PLAYLIST_SIZE,
+                 cost_table: Optional[CostTable] = None,
+                 max_encoder_cores: Optional[float] = None,
+                 read_realtime: bool = True,
+                 speed_controller: Optional[SpeedController] = None,
+                 fit_to_source: bool = True,
+                 progressive_buffer: int = DEFAULT_BUFFER_BYTES,
+                 single_file: bool = False,
+                 segments_per_file: int = DEFAULT_SEGMENTS_PER_FILE):
+        # Only a directory the engine created itself is removed on cleanup
+        self._owns_working_dir = not working_dir
         self.working_dir = Path(working_dir) if working_dir else Path(tempfile.mkdtemp())
-        self.working_dir.mkdir(exist_ok=True)
+        self.working_dir.mkdir(parents=True, exist_ok=True)
         self.parser = M3U8Parser()
+        self.segment_duration = segment_duration
+        self.playlist_size = playlist_size
+        self.cost_table = cost_table
+        self.max_encoder_cores = max_encoder_cores or float(os.cpu_count() or 1)
+        # -re paces input reading for live output; offline jobs can run flat out
+        self.read_realtime = read_realtime
+        # Drop or cap variants that would upscale the source or exceed its bitrate
+        self.fit_to_source = fit_to_source
         self.active_processes: Dict[str, asyncio.subprocess.Process] = {}
+        # Stream contexts keyed by input URL, and the stream each variant belongs to
+        self.streams: Dict[str, _StreamContext] = {}
+        self._variant_streams: Dict[str, Tuple[_StreamContext, StreamVariant]] = {}
+        # With shared ingest all encoders of an input read one local relay
+        # instead of each pulling the source from the origin
+        self.relays = IngestRelayPool(self.parser, ingest_lookahead) if shared_ingest else None
+        self._ingest_leases: Dict[asyncio.subprocess.Process, str] = {}
+        # Output arguments per variant and speed level; cleared when output
+        # settings change
+        self._output_args: Dict[Tuple[StreamVariant, int], Tuple[str, ...]] = {}
+        # Last seen playlist mtime per variant, to time segment production
+        self._playlist_mtimes: Dict[str, int] = {}
+        # Traced encoder start-ups: the variant span and its open phase span
+        self._startup_traces: Dict[asyncio.subprocess.Process, Tuple[Span, Span]] = {}
+        # Encoder speed levels (0 = default settings) picked by the speed
+        # controller, and the restarts that apply a new level
+        self.speed_controller = speed_controller
+        self.speed_levels: Dict[str, int] = {}
+        self._speed_restarts: Dict[str, asyncio.Task] = {}
+        # Latest speed reported by each running encoder, and how many speed
+        # reports its current run has made
+        self.encoder_speeds: Dict[str, float] = {}
+        self.encoder_reports: Dict[str, int] = {}
+        # Variants shed under load, in the order they were shed
+        self.shed_variants: Dict[str, _ShedVariant] = {}
+        # In-memory fan-out of the running progressive variants' output
+        self.progressive_buffer = progressive_buffer
+        self.progressive_streams: Dict[str, ProgressiveStream] = {}
+        # With single_file, HLS variants append segments to one media file per
+        # encoder run (generation) instead of creating a file per segment; the
+        # engine writes the playlist players see over all of them
+        self.single_file = single_file
+        self.segments_per_file = segments_per_file
+        self._generations: Dict[str, int] = {}
+        self._byterange_playlists: Dict[str, ByteRangePlaylist] = {}
+        self._rotations: Dict[str, asyncio.Task] = {}
     
     async def start_transcoding(self, config: TranscodingConfig) -> Dict[str, str]:
-        master_info = await self.parser.get_master_playlist_info(str(config.input_url))
+        # The trace stays open until every encoder has written its first segment
+        with tracer.trace("start_transcoding", input_url=str(config.input_url),
+                          variants=len(config.output_variants)):
+            return await self._start_transcoding(config)
+    
+    async def _start_transcoding(self, config: TranscodingConfig) -> Dict[str, str]:
+        with tracer.span("get_master_playlist_info"):
+            master_info = await self.parser.get_master_playlist_info(str(config.input_url))
         
         if not master_info["variants"]:
             raise Exception("No variants found in master playlist")
         
         source_variant = self._select_best_source_variant(master_info["variants"])
         
-        variant_urls = {}
+        # Fitted before admission, so pruned variants don't count against capacity
+        variants, adjustments = self._fit_ladder(config.output_variants, source_variant)
+        config = config.model_copy(update={"output_variants": variants})
+        self._check_capacity(config.output_variants)
         
-        for variant in config.output_variants:
-            output_path = self.working_dir / f"{variant.variant_name}.m3u8"
-            
-            ffmpeg_cmd = self._build_ffmpeg_command(
-                str(config.input_url), 
-                str(output_path), 
-                variant, 
-                source_variant
+        input_url = str(config.input_url)
+        seek = None
+        previous = self.streams.get(input_url)
+        if config.start_offset:
+            with tracer.span("prepare_seek_input", start_offset=config.start_offset):
+                input_url, seek = await self._prepare_seek_input(
+                    str(config.input_url), source_variant, config.start_offset
+                )
+        
+        # Seek playlists already point at the exact source segments
+        relay_source = None
+        if self.relays is not None and seek is None:
+            relay_source = urljoin(input_url, source_variant["uri"])
+        
+        context = _StreamContext(config, source_variant, input_url, seek, relay_source, adjustments)
+        self.streams[str(config.input_url)] = context
+        
+        # Identical variants would share one output; encode them once
+        for variant in dict.fromkeys(config.output_variants):
+            await self._start_variant(context, variant)
+        if previous is not None:
+            # A restart of the stream may have taken over all of its variants
+            self._drop_stream_if_idle(previous)
+        
+        return self._variant_urls(config)
+    
+    def _fit_ladder(self, variants: List[StreamVariant],
+                    source_variant: Dict) -> Tuple[List[StreamVariant], List[Dict[str, Any]]]:
+        if not self.fit_to_source:
+            return list(dict.fromkeys(variants)), []
+        variants, adjustments = fit_to_source(variants, SourceProfile.from_variant(source_variant))
+        for adjustment in adjustments:
+            logger.info(f"Fitting ladder to source: {adjustment}")
+        return variants, adjustments
+    
+    async def describe_stream(self, stream_id: str) -> Optional[Dict[str, Any]]:
+        """The ladder a stream runs after fitting it to the source, and what fitting changed."""
+        context = self.streams.get(stream_id)
+        if context is None:
+            return None
+        return {
+            "config": context.config.model_dump(mode="json"),
+            "adjustments": context.adjustments,
+        }
+    
+    def committed_cores(self) -> float:
+        """Calibrated cores of the running encoders (uncalibrated variants count as 0)."""
+        if self.cost_table is None:
+            return 0.0
+        return sum(
+            self.cost_table.cores(variant, self.speed_levels.get(name, 0)) or 0.0
+            for name, (_, variant) in self._variant_streams.items()
+            if name in self.active_processes
+        )
+    
+    def _check_capacity(self, variants: List[StreamVariant]):
+        if self.cost_table is None:
+            return
+        requested = sum(self.cost_table.cores(variant) or 0.0 for variant in dict.fromkeys(variants))
+        committed = self.committed_cores()
+        if committed + requested > self.max_encoder_cores:
+            raise AdmissionError(
+                f"Not enough encoder capacity: ladder needs {requested:.2f} cores, "
+                f"{self.max_encoder_cores - committed:.2f} of {self.max_encoder_cores:.2f} available"
             )
+    
+    def _variant_urls(self, config: TranscodingConfig) -> Dict[str, str]:
+        base_url = f"http://{config.output_host}:{config.output_port}"
+        return {
+            variant.variant_name: self._variant_url(base_url, variant)
+            for variant in config.output_variants
+        }
+    
+    @staticmethod
+    def _variant_url(base_url: str, variant: StreamVariant) -> str:
+        if variant.container in PROGRESSIVE_CONTAINERS:
+            return f"{base_url}/stream/{variant.variant_name}"
+        if variant.container == ContainerFormat.CMAF:
+            # The DASH MPD sits next to it
+            return f"{base_url}/{variant.variant_name}/{CMAF_HLS_PLAYLIST}"
+        return f"{base_url}/{variant.variant_name}.m3u8"
+    
+    def _output_path(self, variant: StreamVariant) -> Path:
+        """Where ffmpeg writes the playlist or manifest it rewrites after each segment."""
+        if variant.container == ContainerFormat.CMAF:
+            return self.working_dir / variant.variant_name / CMAF_MANIFEST
+        if self._is_single_file(variant):
+            generation = self._generations.get(variant.variant_name, 0)
+            return self.working_dir / f"{variant.variant_name}_{generation:05d}.m3u8"
+        return self.working_dir / f"{variant.variant_name}.m3u8"
+    
+    def _is_single_file(self, variant: StreamVariant) -> bool:
+        return self.single_file and variant.container in HLS_CONTAINERS
+    
+    def _playlist_path(self, variant_name: str) -> Path:
+        entry = self._variant_streams.get(variant_name)
+        if entry is None:
+            return self.working_dir / f"{variant_name}.m3u8"
+        return self._output_path(entry[1])
+    
+    async def _start_variant(self, context: _StreamContext, variant: StreamVariant):
+        if self._is_single_file(variant):
+            # Every encoder run appends to a new media file
+            self._generations[variant.variant_name] = self._generations.get(variant.variant_name, -1) + 1
+            if variant.variant_name not in self._byterange_playlists:
+                self._byterange_playlists[variant.variant_name] = ByteRangePlaylist(self.playlist_size)
+        output_path = self._output_path(variant)
+        output_path.parent.mkdir(exist_ok=True)
+        variant_span = tracer.start_span("start_variant", variant=variant.variant_name)
+        # Progressive variants write to a pipe the engine reads, never to disk
+        pipe = os.pipe() if variant.container in PROGRESSIVE_CONTAINERS else None
+        output = f"pipe:{pipe[1]}" if pipe is not None else str(output_path)
+        
+        leased = False
+        try:
+            variant_input = context.input_url
+            if context.relay_source is not None:
+                with tracer.span("acquire_ingest_relay", parent=variant_span):
+                    variant_input = await self.relays.acquire(context.relay_source)
+                leased = True
             
-            process = await self._start_ffmpeg_process(ffmpeg_cmd, variant.variant_name)
-            self.active_processes[variant.variant_name] = process
-            
-            variant_urls[variant.variant_name] = f"http://{config.output_host}:{config.output_port}/{variant.variant_name}.m3u8"
+            with tracer.span("build_ffmpeg_command", parent=variant_span):
+                ffmpeg_cmd = self._build_ffmpeg_command(
+                    variant_input, 
+                    output, 
+                    variant, 
+                    context.source_variant,
+                    seek=context.seek
+                )
+        except Exception as e:
+            if variant_span is not None:
+                variant_span.end(error=str(e))
+            if leased:
+                await self.relays.release(context.relay_source)
+            if pipe is not None:
+                os.close(pipe[0])
+                os.close(pipe[1])
+            raise
+        
+        try:
+            with tracer.span("start_ffmpeg_process", parent=variant_span):
+                process = await self._start_ffmpeg_process(
+                    ffmpeg_cmd, variant.variant_name, pass_fds=pipe[1:] if pipe is not None else ()
+                )
+        except Exception as e:
+            if variant_span is not None:
+                variant_span.end(error=str(e))
+            if context.relay_source is not None:
+                await self.relays.release(context.relay_source)
+            if pipe is not None:
+                os.close(pipe[0])
+            raise
+        finally:
+            # Only the encoder holds the write end, so its exit ends the stream
+            if pipe is not None:
+                os.close(pipe[1])
+        if context.relay_source is not None:
+            self._ingest_leases[process] = context.relay_source
+        self.active_processes[variant.variant_name] = process
+        self.encoder_reports[variant.variant_name] = 0
+        self._variant_streams[variant.variant_name] = (context, variant)
         
-        return variant_urls
+        stream = None
+        if pipe is not None:
+            stream = ProgressiveStream(variant.container, self.progressive_buffer)
+            self.progressive_streams[variant.variant_name] = stream
+            asyncio.create_task(self._pump_progressive(pipe[0], stream, variant.variant_name))
+        
+        if variant_span is not None:
+            # ffmpeg reports progress once its input is probed and the output opened
+            self._startup_traces[process] = (
+                variant_span, tracer.start_span("probe_source", parent=variant_span)
+            )
+            if stream is not None:
+                ready = lambda: stream.started
+            else:
+                ready = lambda: self._playlist_written_since(output_path, variant_span.start_ns)
+            asyncio.create_task(self._watch_first_segment(process, ready))
+    
+    @staticmethod
+    def _playlist_written_since(playlist_path: Path, started_ns: int) -> bool:
+        # append_list may leave an older playlist behind; only a fresh write counts
+        try:
+            return os.stat(playlist_path).st_mtime_ns >= started_ns
+        except FileNotFoundError:
+            return False
+    
+    async def _pump_progressive(self, read_fd: int, stream: ProgressiveStream, variant_name: str):
+        """Feed an encoder's pipe into its progressive stream until the encoder exits."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        pipe = os.fdopen(read_fd, "rb", buffering=0)
+        try:
+            transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        except Exception as e:
+            logger.error(f"Failed to read progressive output of {variant_name}: {e}")
+            pipe.close()
+            stream.close()
+            return
+        
+        try:
+            while True:
+                chunk = await reader.read(PIPE_READ_SIZE)
+                if not chunk:
+                    break
+                if stream.closed:
+                    # Keep draining so the encoder never blocks on a full pipe
+                    continue
+                try:
+                    stream.feed(chunk)
+                except ValueError as e:
+                    logger.error(f"Unreadable progressive output from {variant_name}: {e}")
+                    stream.close()
+        finally:
+            transport.close()
+            stream.close()
+    
+    async def open_progressive(self, variant_name: str) -> Optional[Tuple[str, AsyncIterator[bytes]]]:
+        """Media type and live output of a progressive variant, or None if it is not running."""
+        stream = self.progressive_streams.get(variant_name)
+        if stream is None or stream.closed:
+            return None
+        return stream.media_type, stream.subscribe()
+    
+    async def _watch_first_segment(self, process: asyncio.subprocess.Process, ready: Callable[[], bool]):
+        """End a traced start-up once the encoder's first segment or fragment is out."""
+        deadline = time.monotonic() + FIRST_SEGMENT_TIMEOUT
+        error = None
+        while not ready():
+            if process.returncode is not None:
+                error = "encoder exited before writing a segment"
+                break
+            if time.monotonic() > deadline:
+                error = "timed out waiting for the first segment"
+                break
+            await asyncio.sleep(FIRST_SEGMENT_POLL_INTERVAL)
+        
+        variant_span, phase = self._startup_traces.pop(process)
+        phase.end(error)
+        variant_span.end(error)
+    
+    def _advance_startup(self, process: asyncio.subprocess.Process, frame: int):
+        variant_span, phase = self._startup_traces[process]
+        if phase.name == "probe_source":
+            phase.end()
+            phase = tracer.start_span("first_frame", parent=variant_span)
+        if phase.name == "first_frame" and frame > 0:
+            # The first encoded frame is a keyframe; the segment follows a GOP later
+            phase.end()
+            phase = tracer.start_span("first_segment", parent=variant_span)
+        self._startup_traces[process] = (variant_span, phase)
+    
+    async def restart_variant(self, variant_name: str):
+        """Restart one encoder with the current output settings.
+        
+        ``append_list`` makes the new ffmpeg continue the existing playlist,
+        so players only see a short stall instead of a reset.
+        """
+        context, variant = self._variant_streams[variant_name]
+        await self._terminate_variant(variant_name)
+        await self._start_variant(context, variant)
+        metrics.encoder_restarts.inc(variant=variant_name)
+    
+    def running_variants(self) -> Dict[str, StreamVariant]:
+        return {
+            name: variant for name, (_, variant) in self._variant_streams.items()
+            if name in self.active_processes
+        }
+    
+    async def shed_variant(self, variant_name: str, reason: str):
+        """Stop an encoder to relieve the node; ``restore_variant`` starts it again."""
+        context, variant = self._variant_streams[variant_name]
+        # The stream stays registered, so restoring can reuse its input
+        await self._stop_variant(variant_name)
+        self.shed_variants[variant_name] = _ShedVariant(context, variant, reason)
+        logger.warning(f"Shed {variant.priority.value} variant {variant_name}: {reason}")
+    
+    async def restore_variant(self, variant_name: str):
+        shed = self.shed_variants.pop(variant_name)
+        await self._start_variant(shed.context, shed.variant)
+        logger.info(f"Restored shed variant {variant_name}")
+    
+    def shed_status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "variant": name,
+                "stream_id": str(shed.context.config.input_url),
+                "priority": shed.variant.priority.value,
+                "reason": shed.reason,
+                "shed_at": shed.shed_at,
+            }
+            for name, shed in self.shed_variants.items()
+        ]
+    
+    def _control_speed(self, variant_name: str, speed: float):
+        if variant_name in self._speed_restarts or variant_name not in self._variant_streams:
+            return
+        _, variant = self._variant_streams[variant_name]
+        if variant.container not in HLS_CONTAINERS:
+            # A restart would start progressive and CMAF outputs over
+            return
+        level = self.speed_levels.get(variant_name, 0)
+        new_level = self.speed_controller.observe(
+            variant_name, speed, level, max_speed_level(variant.codec)
+        )
+        if new_level is None:
+            return
+        logger.info(f"{variant_name} encodes at {speed:.2f}x, switching from speed level {level} to {new_level}")
+        self._speed_restarts[variant_name] = asyncio.create_task(
+            self._apply_speed_level(variant_name, new_level)
+        )
+    
+    async def _apply_speed_level(self, variant_name: str, level: int):
+        """Restart an encoder at another speed level right after it finishes a segment."""
+        try:
+            await self._wait_for_segment_boundary(variant_name)
+            if variant_name not in self.active_processes:
+                return
+            self._set_speed_level(variant_name, level)
+            await self.restart_variant(variant_name)
+        except Exception as e:
+            logger.error(f"Could not switch {variant_name} to speed level {level}: {e}")
+        finally:
+            self._speed_restarts.pop(variant_name, None)
+    
+    async def _wait_for_segment_boundary(self, variant_name: str):
+        # ffmpeg rewrites the playlist right after closing a segment
+        playlist_path = self._playlist_path(variant_name)
+        
+        def mtime() -> Optional[int]:
+            try:
+                return os.stat(playlist_path).st_mtime_ns
+            except FileNotFoundError:
+                return None
+        
+        started = mtime()
+        deadline = time.monotonic() + self.segment_duration * SEGMENT_BOUNDARY_TIMEOUT
+        while mtime() == started and time.monotonic() < deadline:
+            await asyncio.sleep(FIRST_SEGMENT_POLL_INTERVAL)
+    
+    def _set_speed_level(self, variant_name: str, level: int):
+        if level:
+            self.speed_levels[variant_name] = level
+            metrics.encoder_speed_level.set(level, variant=variant_name)
+        else:
+            self.speed_levels.pop(variant_name, None)
+            metrics.encoder_speed_level.remove(variant=variant_name)
+    
+    def _forget_speed(self, variant_name: str):
+        task = self._speed_restarts.pop(variant_name, None)
+        if task is not None:
+            task.cancel()
+        self._set_speed_level(variant_name, 0)
+        if self.speed_controller is not None:
+            self.speed_controller.forget(variant_name)
+    
+    async def reconfigure(self, segment_duration: int, playlist_size: int,
+                          ladders: Optional[Dict[str, List[StreamVariant]]] = None) -> Dict[str, Any]:
+        """Apply new output settings and stream ladders, touching only what changed.
+        
+        ``ladders`` maps stream ids to their new variant lists. Variants that
+        left a ladder are stopped, running encoders whose ffmpeg arguments
+        changed are restarted and new variants are started, in that order,
+        so no encoder is restarted only to be stopped again.
+        """
+        diffs: Dict[str, VariantPlanDiff] = {}
+        for stream_id, variants in (ladders or {}).items():
+            context = self.streams.get(stream_id)
+            if context is None:
+                raise Exception(f"Stream not found: {stream_id}")
+            variants, adjustments = self._fit_ladder(variants, context.source_variant)
+            diff = diff_variants(context.config.output_variants, variants)
+            if not diff.changed:
+                continue
+            diffs[stream_id] = diff
+            for variant in diff.removed:
+                await self._stop_variant(variant.variant_name)
+            context.config = context.config.model_copy(update={"output_variants": variants})
+            context.adjustments = adjustments
+        
+        running = {
+            name: self._get_output_args(variant)
+            for name, (_, variant) in self._variant_streams.items()
+            if name in self.active_processes
+        }
+        self.segment_duration = segment_duration
+        self.playlist_size = playlist_size
+        self._output_args.clear()
+        for playlist in self._byterange_playlists.values():
+            playlist.window = playlist_size
+        
+        restarted = []
+        for name, previous_args in running.items():
+            _, variant = self._variant_streams[name]
+            if self._get_output_args(variant) != previous_args:
+                await self.restart_variant(name)
+                restarted.append(name)
+        
+        streams = {}
+        for stream_id, diff in diffs.items():
+            context = self.streams[stream_id]
+            for variant in diff.added:
+                await self._start_variant(context, variant)
+            streams[stream_id] = {
+                "added": [variant.variant_name for variant in diff.added],
+                "removed": [variant.variant_name for variant in diff.removed],
+                "variants": self._variant_urls(context.config),
+            }
+        
+        return {"restarted": restarted, "streams": streams}
     
     def _select_best_source_variant(self, variants: List[Dict]) -> Dict:
         best_variant = max(variants, key=lambda x: x.get("bandwidth", 0))
         return best_variant
     
+    async def _prepare_seek_input(self, input_url: str, source_variant: Dict,
+                                  start_offset: float) -> Tuple[str, float]:
+        """Write a source playlist starting at the segment containing ``start_offset``.
+        
+        ffmpeg then only fetches segments from that point on instead of
+        reading the source from the beginning. Returns the local playlist
+        path and the remaining offset into its first segment. The playlist
+        is a fixed snapshot, so only finished (EXT-X-ENDLIST) sources can be
+        seeked; it lives outside the served working dir until the stream stops.
+        """
+        media_url = urljoin(input_url, source_variant["uri"])
+        media_info = await self.parser.parse_playlist(media_url)
+        table = media_info.segment_table
+        if table is None or not len(table):
+            raise SeekError(f"Source playlist has no segments to seek in: {media_url}")
+        if not media_info.endlist:
+            raise SeekError(f"start_offset needs a finished source playlist; {media_url} is live")
+        
+        index = table.segment_at(start_offset)
+        fd, path = tempfile.mkstemp(prefix=f"source_{table.sequence(index)}_", suffix=".m3u8")
+        with os.fdopen(fd, "w") as f:
+            f.write(table.to_m3u8(index, media_info.target_duration))
+        playlist_path = Path(path)
+        
+        logger.info(f"Seeking {media_url} to {start_offset}s: starting at segment {table.sequence(index)}")
+        return str(playlist_path), start_offset - table.start_time(index)
+    
     def _build_ffmpeg_command(self, input_url: str, output_path: str, 
-                            variant: StreamVariant, source_variant: Dict) -> List[str]:
-        cmd = [
-            "ffmpeg",
-            "-re",
-            "-i", input_url,
+                            variant: StreamVariant, source_variant: Dict,
+                            seek: Optional[float] = None) -> List[str]:
+        # Progress reports go to stdout for metrics; stderr keeps only warnings
+        cmd = ["ffmpeg", "-nostats", "-progress", "pipe:1"]
+        if self.read_realtime:
+            cmd.append("-re")
+        
+        if seek is not None:
+            # Local seek playlist referencing remote segments
+            cmd.extend(["-protocol_whitelist", "file,http,https,tcp,tls,crypto"])
+            if seek > 0:
+                cmd.extend(["-ss", f"{seek:.3f}"])
+        
+        cmd.extend(["-i", input_url])
+        cmd.extend(self._get_output_args(variant))
+        if self._is_single_file(variant):
+            suffix = ".m4s" if variant.container == ContainerFormat.FMP4 else ".ts"
+            cmd.extend(["-hls_segment_filename", str(Path(output_path).with_suffix(suffix))])
+        cmd.append(str(output_path))
+        return cmd
+    
+    def _get_output_args(self, variant: StreamVariant) -> Tuple[str, ...]:
+        key = (variant, self.speed_levels.get(variant.variant_name, 0))
+        args = self._output_args.get(key)
+        if args is None:
+            args = self._output_args[key] = tuple(self._build_output_args(variant))
+        return args
+    
+    def _build_output_args(self, variant: StreamVariant) -> List[str]:
+        args = [
             "-c:v", self._get_video_codec_params(variant.codec),
             "-c:a", self._get_audio_codec_params(variant.audio_codec),
             "-s", str(variant.resolution),
@@ -66,165 +637,309 @@ class TranscodingEngine:
         ]
         
         # Add codec-specific parameters
-        cmd.extend(self._get_codec_specific_params(variant.codec))
+        args.extend(self._get_codec_specific_params(
+            variant.codec, self.speed_levels.get(variant.variant_name, 0)
+        ))
         
         # Add container format and output parameters
-        container_params = self._get_container_format_params(variant.container, variant.variant_name)
-        cmd.extend(container_params)
+        args.extend(self._get_container_format_params(variant.container, variant.variant_name))
         
         if variant.framerate:
-            cmd.extend(["-r", str(variant.framerate)])
-        
-        cmd.append(str(output_path))
-        return cmd
+            args.extend(["-r", str(variant.framerate)])
+        return args
     
-    def _get_codec_specific_params(self, codec: CodecType) -> List[str]:
-        """Get codec-specific parameters for better quality/performance"""
-        if codec in [CodecType.H264, CodecType.H265]:
-            return ["-preset", "fast", "-g", "30", "-sc_threshold", "0"]
-        elif codec == CodecType.VP9:
-            return ["-deadline", "realtime", "-cpu-used", "4"]
-        elif codec == CodecType.VP8:
-            return ["-deadline", "realtime", "-cpu-used", "4"]
-        elif codec == CodecType.AV1:
-            return ["-preset", "8", "-g", "30"]
-        else:
-            return ["-g", "30"]
+    def _get_codec_specific_params(self, codec: CodecType, speed_level: int = 0) -> List[str]:
+        return codec_specific_params(codec, speed_level)
     
     def _get_container_format_params(self, container: ContainerFormat, variant_name: str) -> List[str]:
         """Get container format specific parameters"""
-        if container == ContainerFormat.TS:
+        if self.single_file and container in HLS_CONTAINERS:
+            # The media file name changes per encoder run; _build_ffmpeg_command adds it
+            params = [
+                "-f", "hls",
+                "-hls_time", str(self.segment_duration),
+                "-hls_list_size", str(self.playlist_size),
+                "-hls_flags", "single_file"
+            ]
+            if container == ContainerFormat.FMP4:
+                params.extend(["-hls_segment_type", "fmp4"])
+            return params
+        elif container == ContainerFormat.TS:
             return [
                 "-f", "hls",
-                "-hls_time", "6",
-                "-hls_list_size", "10", 
+                "-hls_time", str(self.segment_duration),
+                "-hls_list_size", str(self.playlist_size),
                 "-hls_flags", "delete_segments+append_list",
                 "-hls_segment_filename", str(self.working_dir / f"{variant_name}_%03d.ts")
             ]
         elif container == ContainerFormat.FMP4:
             return [
                 "-f", "hls",
-                "-hls_time", "6",
-                "-hls_list_size", "10",
+                "-hls_time", str(self.segment_duration),
+                "-hls_list_size", str(self.playlist_size),
                 "-hls_flags", "delete_segments+append_list",
                 "-hls_segment_type", "fmp4",
                 "-hls_segment_filename", str(self.working_dir / f"{variant_name}_%03d.m4s")
             ]
+        elif container == ContainerFormat.CMAF:
+            # One encode, packaged for DASH with HLS playlists over the same segments
+            return [
+                "-f", "dash",
+                "-seg_duration", str(self.segment_duration),
+                "-window_size", str(self.playlist_size),
+                "-extra_window_size", "2",
+                "-dash_segment_type", "mp4",
+                "-format_options", "movflags=+cmaf",
+                "-hls_playlist", "1"
+            ]
         elif container == ContainerFormat.MP4:
-            return ["-f", "mp4", "-movflags", "faststart"]
+            # Fragmented so it can be written to a pipe and joined at any keyframe
+            return ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof"]
         elif container == ContainerFormat.WEBM:
-            return ["-f", "webm"]
+            return ["-f", "webm", "-live", "1"]
         elif container == ContainerFormat.MKV:
-            return ["-f", "matroska"]
+            return ["-f", "matroska", "-live", "1"]
         elif container == ContainerFormat.FLV:
-            return ["-f", "flv"]
+            return ["-f", "flv", "-flvflags", "no_duration_filesize"]
         elif container == ContainerFormat.AVI:
             return ["-f", "avi"]
         else:
             # Default to HLS with TS segments
             return [
                 "-f", "hls",
-                "-hls_time", "6", 
-                "-hls_list_size", "10",
+                "-hls_time", str(self.segment_duration),
+                "-hls_list_size", str(self.playlist_size),
                 "-hls_flags", "delete_segments+append_list",
                 "-hls_segment_filename", str(self.working_dir / f"{variant_name}_%03d.ts")
             ]
     
     def _get_video_codec_params(self, codec: CodecType) -> str:
-        codec_map = {
-            # Modern video codecs
-            CodecType.H264: "libx264",
-            CodecType.H265: "libx265", 
-            CodecType.AV1: "libaom-av1",
-            CodecType.VP9: "libvpx-vp9",
-            CodecType.VP8: "libvpx",
-            
-            # Legacy video codecs
-            CodecType.MPEG4: "mpeg4",
-            CodecType.MPEG2: "mpeg2video",
-            CodecType.MPEG1: "mpeg1video",
-            CodecType.H263: "h263",
-            CodecType.SORENSON_SPARK: "flv1",
-            CodecType.VP6: "vp6",
-            CodecType.VC1: "vc1",
-            CodecType.THEORA: "libtheora",
-            CodecType.REALVIDEO: "rv40",
-            CodecType.CINEPAK: "cinepak",
-            CodecType.INDEO: "indeo3",
-            CodecType.MSVIDEO1: "msvideo1"
-        }
-        return codec_map.get(codec, "libx264")
+        return video_encoder(codec)
     
     def _get_audio_codec_params(self, codec: AudioCodec) -> str:
-        codec_map = {
-            # Modern audio codecs
-            AudioCodec.AAC_LC: "aac",
-            AudioCodec.AAC: "aac",  # Alias
-            AudioCodec.HE_AAC: "libfdk_aac",
-            AudioCodec.XHE_AAC: "libfdk_aac",
-            AudioCodec.AC3: "ac3",
-            AudioCodec.EAC3: "eac3",
-            AudioCodec.MP3: "libmp3lame",
-            AudioCodec.OPUS: "libopus",
-            AudioCodec.VORBIS: "libvorbis",
-            
-            # Legacy audio codecs
-            AudioCodec.MP2: "mp2",
-            AudioCodec.MP1: "mp1",
-            AudioCodec.WMA1: "wmav1",
-            AudioCodec.WMA2: "wmav2",
-            AudioCodec.REALAUDIO: "ra_144"
-        }
-        return codec_map.get(codec, "aac")
+        return audio_encoder(codec)
     
-    async def _start_ffmpeg_process(self, cmd: List[str], variant_name: str) -> asyncio.subprocess.Process:
+    async def _start_ffmpeg_process(self, cmd: List[str], variant_name: str,
+                                    pass_fds: Tuple[int, ...] = ()) -> asyncio.subprocess.Process:
         logger.info(f"Starting transcoding for {variant_name}: {' '.join(cmd)}")
         
         try:
             process = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stderr=asyncio.subprocess.PIPE,
+                pass_fds=pass_fds
             )
             
             asyncio.create_task(self._monitor_process(process, variant_name))
             return process
-            
+        
         except Exception as e:
             logger.error(f"Failed to start FFmpeg process for {variant_name}: {e}")
             raise
     
     async def _monitor_process(self, process: asyncio.subprocess.Process, variant_name: str):
         try:
-            stdout, stderr = await process.communicate()
+            progress = asyncio.ensure_future(self._read_progress(process, variant_name))
+            stderr = await process.stderr.read()
+            await process.wait()
+            await progress
             
             if process.returncode != 0:
                 logger.error(f"FFmpeg process for {variant_name} failed with code {process.returncode}")
                 logger.error(f"stderr: {stderr.decode()}")
             else:
                 logger.info(f"FFmpeg process for {variant_name} completed successfully")
-                
+            if self.active_processes.get(variant_name) is process:
+                # Exited on its own rather than being stopped
+                status = "success" if process.returncode == 0 else "failure"
+                metrics.encoder_exits.inc(variant=variant_name, status=status)
+        
         except Exception as e:
             logger.error(f"Error monitoring process for {variant_name}: {e}")
+        finally:
+            if self.active_processes.get(variant_name) is process:
+                # No longer running: drop it from committed cores, shedding and the process count
+                del self.active_processes[variant_name]
+            if variant_name not in self.active_processes:
+                metrics.encoder_fps.remove(variant=variant_name)
+                metrics.encoder_speed.remove(variant=variant_name)
+                self.encoder_speeds.pop(variant_name, None)
+                self.encoder_reports.pop(variant_name, None)
+            await self._release_ingest(process)
+    
+    async def _read_progress(self, process: asyncio.subprocess.Process, variant_name: str):
+        """Export the ``-progress`` blocks ffmpeg writes to stdout, about twice a second."""
+        block: Dict[str, str] = {}
+        async for line in process.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if key != "progress":
+                block[key] = value
+                continue
+            
+            try:
+                metrics.encoder_fps.set(float(block.get("fps", "")), variant=variant_name)
+            except ValueError:
+                pass
+            speed = metrics.progress_speed(block.get("speed"))
+            if speed is not None:
+                metrics.encoder_speed.set(speed, variant=variant_name)
+                self.encoder_speeds[variant_name] = speed
+                self.encoder_reports[variant_name] = self.encoder_reports.get(variant_name, 0) + 1
+                if self.speed_controller is not None:
+                    self._control_speed(variant_name, speed)
+            if process in self._startup_traces:
+                frame = block.get("frame", "0")
+                self._advance_startup(process, int(frame) if frame.isdigit() else 0)
+            self._observe_playlist(variant_name)
+            block = {}
+    
+    def _observe_playlist(self, variant_name: str):
+        # ffmpeg rewrites the playlist once per finished segment
+        try:
+            mtime = os.stat(self._playlist_path(variant_name)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        previous = self._playlist_mtimes.get(variant_name)
+        if previous is not None and mtime > previous:
+            metrics.segment_interval.observe((mtime - previous) / 1e9, variant=variant_name)
+        self._playlist_mtimes[variant_name] = mtime
+        if mtime != previous and variant_name in self._byterange_playlists:
+            self._publish_byterange_playlist(variant_name)
+    
+    def _publish_byterange_playlist(self, variant_name: str):
+        """Carry a single-file variant's new segments over to the playlist players see."""
+        generation = self._generations[variant_name]
+        playlist = self._byterange_playlists[variant_name]
+        try:
+            with open(self._playlist_path(variant_name)) as f:
+                added = playlist.update(generation, f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the playlist of {variant_name}: {e}")
+            return
+        if not added:
+            return
+        
+        # Replace atomically so players never read a partial playlist
+        public_path = self.working_dir / f"{variant_name}.m3u8"
+        temp_path = public_path.with_suffix(".m3u8.tmp")
+        temp_path.write_text(playlist.render())
+        os.replace(temp_path, public_path)
+        
+        for old in playlist.release():
+            for suffix in (".m3u8", ".ts", ".m4s"):
+                (self.working_dir / f"{variant_name}_{old:05d}{suffix}").unlink(missing_ok=True)
+        
+        if (playlist.segment_count(generation) >= self.segments_per_file
+                and variant_name not in self._rotations and variant_name not in self._speed_restarts):
+            self._rotations[variant_name] = asyncio.create_task(self._rotate(variant_name))
+    
+    async def _rotate(self, variant_name: str):
+        """Move a single-file variant on to a new media file, right after a segment."""
+        try:
+            logger.info(f"Rotating the media file of {variant_name}")
+            await self.restart_variant(variant_name)
+        except Exception as e:
+            logger.error(f"Could not rotate the media file of {variant_name}: {e}")
+        finally:
+            self._rotations.pop(variant_name, None)
+    
+    def _cancel_rotation(self, variant_name: str):
+        task = self._rotations.pop(variant_name, None)
+        if task is not None:
+            task.cancel()
+    
+    def playlist_ages(self) -> Dict[str, float]:
+        """Seconds since each running variant's playlist was last written."""
+        now = time.time()
+        ages = {}
+        for variant_name in self.active_processes:
+            try:
+                mtime = os.stat(self._playlist_path(variant_name)).st_mtime
+            except FileNotFoundError:
+                continue
+            ages[variant_name] = max(now - mtime, 0.0)
+        return ages
+    
+    async def _release_ingest(self, process: asyncio.subprocess.Process):
+        relay_source = self._ingest_leases.pop(process, None)
+        if relay_source is not None:
+            await self.relays.release(relay_source)
+    
+    async def _terminate_variant(self, variant_name: str):
+        # Processes leave active_processes before they are signalled, so the
+        # monitor can tell a stop from an encoder exiting on its own
+        process = self.active_processes.pop(variant_name, None)
+        stream = self.progressive_streams.pop(variant_name, None)
+        if stream is not None:
+            # Clients reconnect to the restarted encoder's new stream
+            stream.close()
+        if process is None:
+            return
+        process.terminate()
+        await process.wait()
+        await self._release_ingest(process)
+    
+    async def _stop_variant(self, variant_name: str) -> Optional[_StreamContext]:
+        """Stop one variant and forget its state; returns the stream it belonged to."""
+        entry = self._variant_streams.get(variant_name)
+        context = entry[0] if entry is not None else None
+        # An encoder that already exited on its own still has state to clear
+        if variant_name in self._variant_streams:
+            await self._terminate_variant(variant_name)
+            self._variant_streams.pop(variant_name, None)
+            self._forget_speed(variant_name)
+            self._cancel_rotation(variant_name)
+        shed = self.shed_variants.pop(variant_name, None)
+        if shed is not None:
+            context = shed.context
+        return context
     
     async def stop_transcoding(self, variant_name: Optional[str] = None):
         if variant_name:
-            if variant_name in self.active_processes:
-                process = self.active_processes[variant_name]
-                process.terminate()
-                await process.wait()
-                del self.active_processes[variant_name]
+            context = await self._stop_variant(variant_name)
+            if context is not None:
+                self._drop_stream_if_idle(context)
         else:
-            for name, process in list(self.active_processes.items()):
-                process.terminate()
-                await process.wait()
-            self.active_processes.clear()
+            names = set(self.active_processes) | set(self.speed_levels) | set(self._speed_restarts)
+            for name in names | set(self._rotations):
+                await self._terminate_variant(name)
+                self._forget_speed(name)
+                self._cancel_rotation(name)
+            contexts = [context for context, _ in self._variant_streams.values()]
+            contexts.extend(shed.context for shed in self.shed_variants.values())
+            contexts.extend(self.streams.values())
+            self._variant_streams.clear()
+            self._generations.clear()
+            self._byterange_playlists.clear()
+            self.shed_variants.clear()
+            self.streams.clear()
+            for context in contexts:
+                self._remove_seek_input(context)
+    
+    def _drop_stream_if_idle(self, context: _StreamContext):
+        """Forget a stream, and its seek playlist, once none of its variants runs or waits to be restored."""
+        if any(c is context for c, _ in self._variant_streams.values()):
+            return
+        if any(shed.context is context for shed in self.shed_variants.values()):
+            return
+        stream_id = str(context.config.input_url)
+        if self.streams.get(stream_id) is context:
+            del self.streams[stream_id]
+        self._remove_seek_input(context)
+    
+    @staticmethod
+    def _remove_seek_input(context: _StreamContext):
+        if context.seek is not None:
+            Path(context.input_url).unlink(missing_ok=True)
     
     def cleanup(self):
-        if self.working_dir.exists():
+        if self._owns_working_dir and self.working_dir.exists():
             shutil.rmtree(self.working_dir)
     
     async def close(self):
         await self.stop_transcoding()
+        if self.relays is not None:
+            await self.relays.close()
         await self.parser.close()
         self.cleanup()
\ No newline at end of file
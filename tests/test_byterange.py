@@ -0,0 +1,176 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward import server
+from m3u8_codec_forward.byterange import ByteRangePlaylist
+from m3u8_codec_forward.ranges import parse_range
+from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.models import (
+    TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
+)
+
+
+VARIANT = StreamVariant(
+    codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC, resolution=Resolution(width=1280, height=720),
+    bitrate=3000, container=ContainerFormat.TS
+)
+
+
+def generation_playlist(media_file, sizes, media_sequence=0, init=None):
+    """A playlist as ffmpeg writes it with -hls_flags single_file."""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:4", "#EXT-X-TARGETDURATION:6", f"#EXT-X-MEDIA-SEQUENCE:{media_sequence}"]
+    if init is not None:
+        lines.append(f'#EXT-X-MAP:URI="{media_file}",BYTERANGE="{init}@0"')
+    offset = init or 0
+    for size in sizes:
+        lines.extend(["#EXTINF:6.000000,", f"#EXT-X-BYTERANGE:{size}@{offset}", media_file])
+        offset += size
+    return [line + "\n" for line in lines]
+
+
+class _FakeEncoder:
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+    
+    async def wait(self):
+        return self.returncode
+
+
+class TestByteRangePlaylist:
+
+    def test_new_segments_are_taken_once(self):
+        playlist = ByteRangePlaylist(window=10)
+        
+        assert playlist.update(0, generation_playlist("a_00000.ts", [100, 200])) == 2
+        assert playlist.update(0, generation_playlist("a_00000.ts", [100, 200])) == 0
+        assert playlist.update(0, generation_playlist("a_00000.ts", [100, 200, 300])) == 1
+        
+        rendered = playlist.render()
+        assert "#EXT-X-MEDIA-SEQUENCE:0\n" in rendered
+        assert rendered.endswith("#EXT-X-BYTERANGE:300@300\na_00000.ts\n")
+    
+    def test_playlist_carries_on_across_media_files(self):
+        playlist = ByteRangePlaylist(window=2)
+        playlist.update(0, generation_playlist("a_00000.ts", [100, 200]))
+        playlist.update(1, generation_playlist("a_00001.ts", [150]))
+        
+        assert "#EXT-X-DISCONTINUITY\n#EXTINF:6.000000,\n#EXT-X-BYTERANGE:150@0\na_00001.ts\n" in playlist.render()
+        assert playlist.release() == []
+        
+        playlist.update(1, generation_playlist("a_00001.ts", [150, 250, 350]))
+        rendered = playlist.render()
+        # Numbering continues and the dropped discontinuity is counted
+        assert "#EXT-X-MEDIA-SEQUENCE:3\n#EXT-X-DISCONTINUITY-SEQUENCE:1\n" in rendered
+        assert "a_00000.ts" not in rendered
+        assert playlist.release() == [0]
+    
+    def test_fmp4_init_section_is_kept(self):
+        playlist = ByteRangePlaylist(window=10)
+        playlist.update(0, generation_playlist("a_00000.m4s", [100], init=50))
+        
+        rendered = playlist.render()
+        assert "#EXT-X-VERSION:7\n" in rendered
+        assert '#EXT-X-MAP:URI="a_00000.m4s",BYTERANGE="50@0"\n' in rendered
+        assert "#EXT-X-BYTERANGE:100@50\n" in rendered
+    
+    def test_segments_without_byte_ranges_are_rejected(self):
+        with pytest.raises(ValueError):
+            ByteRangePlaylist(window=10).update(0, ["#EXTM3U\n", "#EXTINF:6.0,\n", "a_000.ts\n"])
+
+
+class TestParseRange:
+
+    def test_ranges(self):
+        assert parse_range("bytes=0-99", 1000) == (0, 100)
+        assert parse_range("bytes=900-", 1000) == (900, 100)
+        assert parse_range("bytes=-100", 1000) == (900, 100)
+        # Clamped to the end of the file
+        assert parse_range("bytes=950-2000", 1000) == (950, 50)
+    
+    def test_unsatisfiable_ranges(self):
+        assert parse_range("bytes=1000-", 1000) is None
+        assert parse_range("bytes=-0", 1000) is None
+    
+    def test_unsupported_ranges(self):
+        for header in ("bytes=0-10,20-30", "items=0-10", "bytes=10-5", "bytes=x-"):
+            with pytest.raises(ValueError):
+                parse_range(header, 1000)
+
+
+class TestSingleFileOutput:
+
+    @pytest.mark.asyncio
+    async def test_encoder_moves_to_a_new_file_after_segments_per_file(self, tmp_path):
+        spawn = AsyncMock(side_effect=lambda *args, **kwargs: _FakeEncoder())
+        engine = TranscodingEngine(str(tmp_path), single_file=True, segments_per_file=2)
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        config = TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=[VARIANT])
+        name = VARIANT.variant_name
+        
+        try:
+            with patch("asyncio.create_subprocess_exec", spawn):
+                await engine.start_transcoding(config)
+                cmd = spawn.await_args.args
+                assert cmd[cmd.index("-hls_flags") + 1] == "single_file"
+                assert cmd[cmd.index("-hls_segment_filename") + 1] == str(tmp_path / f"{name}_00000.ts")
+                assert cmd[-1] == str(tmp_path / f"{name}_00000.m3u8")
+                
+                (tmp_path / f"{name}_00000.m3u8").write_text("".join(generation_playlist(f"{name}_00000.ts", [100])))
+                engine._observe_playlist(name)
+                public = (tmp_path / f"{name}.m3u8").read_text()
+                assert f"#EXT-X-BYTERANGE:100@0\n{name}_00000.ts\n" in public
+                assert spawn.await_count == 1
+                
+                (tmp_path / f"{name}_00000.m3u8").write_text("".join(generation_playlist(f"{name}_00000.ts", [100, 200])))
+                engine._observe_playlist(name)
+                await asyncio.sleep(0.05)
+            
+            assert spawn.await_count == 2
+            cmd = spawn.await_args.args
+            assert cmd[cmd.index("-hls_segment_filename") + 1] == str(tmp_path / f"{name}_00001.ts")
+            assert engine._rotations == {}
+        finally:
+            await engine.close()
+            await asyncio.sleep(0.2)
+    
+    def test_segments_are_served_by_range(self):
+        with TestClient(server.app) as client:
+            media_file = server.transcoding_engine.working_dir / "rung_00000.ts"
+            media_file.write_bytes(bytes(range(256)) * 4)
+            
+            partial = client.get("/rung_00000.ts", headers={"Range": "bytes=256-511"})
+            beyond = client.get("/rung_00000.ts", headers={"Range": "bytes=5000-"})
+            whole = client.get("/rung_00000.ts")
+        
+        assert partial.status_code == 206
+        assert partial.headers["content-range"] == "bytes 256-511/1024"
+        assert partial.content == bytes(range(256))
+        assert beyond.status_code == 416
+        assert beyond.headers["content-range"] == "bytes */1024"
+        assert whole.status_code == 200
+        assert whole.headers["accept-ranges"] == "bytes"
+        assert len(whole.content) == 1024
+    
+    def test_fmp4_media_files_are_served_as_mp4(self):
+        with TestClient(server.app) as client:
+            (server.transcoding_engine.working_dir / "rung_00000.m4s").write_bytes(b"\x00" * 64)
+            
+            partial = client.get("/rung_00000.m4s", headers={"Range": "bytes=0-15"})
+            whole = client.get("/rung_00000.m4s")
+        
+        assert partial.status_code == 206
+        assert partial.headers["content-type"] == "video/mp4"
+        assert whole.headers["content-type"] == "video/mp4"
@@ -0,0 +1,174 @@
+import asyncio
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from m3u8_codec_forward.calibration import (
+    CostTable, calibrate, build_calibration_command, cost_key, load_cost_table
+)
+from m3u8_codec_forward.models import StreamVariant, TranscodingConfig, CodecType, AudioCodec, Resolution
+from m3u8_codec_forward.transcoder import TranscodingEngine, AdmissionError
+
+
+class _FakeEncoder:
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def exit(self, returncode: int):
+        self.returncode = returncode
+        self.stdout.feed_eof()
+        self.stderr.feed_eof()
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.exit(-15)
+    
+    async def wait(self):
+        return self.returncode
+
+
+def variant(codec: CodecType = CodecType.H264, height: int = 720, bitrate: int = 3000) -> StreamVariant:
+    return StreamVariant(
+        codec=codec,
+        audio_codec=AudioCodec.AAC_LC,
+        resolution=Resolution(width=height * 16 // 9, height=height),
+        bitrate=bitrate
+    )
+
+
+class TestCalibration:
+
+    def test_cost_key_ignores_bitrate(self):
+        assert cost_key(variant(bitrate=3000)) == cost_key(variant(bitrate=800)) == "h264_1280x720_30_preset-fast"
+    
+    def test_cost_key_includes_the_speed_setting(self):
+        assert cost_key(variant(), 2) == "h264_1280x720_30_preset-veryfast"
+        assert cost_key(variant(CodecType.VP9), 1) == "vp9_1280x720_30_cpu-used-5"
+        # Codecs without a speed ladder have one setting
+        assert cost_key(variant(CodecType.MPEG2), 3) == "mpeg2_1280x720_30"
+    
+    def test_command_encodes_synthetic_clip(self):
+        cmd = build_calibration_command(variant(CodecType.AV1), seconds=2)
+        
+        assert cmd[cmd.index("-f") + 1] == "lavfi"
+        assert cmd[cmd.index("-i") + 1] == "testsrc2=size=1280x720:rate=30:duration=2"
+        assert cmd[cmd.index("-c:v") + 1] == "libaom-av1"
+        assert cmd[-2:] == ["null", "-"]
+    
+    def test_calibrate_measures_each_key_once(self):
+        usage = iter([
+            SimpleNamespace(ru_utime=0.0, ru_stime=0.0), SimpleNamespace(ru_utime=1.5, ru_stime=0.5),
+        ])
+        with patch("m3u8_codec_forward.calibration.subprocess.run") as mock_run, \
+                patch("m3u8_codec_forward.calibration.resource.getrusage", side_effect=lambda _: next(usage)):
+            table = calibrate([variant(bitrate=3000), variant(bitrate=800)], seconds=2, speed_levels=False)
+        
+        assert mock_run.call_count == 1
+        entry = table.entries["h264_1280x720_30_preset-fast"]
+        assert entry["frames"] == 60
+        assert entry["cpu_seconds"] == 2.0
+        assert entry["cores"] == pytest.approx(1.0)
+    
+    def test_every_speed_level_is_measured(self):
+        usage = iter([SimpleNamespace(ru_utime=float(i), ru_stime=0.0) for i in range(10)])
+        with patch("m3u8_codec_forward.calibration.subprocess.run") as mock_run, \
+                patch("m3u8_codec_forward.calibration.resource.getrusage", side_effect=lambda _: next(usage)):
+            table = calibrate([variant()], seconds=2)
+        
+        assert mock_run.call_count == 5
+        presets = [call.args[0][call.args[0].index("-preset") + 1] for call in mock_run.call_args_list]
+        assert presets == ["fast", "faster", "veryfast", "superfast", "ultrafast"]
+        assert table.entries["h264_1280x720_30_preset-ultrafast"]["speed_level"] == 4
+    
+    def test_failed_encoder_is_skipped(self):
+        error = subprocess.CalledProcessError(1, ["ffmpeg"], stderr=b"Unknown encoder 'libaom-av1'")
+        with patch("m3u8_codec_forward.calibration.subprocess.run", side_effect=error):
+            table = calibrate([variant(CodecType.AV1)], seconds=1)
+        assert len(table) == 0
+    
+    def test_table_round_trip(self, tmp_path):
+        path = tmp_path / "costs.json"
+        CostTable({
+            "h264_1280x720_30_preset-fast": {"cores": 0.8},
+            "h264_1280x720_30_preset-faster": {"cores": 0.5},
+        }, {"cpu_count": 8}).save(str(path))
+        
+        table = load_cost_table(str(path))
+        
+        assert table.cores(variant()) == 0.8
+        assert table.cores(variant(), 1) == 0.5
+        # Unmeasured levels count at the default level's cost
+        assert table.cores(variant(), 3) == 0.8
+        assert table.metadata["cpu_count"] == 8
+        assert table.plan_cores([variant(), variant(bitrate=800)]) == 1.6
+        assert table.plan_cores([variant(CodecType.AV1)]) is None
+    
+    def test_missing_table_disables_costs(self, tmp_path):
+        assert load_cost_table(str(tmp_path / "missing.json")) is None
+        assert load_cost_table(None) is None
+    
+    def test_tables_without_speed_settings_are_ignored(self, tmp_path):
+        path = tmp_path / "costs.json"
+        path.write_text('{"version": 1, "entries": {"h264_1280x720_30": {"cores": 0.8}}}')
+        assert load_cost_table(str(path)) is None
+
+
+class TestAdmission:
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_ladder_beyond_capacity_is_rejected(self, mock_subprocess):
+        mock_subprocess.return_value = AsyncMock()
+        table = CostTable({
+            "h264_1280x720_30_preset-fast": {"cores": 1.5}, "h264_480x270_30_preset-fast": {"cores": 0.25}
+        })
+        engine = TranscodingEngine(cost_table=table, max_encoder_cores=2.0)
+        try:
+            with patch.object(engine.parser, 'get_master_playlist_info') as mock_master:
+                mock_master.return_value = {"variants": [{"bandwidth": 5000000, "uri": "high/index.m3u8"}]}
+                await engine.start_transcoding(TranscodingConfig(
+                    input_url="http://example.com/a/master.m3u8", output_variants=[variant()]
+                ))
+                assert engine.committed_cores() == 1.5
+                
+                with pytest.raises(AdmissionError):
+                    await engine.start_transcoding(TranscodingConfig(
+                        input_url="http://example.com/b/master.m3u8", output_variants=[variant(bitrate=800)]
+                    ))
+                
+                await engine.start_transcoding(TranscodingConfig(
+                    input_url="http://example.com/c/master.m3u8", output_variants=[variant(height=270)]
+                ))
+        finally:
+            await engine.close()
+    
+    @pytest.mark.asyncio
+    async def test_encoder_that_exits_releases_its_cores(self, tmp_path):
+        encoder = _FakeEncoder()
+        table = CostTable({"h264_1280x720_30_preset-fast": {"cores": 1.5}})
+        engine = TranscodingEngine(str(tmp_path), cost_table=table, max_encoder_cores=2.0)
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        config = TranscodingConfig(input_url="http://example.com/a/master.m3u8", output_variants=[variant()])
+        try:
+            with patch("asyncio.create_subprocess_exec", AsyncMock(return_value=encoder)):
+                await engine.start_transcoding(config)
+                assert engine.committed_cores() == 1.5
+                
+                encoder.exit(1)
+                await asyncio.sleep(0.05)
+            
+            assert engine.active_processes == {}
+            assert engine.running_variants() == {}
+            assert engine.committed_cores() == 0.0
+            # Stopping it afterwards still forgets the variant
+            await engine.stop_transcoding(variant().variant_name)
+            assert engine.streams == {}
+        finally:
+            await engine.close()
+
@@ -0,0 +1,96 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward import server
+from m3u8_codec_forward.plan import master_playlist
+from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.models import (
+    TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
+)
+
+
+CMAF_VP9 = StreamVariant(
+    codec=CodecType.VP9, audio_codec=AudioCodec.OPUS, resolution=Resolution(width=1280, height=720),
+    bitrate=2500, container=ContainerFormat.CMAF
+)
+TS_H264 = StreamVariant(
+    codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC, resolution=Resolution(width=640, height=360),
+    bitrate=800, container=ContainerFormat.TS
+)
+
+
+class _FakeEncoder:
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+    
+    async def wait(self):
+        return self.returncode
+
+
+class TestCmafPackaging:
+
+    @pytest.mark.asyncio
+    async def test_one_encode_writes_dash_and_hls(self, tmp_path):
+        engine = TranscodingEngine(str(tmp_path), segment_duration=4, playlist_size=5)
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        config = TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=[CMAF_VP9])
+        spawn = AsyncMock(side_effect=lambda *args, **kwargs: _FakeEncoder())
+        
+        try:
+            with patch("asyncio.create_subprocess_exec", spawn):
+                urls = await engine.start_transcoding(config)
+            cmd = spawn.await_args.args
+            
+            assert spawn.await_count == 1
+            assert urls[CMAF_VP9.variant_name].endswith(f"/{CMAF_VP9.variant_name}/master.m3u8")
+            assert cmd[cmd.index("-f") + 1] == "dash"
+            assert cmd[cmd.index("-seg_duration") + 1] == "4"
+            assert cmd[cmd.index("-window_size") + 1] == "5"
+            assert cmd[cmd.index("-hls_playlist") + 1] == "1"
+            # Each CMAF variant gets its own directory for the muxer's fixed file names
+            assert cmd[-1] == str(tmp_path / CMAF_VP9.variant_name / "manifest.mpd")
+            assert (tmp_path / CMAF_VP9.variant_name).is_dir()
+        finally:
+            await engine.close()
+            await asyncio.sleep(0.2)
+    
+    def test_master_playlist_groups_cmaf_audio(self):
+        playlist = master_playlist([TS_H264, CMAF_VP9])
+        name = CMAF_VP9.variant_name
+        
+        assert f"{TS_H264.variant_name}.m3u8\n" in playlist
+        assert f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="{name}",NAME="audio",DEFAULT=YES,AUTOSELECT=YES,' \
+               f'URI="{name}/media_1.m3u8"\n' in playlist
+        assert f'RESOLUTION=1280x720,AUDIO="{name}"\n{name}/media_0.m3u8\n' in playlist
+    
+    def test_server_serves_manifest_playlists_and_segments(self):
+        with TestClient(server.app) as client:
+            variant_dir = server.transcoding_engine.working_dir / CMAF_VP9.variant_name
+            variant_dir.mkdir(exist_ok=True)
+            (variant_dir / "manifest.mpd").write_text("<MPD/>")
+            (variant_dir / "media_0.m3u8").write_text("#EXTM3U\n")
+            (variant_dir / "chunk-stream0-00001.m4s").write_bytes(b"moof")
+            
+            mpd = client.get(f"/{CMAF_VP9.variant_name}/manifest.mpd")
+            playlist = client.get(f"/{CMAF_VP9.variant_name}/media_0.m3u8")
+            segment = client.get(f"/{CMAF_VP9.variant_name}/chunk-stream0-00001.m4s")
+            missing = client.get(f"/{CMAF_VP9.variant_name}/chunk-stream0-00002.m4s")
+        
+        assert mpd.headers["content-type"] == "application/dash+xml"
+        assert mpd.text == "<MPD/>"
+        assert playlist.headers["content-type"] == "application/vnd.apple.mpegurl"
+        assert segment.content == b"moof"
+        assert missing.status_code == 404
@@ -123,6 +123,31 @@ class TestConfigManager:
         finally:
             Path(config_path).unlink()
     
+    def test_reload_returns_fresh_manager(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump({"app": {"segment_duration": 4}}, f)
+            config_path = f.name
+        
+        try:
+            manager = ConfigManager(config_path)
+            manager.load_config(config_path)
+            Path(config_path).write_text(json.dumps({"app": {"segment_duration": 2}}))
+            
+            fresh = manager.reload()
+            
+            assert fresh.app_config.segment_duration == 2
+            assert manager.app_config.segment_duration == 4
+            
+            Path(config_path).write_text("invalid json content")
+            with pytest.raises(ValueError):
+                fresh.reload()
+        finally:
+            Path(config_path).unlink()
+    
+    def test_reload_without_config_file(self):
+        with pytest.raises(ValueError, match="No config file"):
+            ConfigManager().reload()
+    
     def test_save_config(self):
         manager = ConfigManager()
         manager.app_config.server_port = 9999
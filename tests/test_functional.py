@@ -5,10 +5,11 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch, AsyncMock
 import asyncio
 import time
+from pathlib import Path
 
 from m3u8_codec_forward.server import app
 from m3u8_codec_forward.parser import M3U8Parser
-from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.transcoder import TranscodingEngine, SeekError
 from m3u8_codec_forward.models import TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
 
 
@@ -121,11 +122,11 @@ class TestFunctionalAPI:
             "h264_1280x720_3000k_ts": "http://localhost:80/h264_1280x720_3000k_ts.m3u8"
         }
         
-        client = TestClient(app)
-        response = client.post(
-            "/start-transcoding",
-            params={"input_url": APPLE_TEST_STREAM}
-        )
+        with TestClient(app) as client:
+            response = client.post(
+                "/start-transcoding",
+                params={"input_url": APPLE_TEST_STREAM}
+            )
         
         assert response.status_code == 200
         data = response.json()
@@ -296,4 +297,236 @@ class TestFunctionalIntegration:
                     assert url.endswith(".m3u8")
                     
         finally:
-            await engine.close()
\ No newline at end of file
+            await engine.close()
+
+class TestSeekStart:
+    
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_start_offset_feeds_ffmpeg_from_segment(self, mock_subprocess):
+        mock_subprocess.return_value = AsyncMock()
+        media_playlist = "#EXTM3U\n#EXT-X-TARGETDURATION:6\n" + "".join(
+            f"#EXTINF:6.0,\nsegment{i}.ts\n" for i in range(10)
+        ) + "#EXT-X-ENDLIST\n"
+        
+        engine = TranscodingEngine()
+        try:
+            config = TranscodingConfig(
+                input_url="http://example.com/vod/master.m3u8",
+                output_variants=[StreamVariant(
+                    codec=CodecType.H264,
+                    audio_codec=AudioCodec.AAC_LC,
+                    resolution=Resolution(width=1280, height=720),
+                    bitrate=3000
+                )],
+                start_offset=20.0
+            )
+            
+            def handler(request):
+                assert str(request.url) == "http://example.com/vod/high/index.m3u8"
+                return httpx.Response(200, text=media_playlist)
+            
+            engine.parser.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with patch.object(engine.parser, 'get_master_playlist_info') as mock_master:
+                mock_master.return_value = {
+                    "variants": [{"bandwidth": 5000000, "resolution": (1920, 1080), "uri": "high/index.m3u8"}]
+                }
+                await engine.start_transcoding(config)
+            
+            cmd = list(mock_subprocess.call_args[0])
+            input_path = cmd[cmd.index("-i") + 1]
+            assert cmd[cmd.index("-ss") + 1] == "2.000"
+            assert cmd.index("-ss") < cmd.index("-i")
+            
+            with open(input_path) as f:
+                seek_playlist = f.read()
+            assert "#EXT-X-MEDIA-SEQUENCE:3" in seek_playlist
+            assert "http://example.com/vod/high/segment3.ts" in seek_playlist
+            assert "segment2.ts" not in seek_playlist
+            # Kept out of the served directory
+            assert engine.working_dir not in Path(input_path).parents
+        finally:
+            await engine.close()
+        
+        assert not Path(input_path).exists()
+    
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_start_offset_is_rejected_for_live_sources(self, mock_subprocess):
+        live_playlist = "#EXTM3U\n#EXT-X-TARGETDURATION:6\n" + "".join(
+            f"#EXTINF:6.0,\nsegment{i}.ts\n" for i in range(10)
+        )
+        
+        engine = TranscodingEngine()
+        try:
+            config = TranscodingConfig(
+                input_url="http://example.com/live/master.m3u8",
+                output_variants=[StreamVariant(
+                    codec=CodecType.H264,
+                    audio_codec=AudioCodec.AAC_LC,
+                    resolution=Resolution(width=1280, height=720),
+                    bitrate=3000
+                )],
+                start_offset=20.0
+            )
+            engine.parser.client = httpx.AsyncClient(
+                transport=httpx.MockTransport(lambda request: httpx.Response(200, text=live_playlist))
+            )
+            with patch.object(engine.parser, 'get_master_playlist_info') as mock_master:
+                mock_master.return_value = {
+                    "variants": [{"bandwidth": 5000000, "resolution": (1920, 1080), "uri": "high/index.m3u8"}]
+                }
+                with pytest.raises(SeekError):
+                    await engine.start_transcoding(config)
+            
+            mock_subprocess.assert_not_called()
+        finally:
+            await engine.close()
+
+
+class TestReconfigure:
+
+    def make_variant(self, height: int, bitrate: int, codec=CodecType.H264,
+                     container=ContainerFormat.TS) -> StreamVariant:
+        return StreamVariant(
+            codec=codec,
+            audio_codec=AudioCodec.AAC_LC,
+            resolution=Resolution(width=height * 16 // 9, height=height),
+            bitrate=bitrate,
+            container=container
+        )
+    
+    async def start_engine(self, variants, preset=None) -> TranscodingEngine:
+        engine = TranscodingEngine()
+        config = TranscodingConfig(
+            input_url="http://example.com/live/master.m3u8",
+            output_variants=variants,
+            preset=preset
+        )
+        with patch.object(engine.parser, 'get_master_playlist_info') as mock_master:
+            mock_master.return_value = {"variants": [{"bandwidth": 5000000, "uri": "high/index.m3u8"}]}
+            await engine.start_transcoding(config)
+        return engine
+    
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_segment_duration_restarts_only_hls_variants(self, mock_subprocess):
+        mock_subprocess.return_value = AsyncMock()
+        hls = self.make_variant(720, 3000)
+        webm = self.make_variant(720, 2500, CodecType.VP9, ContainerFormat.WEBM)
+        engine = await self.start_engine([hls, webm])
+        try:
+            mock_subprocess.reset_mock()
+            
+            changes = await engine.reconfigure(segment_duration=4, playlist_size=10)
+            
+            assert changes["restarted"] == [hls.variant_name]
+            cmd = list(mock_subprocess.call_args[0])
+            assert cmd[cmd.index("-hls_time") + 1] == "4"
+            
+            # Same settings again: nothing to do
+            mock_subprocess.reset_mock()
+            changes = await engine.reconfigure(segment_duration=4, playlist_size=10)
+            assert changes["restarted"] == []
+            assert not mock_subprocess.called
+        finally:
+            await engine.close()
+    
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_ladder_change_touches_only_changed_variants(self, mock_subprocess):
+        mock_subprocess.return_value = AsyncMock()
+        keep = self.make_variant(1080, 5000)
+        drop = self.make_variant(480, 1500)
+        add = self.make_variant(360, 800)
+        engine = await self.start_engine([keep, drop], preset="standard")
+        stream_id = "http://example.com/live/master.m3u8"
+        try:
+            mock_subprocess.reset_mock()
+            
+            changes = await engine.reconfigure(6, 10, {stream_id: [keep, add]})
+            
+            assert changes["restarted"] == []
+            assert changes["streams"][stream_id]["added"] == [add.variant_name]
+            assert changes["streams"][stream_id]["removed"] == [drop.variant_name]
+            assert mock_subprocess.call_count == 1
+            assert set(engine.active_processes) == {keep.variant_name, add.variant_name}
+            assert engine.streams[stream_id].config.output_variants == [keep, add]
+        finally:
+            await engine.close()
+    
+    def test_reload_endpoint_rejects_invalid_config(self, tmp_path):
+        from m3u8_codec_forward.config import ConfigManager
+        
+        config_path = tmp_path / "config.json"
+        config_path.write_text("{}")
+        app.state.config_manager = ConfigManager(str(config_path))
+        config_path.write_text("invalid json content")
+        try:
+            with TestClient(app) as client:
+                response = client.post("/admin/reload-config")
+            assert response.status_code == 400
+            assert "Invalid configuration" in response.json()["detail"]
+        finally:
+            del app.state.config_manager
+
+
+class TestPresetStart:
+
+    @pytest.fixture
+    def engine(self):
+        import m3u8_codec_forward.server as server
+        
+        engine = AsyncMock()
+        engine.start_transcoding.return_value = {"h264_854x480_1500k_ts": "http://localhost:8080/h264_854x480_1500k_ts.m3u8"}
+        with patch.object(server, "transcoding_engine", engine), patch.object(server, "active_streams", {}):
+            yield engine
+    
+    def test_start_uses_named_preset(self, engine):
+        client = TestClient(app)
+        response = client.post("/start-transcoding", params={"input_url": APPLE_TEST_STREAM, "preset": "standard"})
+        
+        assert response.status_code == 200
+        assert response.json()["preset"] == "standard"
+        config = engine.start_transcoding.call_args[0][0]
+        assert config.preset == "standard"
+        assert all(v.codec == CodecType.H264 for v in config.output_variants)
+    
+    def test_start_defaults_to_default_preset(self, engine):
+        client = TestClient(app)
+        response = client.post("/start-transcoding", params={"input_url": APPLE_TEST_STREAM})
+        
+        assert response.status_code == 200
+        config = engine.start_transcoding.call_args[0][0]
+        assert config.preset == "default"
+        assert len(config.output_variants) == 4
+    
+    def test_start_with_inline_variants(self, engine):
+        client = TestClient(app)
+        response = client.post(
+            "/start-transcoding",
+            params={"input_url": APPLE_TEST_STREAM},
+            json=[{"codec": "h264", "audio_codec": "aac_lc", "resolution": {"width": 854, "height": 480}, "bitrate": 1500}]
+        )
+        
+        assert response.status_code == 200
+        config = engine.start_transcoding.call_args[0][0]
+        assert config.preset is None
+        assert [v.variant_name for v in config.output_variants] == ["h264_854x480_1500k_ts"]
+    
+    def test_unknown_preset_is_rejected(self, engine):
+        client = TestClient(app)
+        response = client.post("/start-transcoding", params={"input_url": APPLE_TEST_STREAM, "preset": "missing"})
+        
+        assert response.status_code == 404
+        assert not engine.start_transcoding.called
+    
+    def test_presets_report_cost_and_egress(self):
+        client = TestClient(app)
+        response = client.get("/presets")
+        
+        assert response.status_code == 200
+        presets = {preset["name"]: preset for preset in response.json()["presets"]}
+        assert response.json()["default_preset"] == "default"
+        assert presets["standard"]["egress_kbps"] == 5000 + 3000 + 1500 + 3 * 128
+        assert presets["multi_codec"]["cpu_cost"] > presets["standard"]["cpu_cost"]
@@ -0,0 +1,129 @@
+import httpx
+import pytest
+
+from m3u8_codec_forward.live import LivePlaylistTracker
+from m3u8_codec_forward.parser import M3U8Parser
+
+
+def live_playlist(first: int, count: int, skip: int = 0, can_skip: bool = False, endlist: bool = False) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:9", "#EXT-X-TARGETDURATION:4", f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+    if can_skip:
+        lines.append("#EXT-X-SERVER-CONTROL:CAN-SKIP-UNTIL=24.0")
+    if skip:
+        lines.append(f"#EXT-X-SKIP:SKIPPED-SEGMENTS={skip}")
+    for sequence in range(first + skip, first + count):
+        lines.append("#EXTINF:4.0,")
+        lines.append(f"segment{sequence}.ts")
+    if endlist:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def make_parser(handler) -> M3U8Parser:
+    return M3U8Parser(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+class TestLivePlaylistTracker:
+
+    @pytest.mark.asyncio
+    async def test_refresh_emits_only_new_segments(self):
+        bodies = [live_playlist(0, 3), live_playlist(1, 3), live_playlist(2, 4)]
+        parser = make_parser(lambda request: httpx.Response(200, text=bodies.pop(0)))
+        tracker = LivePlaylistTracker(parser, "http://example.com/live/index.m3u8")
+        try:
+            first = await tracker.refresh()
+            second = await tracker.refresh()
+            third = await tracker.refresh()
+            
+            assert [s.sequence for s in first] == [0, 1, 2]
+            assert [s.sequence for s in second] == [3]
+            assert [s.sequence for s in third] == [4, 5]
+            assert third[0].uri == "http://example.com/live/segment4.ts"
+            assert tracker.target_duration == 4.0
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_unchanged_playlist_uses_conditional_get(self):
+        requests = []
+        
+        def handler(request):
+            requests.append(request)
+            if request.headers.get("if-none-match") == '"a"':
+                return httpx.Response(304)
+            return httpx.Response(200, text=live_playlist(0, 3), headers={"ETag": '"a"'})
+        
+        parser = make_parser(handler)
+        tracker = LivePlaylistTracker(parser, "http://example.com/live/index.m3u8")
+        try:
+            await tracker.refresh()
+            assert await tracker.refresh() == []
+            assert requests[1].headers["if-none-match"] == '"a"'
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_delta_updates_when_origin_supports_skip(self):
+        requests = []
+        
+        def handler(request):
+            requests.append(request)
+            if request.url.params.get("_HLS_skip") == "YES":
+                return httpx.Response(200, text=live_playlist(0, 12, skip=8, can_skip=True))
+            return httpx.Response(200, text=live_playlist(0, 10, can_skip=True))
+        
+        parser = make_parser(handler)
+        tracker = LivePlaylistTracker(parser, "http://example.com/live/index.m3u8?token=abc")
+        try:
+            first = await tracker.refresh()
+            second = await tracker.refresh()
+            
+            assert len(first) == 10
+            assert "_HLS_skip" not in requests[0].url.params
+            assert requests[1].url.params["_HLS_skip"] == "YES"
+            assert requests[1].url.params["token"] == "abc"
+            assert [s.sequence for s in second] == [10, 11]
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_delta_gap_falls_back_to_full_playlist(self):
+        requests = []
+        
+        def handler(request):
+            requests.append(request)
+            if len(requests) == 1:
+                return httpx.Response(200, text=live_playlist(0, 4, can_skip=True))
+            if request.url.params.get("_HLS_skip") == "YES":
+                return httpx.Response(200, text=live_playlist(0, 14, skip=10, can_skip=True))
+            return httpx.Response(200, text=live_playlist(0, 14, can_skip=True))
+        
+        parser = make_parser(handler)
+        tracker = LivePlaylistTracker(parser, "http://example.com/live/index.m3u8")
+        try:
+            await tracker.refresh()
+            second = await tracker.refresh()
+            
+            assert len(requests) == 3
+            assert [s.sequence for s in second] == list(range(4, 14))
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_iteration_stops_at_endlist(self):
+        bodies = [live_playlist(0, 2), live_playlist(0, 3, endlist=True)]
+        parser = make_parser(lambda request: httpx.Response(200, text=bodies.pop(0)))
+        tracker = LivePlaylistTracker(parser, "http://example.com/live/index.m3u8", min_poll_interval=0)
+        tracker.poll_interval = lambda changed: 0
+        try:
+            sequences = [segment.sequence async for segment in tracker]
+            assert sequences == [0, 1, 2]
+        finally:
+            await parser.close()
+    
+    def test_poll_interval_follows_target_duration(self):
+        tracker = LivePlaylistTracker(None, "http://example.com/live/index.m3u8")
+        tracker.target_duration = 6.0
+        
+        assert tracker.poll_interval(changed=True) == 6.0
+        assert tracker.poll_interval(changed=False) == 3.0
@@ -0,0 +1,52 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from m3u8_codec_forward.main import main
+
+
+def loaded_modules(code: str):
+    probe = (
+        f"{code}\n"
+        "import sys, json\n"
+        "print(json.dumps([m for m in ('fastapi', 'uvicorn', 'httpx', 'm3u8', 'yaml', 'ffmpeg') if m in sys.modules]))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestImportGraph:
+    def test_cli_import_skips_server_stack(self):
+        assert loaded_modules("import m3u8_codec_forward.main") == []
+    
+    def test_check_config_skips_server_stack(self, tmp_path):
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({"app": {"server_port": 9000}}))
+        
+        code = (
+            "from m3u8_codec_forward.main import main\n"
+            f"main(['--config', {str(config_path)!r}, '--check-config'])"
+        )
+        assert loaded_modules(code) == []
+    
+    def test_transcoder_does_not_import_ffmpeg_python(self):
+        assert "ffmpeg" not in loaded_modules("import m3u8_codec_forward.transcoder")
+
+
+class TestCheckConfig:
+    def test_valid_config(self, tmp_path, capsys):
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({"app": {"server_port": 9000}}))
+        
+        main(["--config", str(config_path), "--check-config"])
+        
+        assert "Configuration OK" in capsys.readouterr().out
+    
+    def test_invalid_config_exits(self, tmp_path):
+        config_path = tmp_path / "config.json"
+        config_path.write_text("invalid json content")
+        
+        with pytest.raises(SystemExit):
+            main(["--config", str(config_path), "--check-config"])
@@ -0,0 +1,143 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward import metrics
+from m3u8_codec_forward.metrics import MetricsRegistry, LoopLagMonitor, progress_speed
+from m3u8_codec_forward.parser import M3U8Parser
+from m3u8_codec_forward.server import app
+from m3u8_codec_forward.transcoder import TranscodingEngine
+
+
+class _FakeProcess:
+    def __init__(self, progress: bytes):
+        self.stdout = asyncio.StreamReader()
+        self.stdout.feed_data(progress)
+        self.stdout.feed_eof()
+
+
+class TestMetricsRegistry:
+
+    def test_counter_and_gauge_exposition(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests", ("route",))
+        gauge = registry.gauge("temperature", "Temperature")
+        requests.inc(route="/a")
+        requests.inc(2, route='/b"')
+        gauge.set(1.5)
+        
+        text = registry.render()
+        
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{route="/a"} 1' in text
+        assert 'requests_total{route="/b\\""} 2' in text
+        assert "temperature 1.5" in text
+    
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+        
+        lines = registry.render().splitlines()
+        
+        assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{le="1"} 3' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+        assert "latency_seconds_sum 4.25" in lines
+        assert "latency_seconds_count 4" in lines
+    
+    def test_collected_gauge_is_computed_at_scrape_time(self):
+        registry = MetricsRegistry()
+        values = {("a",): 1.0}
+        registry.gauge("age_seconds", "Age", ("variant",), collect=lambda: values)
+        
+        values[("b",)] = 2.0
+        text = registry.render()
+        
+        assert 'age_seconds{variant="a"} 1' in text
+        assert 'age_seconds{variant="b"} 2' in text
+    
+    def test_duplicate_registration_fails(self):
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests")
+        with pytest.raises(ValueError):
+            registry.counter("requests_total", "Requests")
+    
+    def test_metric_without_samples_cannot_be_created(self):
+        class Incomplete(metrics._Metric):
+            kind = "gauge"
+        
+        with pytest.raises(TypeError):
+            Incomplete("incomplete", "Has no samples")
+    
+    def test_progress_speed(self):
+        assert progress_speed("1.25x") == 1.25
+        assert progress_speed("N/A") is None
+        assert progress_speed(None) is None
+
+
+class TestMetricsEndpoint:
+
+    def test_routes_are_labelled_by_template(self):
+        with TestClient(app) as client:
+            client.get("/health")
+            client.get("/missing_segment.ts")
+            response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'm3u8cf_http_requests_total{route="/health",method="GET",status="200"}' in response.text
+        assert 'm3u8cf_http_requests_total{route="/{segment_name}",method="GET",status="404"}' in response.text
+        assert "m3u8cf_encoder_processes 0" in response.text
+        assert 'route="/metrics"' not in response.text
+    
+    @pytest.mark.asyncio
+    async def test_loop_lag_monitor_observes_wakeups(self):
+        histogram = MetricsRegistry().histogram("lag_seconds", "Lag")
+        monitor = LoopLagMonitor(interval=0.01, histogram=histogram)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        
+        assert histogram.count() >= 2
+
+
+class TestEncoderMetrics:
+
+    @pytest.mark.asyncio
+    async def test_progress_blocks_update_gauges_and_segment_interval(self, tmp_path):
+        engine = TranscodingEngine(str(tmp_path))
+        playlist = tmp_path / "rung.m3u8"
+        playlist.write_text("#EXTM3U\n")
+        os.utime(playlist, ns=(0, 10_000_000_000))
+        # The first block records the playlist; the second sees it rewritten 4 s later
+        engine._observe_playlist("rung")
+        os.utime(playlist, ns=(0, 14_000_000_000))
+        before = metrics.segment_interval.count(variant="rung")
+        
+        process = _FakeProcess(b"frame=10\nfps=29.5\nspeed=0.98x\nprogress=continue\n")
+        await engine._read_progress(process, "rung")
+        
+        assert metrics.encoder_fps.value(variant="rung") == 29.5
+        assert metrics.encoder_speed.value(variant="rung") == 0.98
+        assert metrics.segment_interval.count(variant="rung") == before + 1
+        metrics.encoder_fps.remove(variant="rung")
+        metrics.encoder_speed.remove(variant="rung")
+        await engine.close()
+    
+    @pytest.mark.asyncio
+    async def test_parser_fetch_latency_is_recorded(self):
+        parser = M3U8Parser(client=httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, text="#EXTM3U\n"))
+        ))
+        before = metrics.parser_fetch_duration.count(outcome="ok")
+        try:
+            await parser.fetch("http://example.com/index.m3u8")
+        finally:
+            await parser.close()
+        
+        assert metrics.parser_fetch_duration.count(outcome="ok") == before + 1
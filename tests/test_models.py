@@ -126,4 +126,37 @@ class TestTranscodingConfig:
         )
         
         assert config.output_port == 9000
-        assert config.output_host == "192.168.1.100"
\ No newline at end of file
+        assert config.output_host == "192.168.1.100"
+
+class TestFrozenStreamVariant:
+    def make_variant(self, **overrides):
+        fields = dict(
+            codec=CodecType.H264,
+            audio_codec=AudioCodec.AAC_LC,
+            resolution=Resolution(width=1280, height=720),
+            bitrate=3000
+        )
+        fields.update(overrides)
+        return StreamVariant(**fields)
+    
+    def test_variants_are_immutable(self):
+        variant = self.make_variant()
+        with pytest.raises(ValidationError):
+            variant.bitrate = 5000
+    
+    def test_equal_variants_deduplicate(self):
+        variants = {self.make_variant(), self.make_variant(), self.make_variant(bitrate=800)}
+        assert len(variants) == 2
+    
+    def test_cost_estimate_scales_with_codec_and_pixels(self):
+        h264 = self.make_variant()
+        h265 = self.make_variant(codec=CodecType.H265)
+        small = self.make_variant(resolution=Resolution(width=640, height=360))
+        
+        assert h264.cost_estimate == pytest.approx(1280 * 720 * 30 / 1_000_000)
+        assert h265.cost_estimate > h264.cost_estimate > small.cost_estimate
+    
+    def test_model_copy_refreshes_derived_fields(self):
+        variant = self.make_variant().model_copy(update={"bitrate": 800})
+        assert variant.variant_name == "h264_1280x720_800k_ts"
+        assert variant == self.make_variant(bitrate=800)
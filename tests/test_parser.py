@@ -2,6 +2,7 @@ import pytest
 import pytest_asyncio
 from unittest.mock import AsyncMock, patch
 import httpx
+import asyncio
 
 from m3u8_codec_forward.parser import M3U8Parser
 from m3u8_codec_forward.models import StreamInfo
@@ -68,7 +69,7 @@ segment2.ts
             
             assert isinstance(stream_info, StreamInfo)
             assert len(stream_info.segments) == 3
-            assert stream_info.duration == 30.0  # 10 * 3 segments
+            assert stream_info.duration == pytest.approx(27.027)  # sum of EXTINF durations
             
             # Check segment URLs are properly resolved
             expected_segments = [
@@ -128,4 +129,194 @@ segment.ts
         
         url2 = "https://cdn.example.com/streams/master.m3u8"
         base_uri2 = parser._get_base_uri(url2)
-        assert base_uri2 == "https://cdn.example.com/streams/"
\ No newline at end of file
+        assert base_uri2 == "https://cdn.example.com/streams/"
+
+MEDIA_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXTINF:9.009,
+segment0.ts
+#EXTINF:9.009,
+segment1.ts
+"""
+
+
+class TestConditionalRequests:
+    
+    def make_parser(self, handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return M3U8Parser(client=client)
+    
+    @pytest.mark.asyncio
+    async def test_etag_revalidation_reuses_parsed_playlist(self):
+        requests = []
+        
+        def handler(request):
+            requests.append(request)
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text=MEDIA_PLAYLIST, headers={"ETag": '"v1"'})
+        
+        parser = self.make_parser(handler)
+        try:
+            first = await parser.parse_playlist("http://example.com/live/playlist.m3u8")
+            second = await parser.parse_playlist("http://example.com/live/playlist.m3u8", use_cache=False)
+            
+            assert second is first
+            assert "if-none-match" not in requests[0].headers
+            assert requests[1].headers["if-none-match"] == '"v1"'
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_last_modified_revalidation(self):
+        requests = []
+        last_modified = "Wed, 21 Oct 2026 07:28:00 GMT"
+        
+        def handler(request):
+            requests.append(request)
+            if request.headers.get("if-modified-since") == last_modified:
+                return httpx.Response(304)
+            return httpx.Response(200, text=MEDIA_PLAYLIST, headers={"Last-Modified": last_modified})
+        
+        parser = self.make_parser(handler)
+        try:
+            first = await parser.parse_playlist("http://example.com/live/playlist.m3u8")
+            second = await parser.parse_playlist("http://example.com/live/playlist.m3u8", use_cache=False)
+            
+            assert second is first
+            assert requests[1].headers["if-modified-since"] == last_modified
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_changed_playlist_is_reparsed(self):
+        bodies = [MEDIA_PLAYLIST, MEDIA_PLAYLIST + "#EXTINF:9.009,\nsegment2.ts\n"]
+        
+        def handler(request):
+            body = bodies.pop(0)
+            return httpx.Response(200, text=body, headers={"ETag": f'"{len(body)}"'})
+        
+        parser = self.make_parser(handler)
+        try:
+            first = await parser.parse_playlist("http://example.com/live/playlist.m3u8")
+            second = await parser.parse_playlist("http://example.com/live/playlist.m3u8", use_cache=False)
+            
+            assert len(first.segments) == 2
+            assert len(second.segments) == 3
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_requests_per_origin_are_bounded(self):
+        in_flight = 0
+        peak = 0
+        
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, text=MEDIA_PLAYLIST)
+        
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        parser = M3U8Parser(client=client, max_connections_per_origin=2)
+        try:
+            await asyncio.gather(*[
+                parser.parse_playlist(f"http://example.com/{i}/playlist.m3u8") for i in range(6)
+            ])
+            assert peak == 2
+        finally:
+            await parser.close()
+
+
+class TestParseCache:
+    
+    @pytest.mark.asyncio
+    async def test_media_playlist_cached_for_half_target_duration(self):
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, text=MEDIA_PLAYLIST)
+        
+        parser = M3U8Parser(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            with patch("m3u8_codec_forward.parser.time.monotonic", return_value=100.0):
+                first = await parser.parse_playlist("http://example.com/live/playlist.m3u8")
+            assert first.target_duration == 10.0
+            
+            with patch("m3u8_codec_forward.parser.time.monotonic", return_value=104.9):
+                assert await parser.parse_playlist("http://example.com/live/playlist.m3u8") is first
+            assert len(calls) == 1
+            
+            with patch("m3u8_codec_forward.parser.time.monotonic", return_value=105.1):
+                await parser.parse_playlist("http://example.com/live/playlist.m3u8")
+            assert len(calls) == 2
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_master_playlist_uses_master_ttl(self):
+        calls = []
+        master = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080
+high.m3u8
+"""
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, text=master)
+        
+        parser = M3U8Parser(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            master_ttl=60.0
+        )
+        try:
+            with patch("m3u8_codec_forward.parser.time.monotonic", return_value=100.0):
+                await parser.get_master_playlist_info("http://example.com/master.m3u8")
+            with patch("m3u8_codec_forward.parser.time.monotonic", return_value=159.0):
+                await parser.get_master_playlist_info("http://example.com/master.m3u8")
+            assert len(calls) == 1
+            
+            parser.invalidate("http://example.com/master.m3u8")
+            await parser.get_master_playlist_info("http://example.com/master.m3u8")
+            assert len(calls) == 2
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_fetch(self):
+        calls = []
+        
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, text=MEDIA_PLAYLIST)
+        
+        parser = M3U8Parser(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            results = await asyncio.gather(*[
+                parser.parse_playlist("http://example.com/live/playlist.m3u8") for _ in range(5)
+            ])
+            assert len(calls) == 1
+            assert all(result is results[0] for result in results)
+        finally:
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_failed_fetch_is_not_cached(self):
+        responses = [httpx.Response(500), httpx.Response(200, text=MEDIA_PLAYLIST)]
+        
+        def handler(request):
+            return responses.pop(0)
+        
+        parser = M3U8Parser(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            with pytest.raises(Exception, match="Error parsing M3U8"):
+                await parser.parse_playlist("http://example.com/live/playlist.m3u8")
+            stream_info = await parser.parse_playlist("http://example.com/live/playlist.m3u8")
+            assert len(stream_info.segments) == 2
+        finally:
+            await parser.close()
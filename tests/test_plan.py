@@ -0,0 +1,156 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from m3u8_codec_forward.models import StreamVariant, Resolution, CodecType, AudioCodec, ContainerFormat, TranscodingConfig
+from m3u8_codec_forward.plan import diff_variants, fit_to_source, SourceProfile
+from m3u8_codec_forward.transcoder import TranscodingEngine
+
+
+def variant(height: int, bitrate: int, container: ContainerFormat = ContainerFormat.TS) -> StreamVariant:
+    return StreamVariant(
+        codec=CodecType.H264,
+        audio_codec=AudioCodec.AAC_LC,
+        resolution=Resolution(width=height * 16 // 9, height=height),
+        bitrate=bitrate,
+        container=container
+    )
+
+
+class TestDiffVariants:
+
+    def test_added_removed_and_unchanged(self):
+        old = [variant(1080, 5000), variant(720, 3000), variant(480, 1500)]
+        new = [variant(1080, 5000), variant(720, 3000, ContainerFormat.FMP4), variant(360, 800)]
+        
+        diff = diff_variants(old, new)
+        
+        assert diff.added == [variant(720, 3000, ContainerFormat.FMP4), variant(360, 800)]
+        assert diff.removed == [variant(720, 3000), variant(480, 1500)]
+        assert diff.unchanged == [variant(1080, 5000)]
+        assert diff.changed
+    
+    def test_identical_ladders_are_unchanged(self):
+        ladder = [variant(1080, 5000), variant(720, 3000)]
+        
+        diff = diff_variants(ladder, list(reversed(ladder)) + [variant(720, 3000)])
+        
+        assert not diff.changed
+        assert len(diff.unchanged) == 2
+
+
+class TestEncoderPlan:
+
+    def test_plan_deduplicates_and_estimates(self):
+        from m3u8_codec_forward.plan import EncoderPlan
+        
+        plan = EncoderPlan("test", [variant(720, 3000), variant(720, 3000), variant(360, 800)])
+        
+        assert len(plan.variants) == 2
+        assert plan.egress_kbps == 3000 + 800 + 2 * 128
+        assert plan.cpu_cost == round(variant(720, 3000).cost_estimate + variant(360, 800).cost_estimate, 3)
+    
+    def test_config_manager_reuses_compiled_plans(self):
+        from m3u8_codec_forward.config import ConfigManager
+        
+        manager = ConfigManager()
+        
+        assert manager.get_plan("standard") is manager.get_plan("standard")
+        assert manager.get_plan("missing") is None
+
+
+class _FakeEncoder:
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+    
+    async def wait(self):
+        return self.returncode
+
+
+class TestFitToSource:
+
+    def test_profile_from_master_playlist_variant(self):
+        source = SourceProfile.from_variant({"bandwidth": 2128000, "resolution": (854, 480), "frame_rate": 25.0})
+        
+        assert source == SourceProfile(width=854, height=480, framerate=25.0, bitrate=2128)
+        assert SourceProfile.from_variant({"resolution": "1280x720"}).height == 720
+    
+    def test_rungs_above_an_sd_source_are_dropped(self):
+        ladder = [variant(1080, 5000), variant(720, 3000), variant(480, 1500), variant(360, 800)]
+        
+        fitted, adjustments = fit_to_source(ladder, SourceProfile(width=854, height=480, bitrate=2500))
+        
+        assert fitted == [variant(480, 1500), variant(360, 800)]
+        assert [adjustment["action"] for adjustment in adjustments] == ["dropped", "dropped"]
+        assert adjustments[0]["variant"] == variant(1080, 5000).variant_name
+        assert adjustments[0]["reason"] == "above the source resolution 854x480"
+    
+    def test_bitrate_and_framerate_are_capped(self):
+        ladder = [variant(720, 3000).model_copy(update={"framerate": 60.0})]
+        
+        fitted, adjustments = fit_to_source(ladder, SourceProfile(width=1280, height=720, framerate=30.0, bitrate=2000))
+        
+        assert fitted[0].bitrate == 2000 and fitted[0].framerate == 30.0
+        assert adjustments == [{
+            "variant": ladder[0].variant_name, "action": "capped",
+            "changes": {"framerate": 30.0, "bitrate": 2000},
+            "result": fitted[0].variant_name,
+        }]
+    
+    def test_codec_with_no_fitting_rung_keeps_its_smallest_scaled_down(self):
+        hevc = variant(1080, 3000, ContainerFormat.FMP4).model_copy(update={"codec": CodecType.H265})
+        ladder = [variant(360, 800), hevc]
+        
+        fitted, adjustments = fit_to_source(ladder, SourceProfile(width=640, height=360))
+        
+        assert fitted[0] == variant(360, 800)
+        assert fitted[1].codec == CodecType.H265
+        assert str(fitted[1].resolution) == "640x360"
+        assert adjustments[0]["changes"] == {"resolution": "640x360"}
+    
+    def test_rungs_that_become_identical_are_encoded_once(self):
+        ladder = [variant(720, 3000), variant(720, 2500)]
+        
+        fitted, adjustments = fit_to_source(ladder, SourceProfile(width=1280, height=720, bitrate=2000))
+        
+        assert fitted == [variant(720, 2000)]
+        assert adjustments[1]["action"] == "dropped"
+    
+    def test_unknown_source_leaves_the_ladder_alone(self):
+        ladder = [variant(1080, 5000), variant(720, 3000)]
+        
+        assert fit_to_source(ladder, SourceProfile()) == (ladder, [])
+    
+    @pytest.mark.asyncio
+    async def test_engine_only_starts_fitted_variants(self, tmp_path):
+        spawn = AsyncMock(side_effect=lambda *args, **kwargs: _FakeEncoder())
+        engine = TranscodingEngine(str(tmp_path))
+        engine.parser.get_master_playlist_info = AsyncMock(return_value={"variants": [
+            {"uri": "sd.m3u8", "bandwidth": 1800000, "resolution": (854, 480), "frame_rate": 25.0},
+        ]})
+        config = TranscodingConfig(
+            input_url="http://example.com/master.m3u8",
+            output_variants=[variant(1080, 5000), variant(720, 3000), variant(480, 1500)]
+        )
+        
+        try:
+            with patch("asyncio.create_subprocess_exec", spawn):
+                urls = await engine.start_transcoding(config)
+            stream = await engine.describe_stream(str(config.input_url))
+        finally:
+            await engine.close()
+            await asyncio.sleep(0.2)
+        
+        assert spawn.await_count == 1
+        assert list(urls) == [variant(480, 1500).variant_name]
+        assert [adjustment["action"] for adjustment in stream["adjustments"]] == ["dropped", "dropped"]
+        assert len(stream["config"]["output_variants"]) == 1
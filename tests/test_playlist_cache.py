@@ -0,0 +1,143 @@
+import gzip
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward import server
+from m3u8_codec_forward.playlist_cache import PlaylistCache, negotiate_encodings
+
+
+def make_playlist(segments: int) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:6", "#EXT-X-MEDIA-SEQUENCE:0"]
+    for i in range(segments):
+        lines.append("#EXTINF:6.000000,")
+        lines.append(f"h264_1920x1080_5000k_ts_{i:03d}.ts")
+    return "\n".join(lines) + "\n"
+
+
+class TestNegotiateEncodings:
+    def test_prefers_brotli_over_gzip(self):
+        assert negotiate_encodings("gzip, deflate, br") == ["br", "gzip"]
+    
+    def test_respects_quality_values(self):
+        assert negotiate_encodings("br;q=0.5, gzip;q=1.0") == ["gzip", "br"]
+        assert negotiate_encodings("gzip;q=0, br;q=0") == []
+    
+    def test_wildcard_and_missing_header(self):
+        assert negotiate_encodings("*") == ["br", "gzip"]
+        assert negotiate_encodings(None) == []
+        assert negotiate_encodings("identity") == []
+
+
+class TestPlaylistCache:
+    def test_compresses_once_per_version(self, tmp_path):
+        playlist_path = tmp_path / "variant.m3u8"
+        playlist_path.write_text(make_playlist(50))
+        cache = PlaylistCache()
+        
+        first = cache.get_file(playlist_path)
+        second = cache.get_file(playlist_path)
+        
+        assert first is second
+        assert gzip.decompress(first.encoded["gzip"]) == playlist_path.read_bytes()
+    
+    def test_new_version_is_reloaded(self, tmp_path):
+        playlist_path = tmp_path / "variant.m3u8"
+        playlist_path.write_text(make_playlist(50))
+        cache = PlaylistCache()
+        first = cache.get_file(playlist_path)
+        
+        playlist_path.write_text(make_playlist(51))
+        stat = playlist_path.stat()
+        os.utime(playlist_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        second = cache.get_file(playlist_path)
+        
+        assert second is not first
+        assert second.raw == playlist_path.read_bytes()
+        assert second.etag != first.etag
+    
+    def test_missing_file_returns_none(self, tmp_path):
+        cache = PlaylistCache()
+        assert cache.get_file(tmp_path / "missing.m3u8") is None
+    
+    def test_small_playlists_are_not_compressed(self, tmp_path):
+        playlist_path = tmp_path / "short.m3u8"
+        playlist_path.write_text("#EXTM3U\n")
+        entry = PlaylistCache().get_file(playlist_path)
+        
+        assert entry.encoded == {}
+        assert entry.select("gzip, br") == (b"#EXTM3U\n", None)
+    
+    def test_generated_playlists_use_version_key(self):
+        cache = PlaylistCache()
+        calls = []
+        
+        def produce():
+            calls.append(1)
+            return make_playlist(10).encode()
+        
+        cache.get_generated("master", 1, produce)
+        cache.get_generated("master", 1, produce)
+        cache.get_generated("master", 2, produce)
+        
+        assert len(calls) == 2
+    
+    def test_lru_eviction(self):
+        cache = PlaylistCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.get_generated(key, 1, lambda: b"#EXTM3U\n")
+        
+        assert len(cache) == 2
+
+
+class TestServePlaylistEncoding:
+    @pytest.fixture
+    def working_dir(self, tmp_path, monkeypatch):
+        engine = type("Engine", (), {"working_dir": tmp_path})()
+        monkeypatch.setattr(server, "transcoding_engine", engine)
+        server.playlist_cache.clear()
+        yield tmp_path
+        server.playlist_cache.clear()
+    
+    def test_gzip_response(self, working_dir):
+        (working_dir / "variant.m3u8").write_text(make_playlist(50))
+        client = TestClient(server.app)
+        
+        response = client.get("/variant.m3u8", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.text == make_playlist(50)
+    
+    def test_identity_response_and_etag(self, working_dir):
+        (working_dir / "variant.m3u8").write_text(make_playlist(50))
+        client = TestClient(server.app)
+        
+        response = client.get("/variant.m3u8", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.headers["content-type"] == "application/vnd.apple.mpegurl"
+        
+        cached = client.get("/variant.m3u8", headers={
+            "Accept-Encoding": "identity", "If-None-Match": response.headers["etag"]
+        })
+        assert cached.status_code == 304
+    
+    def test_each_encoding_has_its_own_etag(self, working_dir):
+        (working_dir / "variant.m3u8").write_text(make_playlist(50))
+        client = TestClient(server.app)
+        
+        identity = client.get("/variant.m3u8", headers={"Accept-Encoding": "identity"})
+        gzipped = client.get("/variant.m3u8", headers={"Accept-Encoding": "gzip"})
+        assert gzipped.headers["etag"] != identity.headers["etag"]
+        
+        # A validator for one encoding doesn't match the other's body
+        stale = client.get("/variant.m3u8", headers={
+            "Accept-Encoding": "gzip", "If-None-Match": identity.headers["etag"]
+        })
+        fresh = client.get("/variant.m3u8", headers={
+            "Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]
+        })
+        assert stale.status_code == 200
+        assert fresh.status_code == 304
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward.config import ConfigManager
+from m3u8_codec_forward.profiling import LoopStallWatchdog, sample_stacks, collapsed
+from m3u8_codec_forward.server import app
+
+
+def _blocking_call(seconds: float):
+    time.sleep(seconds)
+
+
+def _busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def profiling_enabled():
+    manager = ConfigManager()
+    manager.app_config.enable_profiling = True
+    previous = getattr(app.state, "config_manager", None)
+    app.state.config_manager = manager
+    yield manager
+    if previous is None:
+        del app.state.config_manager
+    else:
+        app.state.config_manager = previous
+
+
+class TestLoopStallWatchdog:
+
+    @pytest.mark.asyncio
+    async def test_stall_is_reported_with_the_blocking_stack(self):
+        watchdog = LoopStallWatchdog(threshold=0.05)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            _blocking_call(0.3)
+            await asyncio.sleep(0.1)
+        finally:
+            watchdog.stop()
+        
+        assert len(watchdog.stalls) == 1
+        stall = watchdog.recent()[0]
+        assert "_blocking_call" in stall["stack"][-1]
+        assert 200 <= stall["duration_ms"] <= 1000
+    
+    @pytest.mark.asyncio
+    async def test_responsive_loop_reports_nothing(self):
+        watchdog = LoopStallWatchdog(threshold=0.05)
+        watchdog.start()
+        try:
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+        finally:
+            watchdog.stop()
+        
+        assert watchdog.recent() == []
+
+
+class TestSamplingProfiler:
+
+    def test_samples_are_folded_per_thread(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy_worker, args=(stop,), name="busy-worker")
+        worker.start()
+        try:
+            stacks = sample_stacks(0.1, interval=0.005)
+        finally:
+            stop.set()
+            worker.join()
+        
+        busy = [stack for stack in stacks if stack.startswith("busy-worker;")]
+        assert busy
+        assert any("_busy_worker (test_profiling.py:" in stack for stack in busy)
+        line = collapsed(stacks).splitlines()[0]
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) == stacks[stack]
+
+
+class TestProfilingEndpoints:
+
+    def test_endpoints_are_hidden_unless_enabled(self):
+        with TestClient(app) as client:
+            assert client.get("/admin/profile", params={"seconds": 0.1}).status_code == 404
+            assert client.get("/admin/loop-stalls").status_code == 404
+    
+    def test_profile_and_stalls(self, profiling_enabled):
+        with TestClient(app) as client:
+            response = client.get("/admin/profile", params={"seconds": 0.1, "interval": 0.01})
+            stalls = client.get("/admin/loop-stalls")
+            invalid = client.get("/admin/profile", params={"seconds": 0})
+        
+        assert response.status_code == 200
+        assert response.text.strip()
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
+        assert stalls.status_code == 200
+        assert stalls.json()["threshold_ms"] == 100
+        assert invalid.status_code == 400
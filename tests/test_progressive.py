@@ -0,0 +1,260 @@
+import asyncio
+import os
+import struct
+from unittest.mock import patch, AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward import server
+from m3u8_codec_forward.progressive import ProgressiveStream, SPLITTERS, INIT, JOIN, DATA, _Splitter
+from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.models import (
+    TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
+)
+
+
+def box(kind: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def fragment(payload: bytes) -> bytes:
+    return box(b"moof", b"\x00" * 8) + box(b"mdat", payload)
+
+
+MP4_INIT = box(b"ftyp", b"isom") + box(b"moov", b"\x00" * 16)
+
+
+def flv_tag(tag_type: int, data: bytes) -> bytes:
+    header = bytes([tag_type]) + len(data).to_bytes(3, "big") + b"\x00" * 7
+    return header + data + struct.pack(">I", 11 + len(data))
+
+
+def avi_chunk(chunk_id: bytes, payload: bytes) -> bytes:
+    return struct.pack("<4sI", chunk_id, len(payload)) + payload + b"\x00" * (len(payload) & 1)
+
+
+async def collect(chunks, count):
+    received = []
+    async for chunk in chunks:
+        received.append(chunk)
+        if len(received) == count:
+            break
+    return received
+
+
+class _FakeEncoder:
+    """Holds the output pipe's write end the way a spawned ffmpeg would."""
+    
+    def __init__(self, pass_fds):
+        self.output = os.dup(pass_fds[0]) if pass_fds else None
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def write(self, data: bytes):
+        os.write(self.output, data)
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            if self.output is not None:
+                os.close(self.output)
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+    
+    async def wait(self):
+        return self.returncode
+
+
+class TestSplitters:
+
+    def test_mp4_header_then_fragments(self):
+        splitter = SPLITTERS[ContainerFormat.MP4]()
+        data = MP4_INIT + fragment(b"frame")
+        
+        # Units come out only once complete, whatever the read boundaries
+        units = splitter.feed(data[:20]) + splitter.feed(data[20:])
+        
+        assert [kind for _, kind in units] == [INIT, INIT, JOIN, DATA]
+        assert b"".join(unit for unit, _ in units) == data
+    
+    def test_matroska_clusters_are_join_points(self):
+        splitter = SPLITTERS[ContainerFormat.WEBM]()
+        ebml_header = bytes.fromhex("1a45dfa3") + b"\x84" + b"webm"
+        # Segment and cluster of unknown size, as written with -live 1
+        segment = bytes.fromhex("18538067") + b"\x01" + b"\xff" * 7
+        tracks = bytes.fromhex("1654ae6b") + b"\x82" + b"\x00\x00"
+        cluster = bytes.fromhex("1f43b675") + b"\xff"
+        block = bytes.fromhex("a3") + b"\x83" + b"abc"
+        
+        units = splitter.feed(ebml_header + segment + tracks + cluster + block)
+        
+        assert [kind for _, kind in units] == [INIT, INIT, INIT, JOIN, DATA]
+        assert units[3][0] == cluster
+    
+    def test_flv_codec_configuration_is_part_of_the_header(self):
+        splitter = SPLITTERS[ContainerFormat.FLV]()
+        header = b"FLV\x01\x05\x00\x00\x00\x09" + b"\x00" * 4
+        metadata = flv_tag(18, b"onMetaData")
+        avc_config = flv_tag(9, b"\x17\x00config")
+        aac_config = flv_tag(8, b"\xaf\x00\x12\x10")
+        keyframe = flv_tag(9, b"\x17\x01frame")
+        interframe = flv_tag(9, b"\x27\x01frame")
+        audio = flv_tag(8, b"\xaf\x01sound")
+        
+        units = splitter.feed(header + metadata + avc_config + aac_config + keyframe + interframe + audio)
+        
+        assert [kind for _, kind in units] == [INIT, INIT, INIT, INIT, JOIN, DATA, DATA]
+    
+    def test_avi_descends_into_movi(self):
+        splitter = SPLITTERS[ContainerFormat.AVI]()
+        riff = struct.pack("<4sI4s", b"RIFF", 0, b"AVI ")
+        hdrl = avi_chunk(b"LIST", b"hdrl" + b"\x00" * 8)
+        movi = struct.pack("<4sI4s", b"LIST", 0, b"movi")
+        video = avi_chunk(b"00dc", b"frame")
+        audio = avi_chunk(b"01wb", b"sound")
+        
+        units = splitter.feed(riff + hdrl + movi + video + audio)
+        
+        assert [kind for _, kind in units] == [INIT, INIT, INIT, JOIN, DATA]
+    
+    def test_corrupt_output_is_an_error(self):
+        with pytest.raises(ValueError):
+            SPLITTERS[ContainerFormat.MP4]().feed(struct.pack(">I4s", 4, b"moof"))
+    
+    def test_splitter_without_unit_parsing_cannot_be_created(self):
+        class Incomplete(_Splitter):
+            pass
+        
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestProgressiveStream:
+
+    @pytest.mark.asyncio
+    async def test_clients_join_at_the_latest_keyframe(self):
+        stream = ProgressiveStream(ContainerFormat.MP4)
+        stream.feed(MP4_INIT + fragment(b"first") + fragment(b"second"))
+        
+        early, late = stream.subscribe(), stream.subscribe()
+        assert await collect(early, 2) == [MP4_INIT, fragment(b"second")]
+        stream.feed(fragment(b"third"))
+        assert await collect(late, 2) == [MP4_INIT, fragment(b"third")]
+        assert stream.bytes_fed == len(MP4_INIT + fragment(b"first") + fragment(b"second") + fragment(b"third"))
+    
+    @pytest.mark.asyncio
+    async def test_every_client_gets_the_same_live_output(self):
+        stream = ProgressiveStream(ContainerFormat.MP4)
+        clients = [asyncio.ensure_future(collect(stream.subscribe(), 3)) for _ in range(3)]
+        await asyncio.sleep(0)
+        
+        stream.feed(MP4_INIT + fragment(b"first"))
+        await asyncio.sleep(0)
+        stream.feed(fragment(b"second"))
+        
+        received = await asyncio.gather(*clients)
+        assert received == [[MP4_INIT, fragment(b"first"), fragment(b"second")]] * 3
+        assert stream.clients == 0
+    
+    @pytest.mark.asyncio
+    async def test_slow_client_skips_ahead_past_trimmed_output(self):
+        stream = ProgressiveStream(ContainerFormat.MP4, max_buffer=64)
+        stream.feed(MP4_INIT + fragment(b"a" * 20))
+        client = stream.subscribe()
+        await collect(client, 1)
+        
+        for payload in (b"b" * 20, b"c" * 20, b"d" * 20):
+            stream.feed(fragment(payload))
+        
+        # Only the newest fragment fits in the buffer
+        assert await collect(client, 1) == [fragment(b"d" * 20)]
+    
+    @pytest.mark.asyncio
+    async def test_output_before_the_first_keyframe_is_trimmed(self):
+        stream = ProgressiveStream(ContainerFormat.FLV, max_buffer=64)
+        header = b"FLV\x01\x05\x00\x00\x00\x09" + b"\x00" * 4
+        # Audio ahead of the first video keyframe, with no clients attached
+        stream.feed(header)
+        for payload in (b"a" * 40, b"b" * 40, b"c" * 40):
+            stream.feed(flv_tag(8, b"\xaf\x01" + payload))
+        assert not stream.started
+        
+        keyframe = flv_tag(9, b"\x17\x01frame")
+        stream.feed(keyframe)
+        assert await collect(stream.subscribe(), 2) == [header, keyframe]
+    
+    @pytest.mark.asyncio
+    async def test_clients_end_when_the_stream_closes(self):
+        stream = ProgressiveStream(ContainerFormat.MP4)
+        waiting = stream.subscribe()
+        stream.close()
+        
+        assert await collect(waiting, 1) == []
+
+
+class TestProgressiveEngine:
+
+    @pytest.mark.asyncio
+    async def test_encoder_pipe_fans_out_without_disk_writes(self, tmp_path):
+        encoders = []
+        
+        def spawn(*args, pass_fds=(), **kwargs):
+            encoders.append(_FakeEncoder(pass_fds))
+            return encoders[-1]
+        
+        engine = TranscodingEngine(str(tmp_path))
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        variant = StreamVariant(
+            codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC, resolution=Resolution(width=1280, height=720),
+            bitrate=2500, container=ContainerFormat.MP4
+        )
+        config = TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=[variant])
+        
+        try:
+            with patch("asyncio.create_subprocess_exec", AsyncMock(side_effect=spawn)) as mock_exec:
+                urls = await engine.start_transcoding(config)
+            cmd = mock_exec.await_args.args
+            
+            assert urls[variant.variant_name].endswith(f"/stream/{variant.variant_name}")
+            assert cmd[-1] == f"pipe:{mock_exec.await_args.kwargs['pass_fds'][0]}"
+            assert "frag_keyframe+empty_moov+default_base_moof" in cmd
+            
+            media_type, chunks = await engine.open_progressive(variant.variant_name)
+            assert media_type == "video/mp4"
+            encoders[0].write(MP4_INIT + fragment(b"first"))
+            assert await asyncio.wait_for(collect(chunks, 2), 1) == [MP4_INIT, fragment(b"first")]
+            assert list(tmp_path.iterdir()) == []
+        finally:
+            await engine.close()
+            await asyncio.sleep(0.2)
+        
+        assert await engine.open_progressive(variant.variant_name) is None
+    
+    def test_endpoint_streams_with_the_container_media_type(self):
+        stream = ProgressiveStream(ContainerFormat.WEBM)
+        header = bytes.fromhex("1a45dfa3") + b"\x84webm"
+        cluster = bytes.fromhex("1f43b675") + b"\xff" + bytes.fromhex("a3") + b"\x83abc"
+        stream.feed(header + cluster)
+        
+        async def live_output():
+            # The output so far, then the encoder stops
+            async for chunk in stream.subscribe():
+                yield chunk
+                stream.close()
+        
+        with TestClient(server.app) as client:
+            with patch.object(server.transcoding_engine, "open_progressive",
+                              AsyncMock(side_effect=[(stream.media_type, live_output()), None])):
+                response = client.get("/stream/rung")
+                missing = client.get("/stream/missing")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "video/webm"
+        # No length: servers send it chunked
+        assert "content-length" not in response.headers
+        assert response.content == header + cluster
+        assert missing.status_code == 404
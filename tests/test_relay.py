@@ -0,0 +1,192 @@
+import asyncio
+
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from m3u8_codec_forward.parser import M3U8Parser
+from m3u8_codec_forward.relay import IngestRelayPool
+from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.models import TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution
+
+
+SOURCE_URL = "http://origin.example.com/vod/high/index.m3u8"
+
+
+def vod_playlist(count: int) -> str:
+    return "#EXTM3U\n#EXT-X-TARGETDURATION:6\n" + "".join(
+        f"#EXTINF:6.0,\nsegment{i}.ts\n" for i in range(count)
+    ) + "#EXT-X-ENDLIST\n"
+
+
+class FakeOrigin:
+    def __init__(self, playlist: str):
+        self.playlist = playlist
+        self.requests = []
+    
+    def __call__(self, request):
+        self.requests.append(request.url.path)
+        if request.url.path.endswith(".m3u8"):
+            return httpx.Response(200, text=self.playlist)
+        return httpx.Response(200, content=f"data:{request.url.path}".encode())
+    
+    def hits(self, path: str) -> int:
+        return self.requests.count(path)
+
+
+def make_parser(origin) -> M3U8Parser:
+    return M3U8Parser(client=httpx.AsyncClient(transport=httpx.MockTransport(origin)))
+
+
+class TestIngestRelayPool:
+
+    @pytest.mark.asyncio
+    async def test_segments_are_fetched_once_for_all_consumers(self):
+        origin = FakeOrigin(vod_playlist(5))
+        parser = make_parser(origin)
+        pool = IngestRelayPool(parser, lookahead=2)
+        try:
+            first_url = await pool.acquire(SOURCE_URL)
+            second_url = await pool.acquire(SOURCE_URL)
+            assert first_url == second_url
+            assert first_url.startswith("http://127.0.0.1:")
+            
+            async with httpx.AsyncClient() as local:
+                playlist = (await local.get(first_url)).text
+                assert "#EXT-X-ENDLIST" in playlist
+                assert "0.ts" in playlist and "origin.example.com" not in playlist
+                
+                base = first_url.rsplit("/", 1)[0]
+                for _ in range(2):
+                    response = await local.get(f"{base}/0.ts")
+                    assert response.status_code == 200
+                    assert response.content == b"data:/vod/high/segment0.ts"
+            
+            assert origin.hits("/vod/high/index.m3u8") == 1
+            assert origin.hits("/vod/high/segment0.ts") == 1
+        finally:
+            await pool.close()
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_prefetch_is_bounded_by_lookahead(self):
+        origin = FakeOrigin(vod_playlist(10))
+        parser = make_parser(origin)
+        pool = IngestRelayPool(parser, lookahead=2, retain=1)
+        try:
+            url = await pool.acquire(SOURCE_URL)
+            relay = pool.relays[pool.relay_id(SOURCE_URL)]
+            await relay.playlist()
+            
+            assert await relay.segment(3) == b"data:/vod/high/segment3.ts"
+            await asyncio.sleep(0)
+            # Two segments ahead of the read position, one kept behind it
+            assert sorted(relay.downloads) == [3, 4, 5]
+            assert next(iter(relay.segments)) == 2
+            assert origin.hits("/vod/high/segment6.ts") == 0
+            assert await relay.segment(0) is None
+        finally:
+            await pool.close()
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_eviction_lets_awaited_downloads_finish(self):
+        origin = FakeOrigin(vod_playlist(10))
+        release = asyncio.Event()
+        
+        async def slow_origin(request):
+            if request.url.path.endswith("segment0.ts"):
+                await release.wait()
+            return origin(request)
+        
+        parser = make_parser(slow_origin)
+        pool = IngestRelayPool(parser, lookahead=1, retain=1)
+        try:
+            await pool.acquire(SOURCE_URL)
+            relay = pool.relays[pool.relay_id(SOURCE_URL)]
+            await relay.playlist()
+            
+            slow_reader = asyncio.ensure_future(relay.segment(0))
+            await asyncio.sleep(0)
+            # A faster encoder moves on and segment 0 falls out of the window
+            assert await relay.segment(5) == b"data:/vod/high/segment5.ts"
+            assert 0 not in relay.segments
+            
+            release.set()
+            assert await slow_reader == b"data:/vod/high/segment0.ts"
+        finally:
+            await pool.close()
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    async def test_last_release_stops_relay(self):
+        origin = FakeOrigin(vod_playlist(3))
+        parser = make_parser(origin)
+        pool = IngestRelayPool(parser)
+        try:
+            await pool.acquire(SOURCE_URL)
+            await pool.acquire(SOURCE_URL)
+            
+            await pool.release(SOURCE_URL)
+            assert pool.relay_id(SOURCE_URL) in pool.relays
+            await pool.release(SOURCE_URL)
+            assert pool.relays == {}
+        finally:
+            await pool.close()
+            await parser.close()
+    
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_engine_feeds_encoders_from_relay(self, mock_subprocess):
+        mock_subprocess.return_value = AsyncMock()
+        engine = TranscodingEngine(shared_ingest=True)
+        try:
+            engine.parser.client = httpx.AsyncClient(transport=httpx.MockTransport(FakeOrigin(vod_playlist(3))))
+            config = TranscodingConfig(
+                input_url="http://origin.example.com/vod/master.m3u8",
+                output_variants=[
+                    StreamVariant(codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC,
+                                  resolution=Resolution(width=1280, height=720), bitrate=3000),
+                    StreamVariant(codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC,
+                                  resolution=Resolution(width=640, height=360), bitrate=800),
+                ]
+            )
+            with patch.object(engine.parser, 'get_master_playlist_info') as mock_master:
+                mock_master.return_value = {
+                    "variants": [{"bandwidth": 5000000, "resolution": (1920, 1080), "uri": "high/index.m3u8"}]
+                }
+                await engine.start_transcoding(config)
+            
+            inputs = {
+                call.args[list(call.args).index("-i") + 1] for call in mock_subprocess.call_args_list
+            }
+            assert len(inputs) == 1
+            assert inputs.pop().startswith("http://127.0.0.1:")
+        finally:
+            await engine.close()
+    
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_lease_is_released_when_the_command_cannot_be_built(self, mock_subprocess):
+        engine = TranscodingEngine(shared_ingest=True)
+        try:
+            engine.parser.client = httpx.AsyncClient(transport=httpx.MockTransport(FakeOrigin(vod_playlist(3))))
+            config = TranscodingConfig(
+                input_url="http://origin.example.com/vod/master.m3u8",
+                output_variants=[
+                    StreamVariant(codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC,
+                                  resolution=Resolution(width=1280, height=720), bitrate=3000),
+                ]
+            )
+            with patch.object(engine.parser, 'get_master_playlist_info') as mock_master, \
+                    patch.object(engine, '_build_ffmpeg_command', side_effect=Exception("bad variant")):
+                mock_master.return_value = {
+                    "variants": [{"bandwidth": 5000000, "resolution": (1920, 1080), "uri": "high/index.m3u8"}]
+                }
+                with pytest.raises(Exception, match="bad variant"):
+                    await engine.start_transcoding(config)
+            
+            mock_subprocess.assert_not_called()
+            assert engine.relays.relays == {}
+        finally:
+            await engine.close()
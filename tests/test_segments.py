@@ -0,0 +1,167 @@
+import io
+
+import pytest
+
+from m3u8_codec_forward.segments import SegmentTable, Segment, parse_media_playlist
+
+
+BASE_URI = "http://example.com/vod/"
+
+PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:4
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:100
+#EXT-X-PLAYLIST-TYPE:VOD
+#EXT-X-MAP:URI="init.mp4"
+#EXT-X-KEY:METHOD=AES-128,URI="https://keys.example.com/k1"
+#EXTINF:6.000,
+#EXT-X-BYTERANGE:1000@0
+media.mp4
+#EXTINF:5.500,
+#EXT-X-BYTERANGE:2000
+media.mp4
+#EXT-X-DISCONTINUITY
+#EXT-X-KEY:METHOD=NONE
+#EXTINF:4.250,
+https://cdn.example.com/other/segment.ts
+#EXT-X-ENDLIST
+"""
+
+
+def parse(text: str = PLAYLIST):
+    return parse_media_playlist(io.StringIO(text), BASE_URI)
+
+
+class TestParseMediaPlaylist:
+    def test_playlist_attributes(self):
+        media = parse()
+        
+        assert media.target_duration == 6.0
+        assert media.endlist is True
+        assert media.playlist_type == "VOD"
+        assert media.version == 4
+        assert media.segments.media_sequence == 100
+    
+    def test_segment_urls_are_resolved(self):
+        segments = parse().segments
+        
+        assert len(segments) == 3
+        assert segments[0] == "http://example.com/vod/media.mp4"
+        assert segments[-1] == "https://cdn.example.com/other/segment.ts"
+        assert list(segments) == [segments[0], segments[1], segments[2]]
+        assert segments == ["http://example.com/vod/media.mp4", "http://example.com/vod/media.mp4",
+                            "https://cdn.example.com/other/segment.ts"]
+    
+    def test_byte_ranges_continue_from_previous_segment(self):
+        segments = parse().segments
+        
+        assert segments.byterange(0) == (1000, 0)
+        assert segments.byterange(1) == (2000, 1000)
+        assert segments.byterange(2) is None
+    
+    def test_keys_discontinuities_and_maps(self):
+        segments = parse().segments
+        
+        assert segments.key(0) == 'METHOD=AES-128,URI="https://keys.example.com/k1"'
+        assert segments.key(1) == segments.key(0)
+        assert segments.key(2) is None
+        assert segments.keys == ['METHOD=AES-128,URI="https://keys.example.com/k1"']
+        assert not segments.is_discontinuity(1)
+        assert segments.is_discontinuity(2)
+        assert segments.maps == [(0, 'URI="init.mp4"')]
+    
+    def test_segment_view(self):
+        segment = parse().segments.segment(1)
+        
+        assert segment == Segment(
+            sequence=101,
+            uri="http://example.com/vod/media.mp4",
+            duration=5.5,
+            byterange_length=2000,
+            byterange_offset=1000,
+            discontinuity=False,
+            key='METHOD=AES-128,URI="https://keys.example.com/k1"',
+        )
+
+
+class TestSegmentTable:
+    def test_optional_columns_are_not_allocated(self):
+        table = SegmentTable(BASE_URI)
+        for i in range(3):
+            table.append(f"segment{i}.ts", 6.0)
+        
+        assert not table.has_byteranges
+        assert table.byterange(1) is None
+        assert table.key(1) is None
+        assert list(table.durations) == [6.0, 6.0, 6.0]
+    
+    def test_columns_backfill_when_first_used_late(self):
+        table = SegmentTable(BASE_URI)
+        table.append("a.ts", 6.0)
+        table.append("b.ts", 6.0, byterange=(10, 0), key="METHOD=AES-128,URI=\"k\"")
+        table.append("c.ts", 6.0)
+        
+        assert table.byterange(0) is None
+        assert table.byterange(1) == (10, 0)
+        assert table.byterange(2) is None
+        assert [table.key(i) for i in range(3)] == [None, "METHOD=AES-128,URI=\"k\"", None]
+    
+    def test_slicing_and_negative_index(self):
+        table = SegmentTable(BASE_URI)
+        for i in range(5):
+            table.append(f"segment{i}.ts", 6.0)
+        
+        assert table[1:3] == ["http://example.com/vod/segment1.ts", "http://example.com/vod/segment2.ts"]
+        assert table[-1] == "http://example.com/vod/segment4.ts"
+        with pytest.raises(IndexError):
+            table[5]
+
+
+class TestTimeIndex:
+    def make_table(self):
+        table = SegmentTable(BASE_URI, media_sequence=10)
+        for i, duration in enumerate([6.0, 4.0, 5.0]):
+            table.append(f"segment{i}.ts", duration)
+        return table
+    
+    def test_total_duration_is_sum_of_extinf(self):
+        assert self.make_table().total_duration == 15.0
+    
+    def test_start_time(self):
+        table = self.make_table()
+        assert [table.start_time(i) for i in range(3)] == [0.0, 6.0, 10.0]
+        with pytest.raises(IndexError):
+            table.start_time(3)
+    
+    def test_segment_at(self):
+        table = self.make_table()
+        
+        assert table.segment_at(0) == 0
+        assert table.segment_at(5.999) == 0
+        assert table.segment_at(6.0) == 1
+        assert table.segment_at(12.5) == 2
+        assert table.segment_at(-1) == 0
+        with pytest.raises(ValueError):
+            table.segment_at(15.0)
+    
+    def test_index_rebuilt_after_append(self):
+        table = self.make_table()
+        assert table.segment_at(14) == 2
+        
+        table.append("segment3.ts", 6.0)
+        assert table.segment_at(16) == 3
+    
+    def test_to_m3u8_from_offset(self):
+        media = parse()
+        
+        rendered = media.segments.to_m3u8(start_index=1, target_duration=6)
+        reparsed = parse_media_playlist(io.StringIO(rendered), "http://unused.example.com/")
+        
+        assert "#EXT-X-MEDIA-SEQUENCE:101" in rendered
+        assert '#EXT-X-MAP:URI="http://example.com/vod/init.mp4"' in rendered
+        assert reparsed.endlist
+        assert list(reparsed.segments) == list(media.segments)[1:]
+        assert reparsed.segments.byterange(0) == (2000, 1000)
+        assert reparsed.segments.key(0) == 'METHOD=AES-128,URI="https://keys.example.com/k1"'
+        assert reparsed.segments.is_discontinuity(1)
+        assert reparsed.segments.key(1) is None
@@ -0,0 +1,177 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward import server
+from m3u8_codec_forward.plan import master_playlist
+from m3u8_codec_forward.shedding import LoadShedder
+from m3u8_codec_forward.speed_control import WARMUP_REPORTS
+from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.models import (
+    TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat, VariantPriority
+)
+
+
+ESSENTIAL = StreamVariant(
+    codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC, resolution=Resolution(width=640, height=360),
+    bitrate=800, container=ContainerFormat.TS, priority=VariantPriority.ESSENTIAL
+)
+NORMAL = StreamVariant(
+    codec=CodecType.H264, audio_codec=AudioCodec.AAC_LC, resolution=Resolution(width=1920, height=1080),
+    bitrate=5000, container=ContainerFormat.TS
+)
+OPTIONAL_VP9 = StreamVariant(
+    codec=CodecType.VP9, audio_codec=AudioCodec.OPUS, resolution=Resolution(width=1280, height=720),
+    bitrate=2500, container=ContainerFormat.WEBM, priority=VariantPriority.OPTIONAL
+)
+OPTIONAL_AV1 = StreamVariant(
+    codec=CodecType.AV1, audio_codec=AudioCodec.OPUS, resolution=Resolution(width=1920, height=1080),
+    bitrate=2500, container=ContainerFormat.FMP4, priority=VariantPriority.OPTIONAL
+)
+LADDER = [ESSENTIAL, NORMAL, OPTIONAL_VP9, OPTIONAL_AV1]
+
+
+class _FakeEncoder:
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+    
+    async def wait(self):
+        return self.returncode
+
+
+class _FixedCpu:
+    def __init__(self, utilisation):
+        self.utilisation = utilisation
+    
+    def sample(self):
+        return self.utilisation
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = TranscodingEngine(str(tmp_path))
+    engine.parser.get_master_playlist_info = AsyncMock(
+        return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+    )
+    spawn = AsyncMock(side_effect=lambda *args, **kwargs: _FakeEncoder())
+    with patch("asyncio.create_subprocess_exec", spawn):
+        await engine.start_transcoding(
+            TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=LADDER)
+        )
+        yield engine
+    await engine.close()
+    # Let the start-up watchers see their encoders exit
+    await asyncio.sleep(0.2)
+
+
+class TestLoadShedder:
+
+    @pytest.mark.asyncio
+    async def test_optional_variants_shed_first_most_expensive_first(self, engine):
+        shedder = LoadShedder(engine, cpu_sampler=_FixedCpu(0.5))
+        
+        assert shedder.shed_candidates() == [
+            OPTIONAL_AV1.variant_name, OPTIONAL_VP9.variant_name, NORMAL.variant_name
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_sustained_pressure_sheds_one_variant_at_a_time(self, engine):
+        cpu = _FixedCpu(0.99)
+        shedder = LoadShedder(engine, shed_after=10, restore_after=30, cpu_sampler=cpu)
+        
+        await shedder.check(now=0)
+        await shedder.check(now=9)
+        assert engine.shed_variants == {}
+        await shedder.check(now=10)
+        await shedder.check(now=15)
+        assert list(engine.shed_variants) == [OPTIONAL_AV1.variant_name]
+        assert OPTIONAL_AV1.variant_name not in engine.active_processes
+        status = engine.shed_status()[0]
+        assert status["priority"] == "optional"
+        assert status["reason"] == "CPU at 99%"
+        
+        await shedder.check(now=20)
+        await shedder.check(now=30)
+        await shedder.check(now=40)
+        # Essential variants stay up however long the pressure lasts
+        assert list(engine.shed_variants) == [
+            OPTIONAL_AV1.variant_name, OPTIONAL_VP9.variant_name, NORMAL.variant_name
+        ]
+        assert list(engine.active_processes) == [ESSENTIAL.variant_name]
+    
+    @pytest.mark.asyncio
+    async def test_variants_come_back_once_pressure_subsides(self, engine):
+        cpu = _FixedCpu(0.99)
+        shedder = LoadShedder(engine, shed_after=10, restore_after=30, cpu_sampler=cpu)
+        await shedder.check(now=0)
+        await shedder.check(now=10)
+        await shedder.check(now=20)
+        
+        cpu.utilisation = 0.5
+        await shedder.check(now=21)
+        await shedder.check(now=50)
+        assert len(engine.shed_variants) == 2
+        await shedder.check(now=51)
+        # Restored in reverse order of shedding
+        assert list(engine.shed_variants) == [OPTIONAL_AV1.variant_name]
+        assert OPTIONAL_VP9.variant_name in engine.active_processes
+        await shedder.check(now=81)
+        assert engine.shed_variants == {}
+    
+    @pytest.mark.asyncio
+    async def test_slow_encoders_count_as_pressure(self, engine):
+        shedder = LoadShedder(engine, speed_threshold=0.9, cpu_sampler=_FixedCpu(None))
+        assert shedder.pressure() is None
+        
+        engine.encoder_speeds[NORMAL.variant_name] = 0.7
+        engine.encoder_reports[NORMAL.variant_name] = WARMUP_REPORTS + 1
+        assert shedder.pressure() == "encoder speed down to 0.70x"
+    
+    @pytest.mark.asyncio
+    async def test_warming_up_encoders_do_not_count_as_pressure(self, engine):
+        shedder = LoadShedder(engine, speed_threshold=0.9, cpu_sampler=_FixedCpu(None))
+        
+        engine.encoder_speeds[NORMAL.variant_name] = 0.3
+        engine.encoder_reports[NORMAL.variant_name] = WARMUP_REPORTS
+        assert shedder.pressure() is None
+
+
+class TestMasterPlaylist:
+
+    def test_lists_hls_variants_only(self):
+        playlist = master_playlist(LADDER)
+        
+        assert playlist.startswith("#EXTM3U\n")
+        assert f"{ESSENTIAL.variant_name}.m3u8" in playlist
+        assert f"{OPTIONAL_AV1.variant_name}.m3u8" in playlist
+        # WebM is written as a single file, not HLS
+        assert OPTIONAL_VP9.variant_name not in playlist
+        assert "#EXT-X-STREAM-INF:BANDWIDTH=1088000,AVERAGE-BANDWIDTH=928000,RESOLUTION=640x360\n" in playlist
+    
+    def test_shed_variants_drop_out_of_the_master_playlist(self):
+        config = TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=LADDER)
+        stream_id = str(config.input_url)
+        shed = [{"variant": NORMAL.variant_name, "stream_id": stream_id, "priority": "normal",
+                 "reason": "CPU at 99%", "shed_at": 0.0}]
+        
+        with TestClient(server.app) as client, \
+                patch.dict(server.active_streams, {stream_id: {"config": config.model_dump(mode="json")}}, clear=True), \
+                patch("m3u8_codec_forward.server._shed_status", AsyncMock(return_value=shed)):
+            response = client.get("/master.m3u8")
+            streams = client.get("/streams").json()
+        
+        assert response.status_code == 200
+        assert f"{ESSENTIAL.variant_name}.m3u8" in response.text
+        assert NORMAL.variant_name not in response.text
+        assert streams["shed_variants"] == shed
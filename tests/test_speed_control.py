@@ -0,0 +1,179 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from m3u8_codec_forward.encoders import SPEED_LADDERS, codec_specific_params, max_speed_level, video_encoder
+from m3u8_codec_forward.speed_control import SpeedController, WARMUP_REPORTS
+from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.models import TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
+
+
+class _FakeEncoder:
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+    
+    async def wait(self):
+        return self.returncode
+
+
+def _feed(controller, speed, count, level=0, max_level=4):
+    decisions = [controller.observe("rung", speed, level, max_level) for _ in range(count)]
+    return [decision for decision in decisions if decision is not None]
+
+
+class TestSpeedLadders:
+
+    def test_level_zero_keeps_the_default_settings(self):
+        assert codec_specific_params(CodecType.H264, 0) == codec_specific_params(CodecType.H264)
+        assert codec_specific_params(CodecType.H264)[:2] == ["-preset", "fast"]
+    
+    def test_levels_step_towards_faster_settings(self):
+        assert codec_specific_params(CodecType.H265, 2)[:2] == ["-preset", "veryfast"]
+        assert codec_specific_params(CodecType.VP9, 1)[-2:] == ["-cpu-used", "5"]
+        assert codec_specific_params(CodecType.AV1, 4)[:2] == ["-cpu-used", "8"]
+        # Levels past the end stay at the fastest setting
+        assert codec_specific_params(CodecType.H264, 99)[:2] == ["-preset", "ultrafast"]
+    
+    def test_ladders_use_options_the_encoder_accepts(self):
+        # Speed options of each encoder, with the range of their values
+        accepted = {
+            "libx264": ("-preset", None),
+            "libx265": ("-preset", None),
+            "libvpx-vp9": ("-cpu-used", range(-8, 9)),
+            "libvpx": ("-cpu-used", range(-16, 17)),
+            "libaom-av1": ("-cpu-used", range(0, 9)),
+            "libsvtav1": ("-preset", range(-1, 14)),
+        }
+        for codec, (option, values) in SPEED_LADDERS.items():
+            expected, valid = accepted[video_encoder(codec)]
+            assert option == expected, codec
+            assert option in codec_specific_params(codec), codec
+            if valid is not None:
+                assert all(int(value) in valid for value in values), codec
+    
+    def test_codecs_without_a_ladder_have_one_level(self):
+        assert max_speed_level(CodecType.MPEG2) == 0
+        assert codec_specific_params(CodecType.MPEG2, 3) == ["-g", "30"]
+
+
+class TestSpeedController:
+
+    def test_slow_encoder_steps_faster_after_a_full_window(self):
+        controller = SpeedController(window=5)
+        
+        assert _feed(controller, 0.8, WARMUP_REPORTS + 4) == []
+        assert _feed(controller, 0.8, 1) == [1]
+        # The encoder restarts at the new level, so a new window is needed
+        assert _feed(controller, 0.8, WARMUP_REPORTS + 4, level=1) == []
+    
+    def test_fastest_level_stays_put(self):
+        controller = SpeedController(window=5)
+        
+        assert _feed(controller, 0.5, 50, level=4, max_level=4) == []
+    
+    def test_sustained_realtime_steps_back(self):
+        controller = SpeedController(window=5, recover_reports=20)
+        
+        assert _feed(controller, 1.0, WARMUP_REPORTS + 19, level=2) == []
+        assert _feed(controller, 1.0, 1, level=2) == [1]
+        assert _feed(controller, 1.0, WARMUP_REPORTS + 30, level=0) == []
+    
+    def test_a_failed_step_back_doubles_the_wait(self):
+        controller = SpeedController(window=5, recover_reports=20)
+        assert _feed(controller, 1.0, WARMUP_REPORTS + 20, level=1) == [0]
+        # Too slow again at the level stepped back to
+        assert _feed(controller, 0.8, WARMUP_REPORTS + 5, level=0) == [1]
+        
+        assert _feed(controller, 1.0, WARMUP_REPORTS + 39, level=1) == []
+        assert _feed(controller, 1.0, 1, level=1) == [0]
+
+
+class TestAdaptiveEngine:
+
+    @pytest.mark.asyncio
+    async def test_slow_variant_restarts_faster_at_a_segment_boundary(self, tmp_path):
+        encoders = [_FakeEncoder(), _FakeEncoder()]
+        spawn = AsyncMock(side_effect=encoders)
+        engine = TranscodingEngine(str(tmp_path), speed_controller=SpeedController(window=3))
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        variant = StreamVariant(
+            codec=CodecType.H264,
+            audio_codec=AudioCodec.AAC_LC,
+            resolution=Resolution(width=1920, height=1080),
+            bitrate=5000,
+            container=ContainerFormat.TS
+        )
+        config = TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=[variant])
+        playlist = tmp_path / f"{variant.variant_name}.m3u8"
+        
+        try:
+            with patch("asyncio.create_subprocess_exec", spawn):
+                await engine.start_transcoding(config)
+                playlist.write_text("#EXTM3U\n")
+                for _ in range(WARMUP_REPORTS + 3):
+                    encoders[0].stdout.feed_data(b"frame=30\nspeed=0.7x\nprogress=continue\n")
+                await asyncio.sleep(0.2)
+                
+                # Waiting for the encoder to finish its segment
+                assert spawn.await_count == 1
+                assert variant.variant_name in engine._speed_restarts
+                playlist.write_text("#EXTM3U\n#EXTINF:6.0,\nsegment.ts\n")
+                for _ in range(20):
+                    if spawn.await_count == 2:
+                        break
+                    await asyncio.sleep(0.05)
+            
+            assert spawn.await_count == 2
+            first, restarted = (call.args for call in spawn.await_args_list)
+            assert first[first.index("-preset") + 1] == "fast"
+            assert restarted[restarted.index("-preset") + 1] == "faster"
+            assert engine.speed_levels == {variant.variant_name: 1}
+        finally:
+            await engine.close()
+        
+        assert engine.speed_levels == {}
+    
+    @pytest.mark.asyncio
+    async def test_a_new_run_starts_back_at_the_default_settings(self, tmp_path):
+        spawn = AsyncMock(side_effect=lambda *args, **kwargs: _FakeEncoder())
+        engine = TranscodingEngine(str(tmp_path), speed_controller=SpeedController())
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        variant = StreamVariant(
+            codec=CodecType.H264,
+            audio_codec=AudioCodec.AAC_LC,
+            resolution=Resolution(width=1920, height=1080),
+            bitrate=5000,
+            container=ContainerFormat.TS
+        )
+        config = TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=[variant])
+        
+        try:
+            with patch("asyncio.create_subprocess_exec", spawn):
+                await engine.start_transcoding(config)
+                engine._set_speed_level(variant.variant_name, 2)
+                await engine.restart_variant(variant.variant_name)
+                stepped = spawn.await_args.args
+                assert stepped[stepped.index("-preset") + 1] == "veryfast"
+                
+                await engine.stop_transcoding()
+                await engine.start_transcoding(config)
+            
+            restarted = spawn.await_args.args
+            assert restarted[restarted.index("-preset") + 1] == "fast"
+            assert engine.speed_levels == {}
+        finally:
+            await engine.close()
+
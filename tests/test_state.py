@@ -0,0 +1,93 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward import server
+from m3u8_codec_forward.config import ConfigManager
+from m3u8_codec_forward.server import app
+from m3u8_codec_forward.state import SharedStreamRegistry
+from m3u8_codec_forward.transcoder import TranscodingEngine
+
+
+class TestSharedStreamRegistry:
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        return str(tmp_path / "streams.db")
+    
+    def test_dict_interface(self, db_path):
+        registry = SharedStreamRegistry(db_path)
+        try:
+            assert len(registry) == 0
+            assert not registry
+            
+            registry["http://example.com/a.m3u8"] = {"variants": {"h264_1280x720_3000k_ts": "http://localhost/x.m3u8"}}
+            
+            assert "http://example.com/a.m3u8" in registry
+            assert registry["http://example.com/a.m3u8"]["variants"] == {"h264_1280x720_3000k_ts": "http://localhost/x.m3u8"}
+            assert list(registry.keys()) == ["http://example.com/a.m3u8"]
+            assert dict(registry.items()) == {"http://example.com/a.m3u8": registry["http://example.com/a.m3u8"]}
+            
+            del registry["http://example.com/a.m3u8"]
+            assert "http://example.com/a.m3u8" not in registry
+            with pytest.raises(KeyError):
+                del registry["http://example.com/a.m3u8"]
+        finally:
+            registry.close()
+    
+    def test_state_is_shared_between_instances(self, db_path):
+        writer = SharedStreamRegistry(db_path)
+        reader = SharedStreamRegistry(db_path)
+        try:
+            writer["stream"] = {"input_url": "http://example.com/a.m3u8"}
+            assert reader["stream"] == {"input_url": "http://example.com/a.m3u8"}
+            
+            writer["stream"] = {"input_url": "http://example.com/b.m3u8"}
+            assert reader["stream"]["input_url"] == "http://example.com/b.m3u8"
+            assert len(reader) == 1
+        finally:
+            writer.close()
+            reader.close()
+    
+    def test_wal_mode_enabled(self, db_path):
+        registry = SharedStreamRegistry(db_path)
+        try:
+            mode = registry._connection().execute("PRAGMA journal_mode").fetchone()[0]
+            assert mode == "wal"
+        finally:
+            registry.close()
+
+
+class TestEngineRoutes:
+    def test_internal_routes_hidden_outside_engine_process(self):
+        with TestClient(app) as client:
+            response = client.post("/internal/engine/stop")
+            assert response.status_code == 404
+
+
+class TestWorkingDir:
+    @pytest.mark.asyncio
+    async def test_configured_working_dir_survives_close(self, tmp_path):
+        working_dir = tmp_path / "segments"
+        engine = TranscodingEngine(str(working_dir))
+        (working_dir / "keep.ts").write_bytes(b"data")
+        await engine.close()
+        
+        assert (working_dir / "keep.ts").exists()
+    
+    @pytest.mark.asyncio
+    async def test_temporary_working_dir_is_removed(self):
+        engine = TranscodingEngine()
+        await engine.close()
+        
+        assert not engine.working_dir.exists()
+    
+    def test_standalone_server_uses_configured_working_dir(self, tmp_path):
+        manager = ConfigManager()
+        manager.app_config.working_dir = str(tmp_path / "segments")
+        app.state.config_manager = manager
+        try:
+            with TestClient(app):
+                assert server.transcoding_engine.working_dir == tmp_path / "segments"
+        finally:
+            del app.state.config_manager
+        
+        assert (tmp_path / "segments").is_dir()
@@ -0,0 +1,196 @@
+import asyncio
+import json
+from unittest.mock import patch, AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from m3u8_codec_forward.server import app
+from m3u8_codec_forward.tracing import Tracer, OTLPFileExporter, STATUS_ERROR
+from m3u8_codec_forward.transcoder import TranscodingEngine
+from m3u8_codec_forward.models import TranscodingConfig, StreamVariant, CodecType, AudioCodec, Resolution, ContainerFormat
+
+
+class _FakeEncoder:
+    """An ffmpeg stand-in whose progress output the test writes."""
+    
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+    
+    async def wait(self):
+        return self.returncode
+
+
+class TestTracer:
+
+    def test_nested_spans_share_the_trace(self):
+        tracer = Tracer()
+        with tracer.trace("request") as root:
+            with tracer.span("fetch", url="http://example.com") as fetch:
+                with tracer.span("parse") as parse:
+                    pass
+        
+        assert fetch.parent_id == root.span_id
+        assert parse.parent_id == fetch.span_id
+        trace = tracer.recent()[0]
+        assert trace["complete"]
+        assert [span["name"] for span in trace["spans"]] == ["request", "fetch", "parse"]
+        assert trace["spans"][1]["attributes"] == {"url": "http://example.com"}
+    
+    def test_spans_outside_a_trace_are_not_recorded(self):
+        tracer = Tracer()
+        with tracer.span("orphan") as span:
+            pass
+        
+        assert span is None
+        assert tracer.start_span("orphan") is None
+        assert tracer.recent() == []
+    
+    def test_exception_marks_the_span_failed(self):
+        tracer = Tracer()
+        with pytest.raises(ValueError):
+            with tracer.trace("request"):
+                with tracer.span("fetch"):
+                    raise ValueError("origin unreachable")
+        
+        spans = tracer.recent()[0]["spans"]
+        assert spans[1]["error"] == "origin unreachable"
+        assert spans[0]["error"] == "origin unreachable"
+    
+    def test_trace_completes_when_detached_spans_end(self):
+        tracer = Tracer()
+        with tracer.trace("request"):
+            background = tracer.start_span("first_segment")
+        
+        assert not tracer.recent()[0]["complete"]
+        background.end()
+        assert tracer.recent()[0]["complete"]
+    
+    def test_buffer_keeps_most_recent_traces(self):
+        tracer = Tracer(buffer_size=2)
+        for name in ("a", "b", "c"):
+            with tracer.trace(name):
+                pass
+        
+        assert [trace["name"] for trace in tracer.recent()] == ["c", "b"]
+        assert [trace["name"] for trace in tracer.recent(limit=1)] == ["c"]
+    
+    def test_otlp_file_exporter(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        tracer = Tracer(exporter=OTLPFileExporter(str(path)))
+        with tracer.trace("request", variants=2):
+            span = tracer.start_span("first_segment")
+        
+        assert not path.exists()
+        span.end(error="timed out")
+        
+        request = json.loads(path.read_text().splitlines()[0])
+        spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert len(spans) == 2
+        assert len(spans[0]["traceId"]) == 32 and spans[0]["traceId"] == spans[1]["traceId"]
+        assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+        assert spans[0]["attributes"] == [{"key": "variants", "value": {"intValue": "2"}}]
+        assert spans[1]["status"] == {"code": STATUS_ERROR, "message": "timed out"}
+        assert int(spans[1]["endTimeUnixNano"]) >= int(spans[1]["startTimeUnixNano"])
+
+
+class TestStartupTrace:
+
+    @pytest.mark.asyncio
+    async def test_start_is_traced_until_the_first_segment(self, tmp_path):
+        tracer = Tracer()
+        encoder = _FakeEncoder()
+        engine = TranscodingEngine(str(tmp_path))
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        variant = StreamVariant(
+            codec=CodecType.H264,
+            audio_codec=AudioCodec.AAC_LC,
+            resolution=Resolution(width=1280, height=720),
+            bitrate=3000,
+            container=ContainerFormat.TS
+        )
+        config = TranscodingConfig(input_url="http://example.com/master.m3u8", output_variants=[variant])
+        
+        try:
+            with patch("m3u8_codec_forward.transcoder.tracer", tracer), \
+                    patch("asyncio.create_subprocess_exec", AsyncMock(return_value=encoder)):
+                await engine.start_transcoding(config)
+                assert not tracer.recent()[0]["complete"]
+                
+                # Input probed, then the first frame encoded, then the playlist written
+                encoder.stdout.feed_data(b"frame=0\nspeed=N/A\nprogress=continue\n")
+                encoder.stdout.feed_data(b"frame=12\nspeed=1.01x\nprogress=continue\n")
+                await asyncio.sleep(0.05)
+                (tmp_path / f"{variant.variant_name}.m3u8").write_text("#EXTM3U\n")
+                for _ in range(50):
+                    if tracer.recent()[0]["complete"]:
+                        break
+                    await asyncio.sleep(0.05)
+            
+            trace = tracer.recent()[0]
+            assert trace["complete"]
+            names = [span["name"] for span in trace["spans"]]
+            assert names == [
+                "start_transcoding", "get_master_playlist_info", "start_variant",
+                "build_ffmpeg_command", "start_ffmpeg_process",
+                "probe_source", "first_frame", "first_segment",
+            ]
+            assert all(span["error"] is None for span in trace["spans"])
+        finally:
+            await engine.close()
+    
+    @pytest.mark.asyncio
+    async def test_encoder_exit_fails_the_startup_trace(self, tmp_path):
+        tracer = Tracer()
+        encoder = _FakeEncoder()
+        engine = TranscodingEngine(str(tmp_path))
+        engine.parser.get_master_playlist_info = AsyncMock(
+            return_value={"variants": [{"uri": "source.m3u8", "bandwidth": 5000000}]}
+        )
+        config = TranscodingConfig(
+            input_url="http://example.com/master.m3u8",
+            output_variants=[StreamVariant(
+                codec=CodecType.H264,
+                audio_codec=AudioCodec.AAC_LC,
+                resolution=Resolution(width=640, height=360),
+                bitrate=800,
+                container=ContainerFormat.TS
+            )]
+        )
+        
+        try:
+            with patch("m3u8_codec_forward.transcoder.tracer", tracer), \
+                    patch("asyncio.create_subprocess_exec", AsyncMock(return_value=encoder)):
+                await engine.start_transcoding(config)
+                encoder.terminate()
+                await asyncio.sleep(0.3)
+            
+            spans = {span["name"]: span for span in tracer.recent()[0]["spans"]}
+            assert spans["start_variant"]["error"] == "encoder exited before writing a segment"
+            assert spans["probe_source"]["error"] == "encoder exited before writing a segment"
+        finally:
+            await engine.close()
+
+
+class TestTracesEndpoint:
+
+    def test_traces_endpoint_lists_recent_traces(self):
+        tracer = Tracer()
+        with tracer.trace("start_transcoding"):
+            pass
+        
+        with patch("m3u8_codec_forward.server.tracer", tracer), TestClient(app) as client:
+            response = client.get("/traces", params={"limit": 5})
+        
+        assert response.status_code == 200
+        assert [trace["name"] for trace in response.json()["traces"]] == ["start_transcoding"]